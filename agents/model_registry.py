@@ -0,0 +1,102 @@
+"""
+StudyBuddy - Shared Model Registry
+One pooled, keep-alive HTTP client and Gemini provider shared by every agent
+"""
+
+from dotenv import load_dotenv
+from google.genai import Client
+from google.genai.types import HttpOptions
+from pydantic_ai.models.google import GoogleModel
+from pydantic_ai.providers.google import GoogleProvider
+from typing import Optional
+import httpx
+import logging
+import os
+
+load_dotenv()
+
+# A child of the `studybuddy` logger, so records go through the telemetry handlers
+logger = logging.getLogger("studybuddy.model_registry")
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+DEFAULT_MODEL_NAME = os.getenv("LLM_MODEL", "gemini-2.0-flash-lite")
+
+# Connection pool settings (all overridable through the environment)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+
+# ============================================================
+# SHARED CLIENT / PROVIDER
+# ============================================================
+
+_http_client: Optional[httpx.AsyncClient] = None
+_provider: Optional[GoogleProvider] = None
+_models: dict[str, GoogleModel] = {}
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the pooled HTTP client used for every LLM call"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        http2 = LLM_HTTP2 and _http2_available()
+        if LLM_HTTP2 and not http2:
+            logger.warning("⚠️ LLM_HTTP2 is set but `h2` is not installed - falling back to HTTP/1.1")
+
+        _http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+    return _http_client
+
+
+def get_provider() -> GoogleProvider:
+    """Get or create the single Gemini provider (one client, one connection pool)"""
+    global _provider
+    if _provider is None:
+        client = Client(
+            api_key=GOOGLE_API_KEY,
+            http_options=HttpOptions(
+                httpx_async_client=get_http_client(),
+                # google-genai expects milliseconds and applies it per request
+                timeout=int(LLM_READ_TIMEOUT * 1000),
+            ),
+        )
+        _provider = GoogleProvider(client=client)
+    return _provider
+
+
+def get_model(model_name: str = DEFAULT_MODEL_NAME) -> GoogleModel:
+    """Get a model bound to the shared provider (cached per model name)"""
+    if model_name not in _models:
+        _models[model_name] = GoogleModel(model_name=model_name, provider=get_provider())
+    return _models[model_name]
+
+
+async def close_http_client():
+    """Close the pooled client on shutdown"""
+    global _http_client, _provider
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+    # The provider and its models hold the closed client; rebuild them on next use
+    _provider = None
+    _models.clear()
@@ -0,0 +1,105 @@
+"""
+StudyBuddy - Model Tiers
+Configuration-driven model choice per agent, with escalation and cost estimates
+
+Every agent is assigned a tier (fast / standard / strong) and every tier maps to
+a Gemini model. A call can move up one tier when:
+- the turn's difficulty is "advanced" (teacher, quiz generator, evaluator), or
+- the model's output failed validation even after the agent's output retries.
+
+Configuration (environment):
+    LLM_TIER_FAST / LLM_TIER_STANDARD / LLM_TIER_STRONG   model name per tier
+    LLM_AGENT_TIERS            overrides, e.g. "router=fast,teacher=strong"
+    LLM_ESCALATE_ON_ADVANCED   true/false (default: true)
+    LLM_ESCALATE_ON_FAILURE    true/false (default: true)
+    LLM_PRICES                 JSON {"model": [input $/1M tokens, output $/1M tokens]}
+                               merged over the built-in table
+"""
+
+from dotenv import load_dotenv
+from typing import Optional
+import json
+import os
+
+from agents.model_registry import DEFAULT_MODEL_NAME, get_model
+load_dotenv()
+
+TIERS = ("fast", "standard", "strong")
+
+TIER_MODELS = {
+    "fast": os.getenv("LLM_TIER_FAST", DEFAULT_MODEL_NAME),
+    "standard": os.getenv("LLM_TIER_STANDARD", "gemini-2.0-flash"),
+    "strong": os.getenv("LLM_TIER_STRONG", "gemini-2.5-flash"),
+}
+
+# The router only classifies; teaching and grading benefit from a stronger model
+AGENT_TIERS = {
+    "router": "fast",
+    "teacher": "standard",
+    "quiz_generator": "fast",
+    "quiz_evaluator": "standard",
+    "review": "fast",
+    "progress_tracker": "fast",
+}
+
+# Agents whose prompt carries the turn's difficulty
+DIFFICULTY_AWARE_AGENTS = {"teacher", "quiz_generator", "quiz_evaluator"}
+
+ESCALATE_ON_ADVANCED = os.getenv("LLM_ESCALATE_ON_ADVANCED", "true").lower() in ("1", "true", "yes")
+ESCALATE_ON_FAILURE = os.getenv("LLM_ESCALATE_ON_FAILURE", "true").lower() in ("1", "true", "yes")
+
+# USD per 1M (input, output) tokens
+MODEL_PRICES = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+
+def _parse_agent_tiers(spec: str) -> dict[str, str]:
+    tiers = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        agent, _, tier = item.partition("=")
+        if tier.strip() not in TIERS:
+            raise ValueError(f"LLM_AGENT_TIERS: unknown tier {tier!r} for {agent!r} (expected one of {TIERS})")
+        tiers[agent.strip()] = tier.strip()
+    return tiers
+
+
+AGENT_TIERS.update(_parse_agent_tiers(os.getenv("LLM_AGENT_TIERS", "")))
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+
+# ============================================================
+# SELECTION
+# ============================================================
+
+def escalate(tier: str) -> Optional[str]:
+    """Next stronger tier, or None at the top"""
+    index = TIERS.index(tier)
+    return TIERS[index + 1] if index + 1 < len(TIERS) else None
+
+
+def select_tier(agent: str, difficulty: Optional[str] = None) -> str:
+    """Tier for one call of `agent`"""
+    tier = AGENT_TIERS.get(agent, "fast")
+    if ESCALATE_ON_ADVANCED and difficulty == "advanced" and agent in DIFFICULTY_AWARE_AGENTS:
+        tier = escalate(tier) or tier
+    return tier
+
+
+def model_name_for(tier: str) -> str:
+    return TIER_MODELS[tier]
+
+
+def agent_model(agent: str):
+    """Default model for an Agent definition (calls may still pick another tier)"""
+    return get_model(model_name_for(select_tier(agent)))
+
+
+def estimate_cost(model_name: str, usage) -> float:
+    """USD cost of one run from its token usage (0 for unknown models)"""
+    input_price, output_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+    return ((usage.input_tokens or 0) * input_price + (usage.output_tokens or 0) * output_price) / 1_000_000
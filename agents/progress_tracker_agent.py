@@ -1,14 +1,8 @@
-from dotenv import load_dotenv
 from pydantic_ai.agent import Agent, RunContext
 from agents.schemas import ProgressTrackerInput, ProgressTrackerOutput
-from pydantic_ai.models.google import GoogleModel
-from pydantic_ai.providers.google import GoogleProvider
-import os
-load_dotenv()
+from agents.model_tiers import agent_model
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-provider=GoogleProvider(api_key=GOOGLE_API_KEY)
-model=GoogleModel(model_name='gemini-2.0-flash-lite',provider=provider)
+model=agent_model("progress_tracker")
 
 
 progress_tracker_system_prompt = """You are the Progress Tracker for StudyBuddy.
@@ -19,6 +13,13 @@ Your role is to:
 3. Flag when intervention is needed
 4. Provide data-driven insights for other agents
 
+**Your Data:**
+The input carries `stats` computed from the student's history (turns, answers,
+accuracy, active_days_last_14, trajectory, engagement_score and topics as
+[subject, topic, mastery, times_studied, correct, incorrect]) and the latest few
+interactions. Trajectory and engagement are already computed - report them as
+given and spend your judgment on mastery changes, velocity and interventions.
+
 **Analysis Metrics:**
 - Mastery velocity: How quickly topics improve
 - Retention: Performance on previously learned material
@@ -1,14 +1,8 @@
-from dotenv import load_dotenv
 from pydantic_ai.agent import Agent, RunContext
 from agents.schemas import QuizGeneratorInput, QuizGeneratorOutput
-from pydantic_ai.models.google import GoogleModel
-from pydantic_ai.providers.google import GoogleProvider
-import os
-load_dotenv()
+from agents.model_tiers import agent_model
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-provider=GoogleProvider(api_key=GOOGLE_API_KEY)
-model=GoogleModel(model_name='gemini-2.0-flash-lite',provider=provider)
+model=agent_model("quiz_generator")
 
 
 
@@ -31,6 +25,12 @@ Your role is to:
 - calculation: Numerical answer with work shown
 - mixed: Varies based on topic
 
+**Answer Key:**
+- multiple_choice: label options A-D in the problem text, answer_key.kind="choice", answer_key.choice=the letter
+- calculation with a single number: answer_key.kind="numeric", answer_key.value, answer_key.tolerance for rounding
+- calculation with a symbolic result: answer_key.kind="expression", answer_key.expression in sympy syntax
+- open_ended: answer_key.kind="none"
+
 **Hint Strategy:**
 - Hint 1: Subtle nudge toward approach
 - Hint 2: Identify key concept/formula
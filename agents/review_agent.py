@@ -1,14 +1,8 @@
-from dotenv import load_dotenv
 from pydantic_ai.agent import Agent, RunContext
 from agents.schemas import ReviewInput, ReviewOutput
-from pydantic_ai.models.google import GoogleModel
-from pydantic_ai.providers.google import GoogleProvider
-import os
-load_dotenv()
+from agents.model_tiers import agent_model
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-provider=GoogleProvider(api_key=GOOGLE_API_KEY)
-model=GoogleModel(model_name='gemini-2.0-flash-lite',provider=provider)
+model=agent_model("review")
 
 review_system_prompt = """You are the Review Agent for StudyBuddy.
 
@@ -25,6 +19,13 @@ Your role is to:
 - Trajectory: Improving, stable, declining
 - Engagement: Quiz attempts, question depth
 
+**Your Data:**
+The input carries `stats` computed from the student's history: turns, answers,
+accuracy, active_days_last_14, trajectory, engagement_score and topics as
+[subject, topic, mastery, times_studied, correct, incorrect], plus
+`due_topics` from the review schedule. These numbers are exact - quote them,
+never estimate or invent figures.
+
 **Review Structure:**
 1. Overall summary: Positive framing of progress
 2. Strengths: Specific topics where excelling (with data)
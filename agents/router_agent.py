@@ -1,14 +1,8 @@
-from dotenv import load_dotenv
 from pydantic_ai.agent import Agent, RunContext
 from agents.schemas import RouterInput, RouterOutput
-from pydantic_ai.models.google import GoogleModel
-from pydantic_ai.providers.google import GoogleProvider
-import os
-load_dotenv()
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-provider=GoogleProvider(api_key=GOOGLE_API_KEY)
-model=GoogleModel(model_name='gemini-2.0-flash-lite',provider=provider)
+from agents.model_tiers import agent_model
+
+model=agent_model("router")
 
 router_system_prompt = """You are the Router Agent for StudyBuddy, an AI tutoring system.
 
@@ -56,6 +56,13 @@ class QuizGeneratorInput(BaseModel):
     num_problems: int = 1
     problem_type: str = "mixed"  # multiple_choice, open_ended, calculation, mixed
 
+class AnswerKey(BaseModel):
+    kind: str = Field(description="choice, numeric, expression, or none for open-ended problems")
+    choice: Optional[str] = Field(default=None, description="Correct option letter for multiple choice, e.g. 'B'")
+    value: Optional[float] = Field(default=None, description="Correct numeric result for calculation problems")
+    tolerance: Optional[float] = Field(default=None, description="Accepted absolute error for the numeric result")
+    expression: Optional[str] = Field(default=None, description="Correct answer as a sympy-parsable expression, e.g. '(x - 2)*(x - 3)'")
+
 class QuizGeneratorOutput(BaseModel):
     problem_text: str = Field(description="The practice problem statement")
     problem_type: str = Field(description="Type of problem")
@@ -63,6 +70,7 @@ class QuizGeneratorOutput(BaseModel):
     expected_concepts: List[str] = Field(description="Concepts the problem tests")
     difficulty: str
     sample_solution_approach: str = Field(description="How to approach solving this")
+    answer_key: Optional[AnswerKey] = Field(default=None, description="Machine-checkable answer for multiple_choice and calculation problems")
 
 
 # Quiz Evaluator I/O
@@ -90,6 +98,8 @@ class ReviewInput(BaseModel):
     subject: Optional[str] = None
     topic: Optional[str] = None
     time_period: str = "recent"  # recent, week, month, all
+    stats: dict = Field(default_factory=dict, description="Precomputed stats (database/analytics.py)")
+    due_topics: List[str] = Field(default_factory=list, description="Topics due for spaced repetition")
 
 class ReviewOutput(BaseModel):
     summary: str = Field(description="Overview of learning progress")
@@ -105,6 +115,7 @@ class ReviewOutput(BaseModel):
 class ProgressTrackerInput(BaseModel):
     student_id: str
     recent_interactions: List[dict]
+    stats: dict = Field(default_factory=dict, description="Precomputed stats (database/analytics.py)")
 
 class ProgressTrackerOutput(BaseModel):
     overall_trajectory: str = Field(description="improving, stable, declining")
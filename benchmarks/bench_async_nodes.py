@@ -0,0 +1,133 @@
+"""
+StudyBuddy - Async Node Concurrency Benchmark
+Compares the native async graph nodes against the old run_sync pattern
+
+Every agent is swapped for a pydantic-ai FunctionModel that simulates Gemini
+latency with a non-blocking sleep, so no network access or API key is needed.
+
+Every turn must make both of its LLM calls, so the optimizations that skip or
+add calls are switched off: the router fast path, the teacher cache, problem
+prefetch and speculation.
+
+Usage:
+    python benchmarks/bench_async_nodes.py --requests 200 --latency-ms 250
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+# Per-node logging would dominate the measurement
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Identical turns would otherwise be answered from the teacher cache
+for flag in ("TEACHER_CACHE_ENABLED", "PREFETCH_ENABLED", "SPECULATION_ENABLED"):
+    os.environ[flag] = "false"
+
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+
+import workflow.ini_graph as ini_graph
+from agents.router_agent import router_agent
+from agents.teacher_agent import teacher_agent
+
+
+ROUTER_OUTPUT = {
+    "intent": "learn",
+    "subject": "Math",
+    "topic": "Quadratic Equations",
+    "difficulty": "beginner",
+    "reasoning": "User asked for an explanation",
+    "needs_agent": True,
+}
+
+TEACHER_OUTPUT = {
+    "explanation": "A quadratic equation has the form ax^2 + bx + c = 0.",
+    "examples": ["x^2 - 4 = 0 gives x = 2 or x = -2"],
+    "check_question": "What are the roots of x^2 - 9 = 0?",
+    "key_concepts": ["roots", "factoring"],
+    "next_steps": "Try solving a few by factoring.",
+}
+
+
+def fake_model(output: dict, latency: float) -> FunctionModel:
+    """FunctionModel that answers with a fixed structured output after `latency` seconds"""
+
+    async def respond(messages, info):
+        await asyncio.sleep(latency)
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, output)])
+
+    return FunctionModel(respond)
+
+
+def as_run_sync(node):
+    """Wrap an async node the way the old nodes behaved: a sync function blocking on run_sync"""
+
+    if "config" in inspect.signature(node).parameters:
+        def sync_node(state, config):
+            return asyncio.run(node(state, config))
+    else:
+        def sync_node(state):
+            return asyncio.run(node(state))
+
+    return sync_node
+
+
+async def run_batch(num_requests: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        ini_graph.run_studybuddy_workflow("Explain quadratic equations", thread_id=f"bench_{i}")
+        for i in range(num_requests)
+    ))
+    return time.perf_counter() - start
+
+
+def bench(mode: str, num_requests: int) -> float:
+    nodes = ["router_node", "teacher_node", "quiz_generator_node", "quiz_evaluator_node"]
+    originals = {name: getattr(ini_graph, name) for name in nodes}
+    preclassify = ini_graph.preclassify
+    try:
+        # "Explain quadratic equations" would skip the router
+        ini_graph.preclassify = lambda message: None
+        if mode == "run_sync":
+            for name, node in originals.items():
+                setattr(ini_graph, name, as_run_sync(node))
+        ini_graph._graph = ini_graph.build_graph()
+        return asyncio.run(run_batch(num_requests))
+    finally:
+        for name, node in originals.items():
+            setattr(ini_graph, name, node)
+        ini_graph.preclassify = preclassify
+        ini_graph._graph = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Concurrent /chat turns")
+    parser.add_argument("--latency-ms", type=float, default=250, help="Simulated latency per LLM call")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+
+    with ExitStack() as stack:
+        stack.enter_context(router_agent.override(model=fake_model(ROUTER_OUTPUT, latency)))
+        stack.enter_context(teacher_agent.override(model=fake_model(TEACHER_OUTPUT, latency)))
+
+        results = {mode: bench(mode, args.requests) for mode in ("run_sync", "async")}
+
+    ideal = 2 * latency
+    print(f"{args.requests} concurrent learn turns, 2 LLM calls each @ {args.latency_ms:.0f}ms")
+    print(f"{'mode':<10} {'wall (s)':>10} {'turns/s':>10}")
+    for mode, elapsed in results.items():
+        print(f"{mode:<10} {elapsed:>10.2f} {args.requests / elapsed:>10.1f}")
+    print(f"ideal (fully concurrent): {ideal:.2f}s")
+    print(f"speedup: {results['run_sync'] / results['async']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+StudyBuddy - Router Fast Path Benchmark
+Reports how many turns the local pre-classifier answers without the router LLM
+
+Runs a representative message mix through workflow.fast_path.preclassify and
+estimates the latency saved against a given router round-trip time.
+
+Usage:
+    python benchmarks/bench_fast_path.py --router-ms 900
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow import fast_path
+
+
+# Rough shape of real traffic: short social turns, direct requests, free-form questions
+MESSAGES = [
+    "hi", "Hello!", "hey there", "good morning", "thanks", "Thank you so much!", "thx", "bye",
+    "tell me a joke", "what's the weather like",
+    "quiz me on quadratic equations", "Test me on photosynthesis", "give me some problems on derivatives",
+    "quiz me on the french revolution",
+    "explain photosynthesis", "Explain Newton's second law", "what is a covalent bond?",
+    "teach me about mitosis", "how does gravity work", "explain the causes of world war 1",
+    "I don't get why the discriminant tells us the number of roots",
+    "can you go over that last example again but slower",
+    "My teacher said something about moles today, no idea what she meant",
+    "why is the sky blue", "help with my homework on fractions please",
+    "how am I doing so far?", "what should I study next",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--router-ms", type=float, default=900, help="Typical router LLM round trip")
+    parser.add_argument("--repeat", type=int, default=1000, help="Passes over the message mix")
+    args = parser.parse_args()
+
+    print(f"{'message':<60} {'decision'}")
+    for message in MESSAGES:
+        decision = fast_path.apply_rules(message)
+        label = f"{decision.confidence} ({decision.rule})" if decision else "router"
+        print(f"{message[:58]:<60} {label}")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for message in MESSAGES:
+            fast_path.preclassify(message)
+    elapsed = time.perf_counter() - start
+
+    stats = fast_path.fast_path_stats()
+    saved_per_turn = stats["hit_rate"] * args.router_ms
+    print()
+    print(f"hit rate (router skipped): {stats['hit_rate']:.1%}")
+    print(f"likely (router still runs): {stats['likely'] / stats['calls']:.1%}")
+    print(f"local classify cost: {1e6 * elapsed / stats['calls']:.1f}µs per message")
+    print(f"avg router latency saved: {saved_per_turn:.0f}ms per turn @ {args.router_ms:.0f}ms/router call")
+
+
+if __name__ == "__main__":
+    main()
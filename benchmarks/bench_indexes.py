@@ -0,0 +1,230 @@
+"""
+StudyBuddy - Index Benchmark
+Times the hot progress / conversation / problem-bank queries before and after
+the composite indexes in database/models.py
+
+Builds a synthetic dataset (1M conversations by default), drops the indexes,
+times each query, then runs database.migrations.upgrade() - the same path an
+existing deployment takes - and times them again. Query plans are printed for
+both passes (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on Postgres).
+
+Runs against a throwaway SQLite file unless BENCH_DATABASE_URL is set. Point
+that at a scratch database only: the indexes are dropped and rebuilt (synthetic
+rows are prefixed "bench_" and deleted afterwards).
+
+Usage:
+    python benchmarks/bench_indexes.py --plans
+    python benchmarks/bench_indexes.py --conversations 200000 --students 2000
+    BENCH_DATABASE_URL=postgresql://localhost/scratch python benchmarks/bench_indexes.py
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/index_bench.db"
+
+from sqlalchemy import delete, func, insert, select, text
+
+from database.db import Base, engine
+from database.migrations import upgrade
+from database.models import Conversation, IntentEnum, MasteryLevelEnum, PracticeProblem, Student, TopicProgress
+
+SUBJECTS = {
+    "math": ["algebra", "geometry", "calculus", "fractions", "probability", "quadratic equations"],
+    "physics": ["gravity", "momentum", "optics", "electricity", "thermodynamics"],
+    "chemistry": ["moles", "covalent bonds", "acids and bases", "stoichiometry"],
+    "biology": ["photosynthesis", "mitosis", "genetics", "ecosystems"],
+}
+TOPICS = [(subject, topic) for subject, topics in SUBJECTS.items() for topic in topics]
+DIFFICULTIES = ["beginner", "intermediate", "advanced"]
+CHUNK = 20000
+
+
+def student_id(index: int) -> str:
+    return f"bench_{index:06d}"
+
+
+# ============================================================
+# DATASET
+# ============================================================
+
+def drop_indexes():
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+
+def clear():
+    with engine.begin() as conn:
+        for model in (Conversation, TopicProgress, Student):
+            column = model.student_id if model is not Student else model.id
+            conn.execute(delete(model).where(column.like("bench_%")))
+        conn.execute(delete(PracticeProblem).where(PracticeProblem.problem_text.like("bench_%")))
+
+
+def insert_chunked(conn, model, rows):
+    for start in range(0, len(rows), CHUNK):
+        conn.execute(insert(model), rows[start:start + CHUNK])
+
+
+def load(args, rng: random.Random):
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        insert_chunked(conn, Student, [{"id": student_id(i)} for i in range(args.students)])
+
+        progress = []
+        for i in range(args.students):
+            for subject, topic in rng.sample(TOPICS, args.topics_per_student):
+                progress.append({
+                    "student_id": student_id(i), "subject": subject, "topic": topic,
+                    "mastery_level": rng.choice(list(MasteryLevelEnum)),
+                    "times_studied": rng.randint(1, 20), "times_correct": rng.randint(0, 10),
+                    "times_incorrect": rng.randint(0, 10),
+                    "next_review_date": now + timedelta(days=rng.randint(-30, 30)),
+                })
+        insert_chunked(conn, TopicProgress, progress)
+
+        insert_chunked(conn, PracticeProblem, [
+            {
+                "subject": subject, "topic": topic, "difficulty": rng.choice(DIFFICULTIES),
+                "problem_text": f"bench_{i}", "times_used": 0,
+            }
+            for i, (subject, topic) in enumerate(rng.choice(TOPICS) for _ in range(args.problems))
+        ])
+
+        for offset in range(0, args.conversations, CHUNK):
+            batch = []
+            for _ in range(min(CHUNK, args.conversations - offset)):
+                subject, topic = rng.choice(TOPICS)
+                batch.append({
+                    "student_id": student_id(rng.randrange(args.students)),
+                    "user_message": "explain this", "assistant_response": "an explanation",
+                    "subject": subject, "topic": topic, "intent": IntentEnum.LEARN,
+                    "difficulty": "intermediate", "primary_agent": "teacher",
+                    "timestamp": now - timedelta(seconds=rng.randrange(90 * 86400)),
+                })
+            conn.execute(insert(Conversation), batch)
+
+    print(
+        f"loaded {args.conversations} conversations, {len(progress)} topic_progress rows, "
+        f"{args.problems} problems in {time.perf_counter() - start:.1f}s"
+    )
+
+
+# ============================================================
+# QUERIES
+# ============================================================
+
+def queries(rng: random.Random, students: int) -> dict:
+    """name -> builder for a query with fresh random parameters"""
+    def recent_conversations():
+        return (
+            select(Conversation)
+            .where(Conversation.student_id == student_id(rng.randrange(students)))
+            .order_by(Conversation.timestamp.desc())
+            .limit(20)
+        )
+
+    def topic_progress():
+        subject, topic = rng.choice(TOPICS)
+        return select(TopicProgress).where(
+            TopicProgress.student_id == student_id(rng.randrange(students)),
+            TopicProgress.subject == subject,
+            TopicProgress.topic == topic,
+        )
+
+    def due_for_review():
+        return select(TopicProgress).where(
+            TopicProgress.student_id == student_id(rng.randrange(students)),
+            TopicProgress.next_review_date <= datetime.utcnow(),
+        )
+
+    def problem_bank():
+        subject, topic = rng.choice(TOPICS)
+        return select(func.count()).select_from(PracticeProblem).where(
+            PracticeProblem.subject == subject,
+            PracticeProblem.topic == topic,
+            PracticeProblem.difficulty == rng.choice(DIFFICULTIES),
+        )
+
+    return {
+        "recent_conversations": recent_conversations,
+        "topic_progress": topic_progress,
+        "due_for_review": due_for_review,
+        "problem_bank": problem_bank,
+    }
+
+
+def explain(conn, query) -> str:
+    compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    rows = conn.execute(text(f"{prefix} {compiled}")).fetchall()
+    return " | ".join(str(row[-1]) for row in rows)
+
+
+def measure(students: int, repeat: int, seed: int, show_plans: bool) -> dict:
+    rng = random.Random(seed)
+    results = {}
+    with engine.connect() as conn:
+        for name, build in queries(rng, students).items():
+            if show_plans:
+                print(f"  {name}: {explain(conn, build())}")
+            timings = []
+            for _ in range(repeat):
+                query = build()
+                start = time.perf_counter()
+                conn.execute(query).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=1_000_000, help="Synthetic conversation rows")
+    parser.add_argument("--students", type=int, default=10_000, help="Synthetic students")
+    parser.add_argument("--topics-per-student", type=int, default=10, help="topic_progress rows per student")
+    parser.add_argument("--problems", type=int, default=50_000, help="Synthetic practice problems")
+    parser.add_argument("--repeat", type=int, default=50, help="Runs per query (median reported)")
+    parser.add_argument("--plans", action="store_true", help="Print query plans")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic rows afterwards")
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    print(f"database: {engine.dialect.name}")
+    upgrade(engine)
+    clear()
+    drop_indexes()
+    load(args, rng)
+
+    print("without indexes")
+    before = measure(args.students, args.repeat, 1, args.plans)
+
+    start = time.perf_counter()
+    upgrade(engine)
+    print(f"migration (index build): {time.perf_counter() - start:.1f}s")
+
+    print("with indexes")
+    after = measure(args.students, args.repeat, 1, args.plans)
+
+    print()
+    print(f"{'query':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in before:
+        print(f"{name:<22} {before[name]:>10.3f} {after[name]:>10.3f} {before[name] / max(after[name], 1e-6):>7.0f}x")
+
+    if not args.keep:
+        clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+StudyBuddy - Write-Behind Benchmark
+Compares one transaction per Conversation row with batched write-behind flushes
+
+per-row:  every simulated /chat call opens a SessionLocal, adds one
+          Conversation and commits (on a worker thread, like a sync handler)
+batched:  every call only puts the row into a WriteBehindBuffer; flusher tasks
+          write batches with bulk_insert (executemany, COPY on Postgres)
+
+Reports throughput, what the caller waits per row (p50/p95) and the number of
+transactions. Uses DATABASE_URL when set (point it at Postgres to measure COPY),
+otherwise a throwaway SQLite file.
+
+Usage:
+    python benchmarks/bench_write_behind.py --rows 5000 --concurrency 50
+    DATABASE_URL=postgresql://... python benchmarks/bench_write_behind.py --batch-size 500
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/write_behind_bench.db"
+
+from sqlalchemy import delete
+
+from database.db import SessionLocal, engine
+from database.migrations import upgrade
+from database.models import Conversation, IntentEnum, Student
+from database.write_behind import WriteBehindBuffer, bulk_insert
+
+STUDENT_ID = "bench_student"
+
+
+def make_row(index: int) -> dict:
+    return {
+        "student_id": STUDENT_ID,
+        "user_message": f"explain quadratic equations ({index})",
+        "assistant_response": "Here is how quadratic equations work. " * 20,
+        "subject": "math",
+        "topic": "quadratic equations",
+        "intent": IntentEnum.LEARN,
+        "difficulty": "intermediate",
+        "primary_agent": "teacher",
+        "session_id": f"thread_{index % 100}",
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def reset():
+    upgrade(engine)
+    with SessionLocal() as db:
+        db.execute(delete(Conversation).where(Conversation.student_id == STUDENT_ID))
+        if db.get(Student, STUDENT_ID) is None:
+            db.add(Student(id=STUDENT_ID))
+        db.commit()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def drive(rows: int, concurrency: int, write_one) -> list[float]:
+    """Call write_one for every row from `concurrency` simulated requests; returns caller waits"""
+    waits: list[float] = []
+    next_index = iter(range(rows))
+
+    async def client():
+        for index in next_index:
+            start = time.perf_counter()
+            await write_one(make_row(index))
+            waits.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return waits
+
+
+# ============================================================
+# STRATEGIES
+# ============================================================
+
+def commit_one(row: dict):
+    with SessionLocal() as db:
+        db.add(Conversation(**row))
+        db.commit()
+
+
+async def per_row(rows: int, concurrency: int) -> dict:
+    async def write_one(row: dict):
+        await asyncio.to_thread(commit_one, row)
+
+    start = time.perf_counter()
+    waits = await drive(rows, concurrency, write_one)
+    return {"seconds": time.perf_counter() - start, "waits": waits, "transactions": rows}
+
+
+def commit_batch(batch: list[dict]):
+    with SessionLocal() as db:
+        bulk_insert(db, Conversation.__table__, batch)
+        db.commit()
+
+
+async def batched(rows: int, concurrency: int, batch_size: int, flushers: int) -> dict:
+    async def flush(batch: list[dict]):
+        await asyncio.to_thread(commit_batch, batch)
+
+    buffer = WriteBehindBuffer(flush, max_rows=batch_size * 10, batch_size=batch_size, flushers=flushers)
+    buffer.start()
+    start = time.perf_counter()
+    waits = await drive(rows, concurrency, buffer.put)
+    # Rows only count once they are in the database
+    await buffer.close()
+    stats = buffer.stats()
+    return {
+        "seconds": time.perf_counter() - start,
+        "waits": waits,
+        "transactions": stats["batches"],
+        "waited_for_room": stats["waited"],
+    }
+
+
+def count_rows() -> int:
+    with SessionLocal() as db:
+        return db.query(Conversation).filter(Conversation.student_id == STUDENT_ID).count()
+
+
+def report(name: str, result: dict, rows: int):
+    waits_ms = [w * 1000 for w in result["waits"]]
+    print(
+        f"{name:<10} {rows / result['seconds']:>10.0f} {statistics.median(waits_ms):>12.3f} "
+        f"{percentile(waits_ms, 95):>12.3f} {result['transactions']:>8}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="Conversation rows to write")
+    parser.add_argument("--concurrency", type=int, default=50, help="Simulated concurrent requests")
+    parser.add_argument("--batch-size", type=int, default=200, help="Rows per write-behind flush")
+    parser.add_argument("--flushers", type=int, default=2, help="Concurrent write-behind flushes")
+    args = parser.parse_args()
+
+    print(f"database: {engine.dialect.name}, rows: {args.rows}, concurrency: {args.concurrency}")
+    print(f"{'strategy':<10} {'rows/s':>10} {'p50 wait ms':>12} {'p95 wait ms':>12} {'commits':>8}")
+
+    reset()
+    result = asyncio.run(per_row(args.rows, args.concurrency))
+    assert count_rows() == args.rows
+    report("per-row", result, args.rows)
+
+    reset()
+    result = asyncio.run(batched(args.rows, args.concurrency, args.batch_size, args.flushers))
+    assert count_rows() == args.rows
+    report("batched", result, args.rows)
+    if result["waited_for_room"]:
+        print(f"  (backpressure: {result['waited_for_room']} puts waited for a flush)")
+
+
+if __name__ == "__main__":
+    main()
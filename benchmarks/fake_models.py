@@ -0,0 +1,206 @@
+"""
+StudyBuddy - Deterministic Fake Models for Offline Benchmarks
+pydantic-ai FunctionModels standing in for every agent in agents/
+
+Each fake answers with a plausible structured output derived from the prompt,
+after a simulated latency (mean + seeded jitter), and reports configurable
+token counts so usage accounting behaves like production.
+
+Usage:
+    with fake_agents(latency=0.3, jitter=0.1):
+        await run_studybuddy_workflow(...)
+"""
+
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+# Per-node logging would dominate the measurement
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+from pydantic_ai.usage import RequestUsage
+
+from agents.progress_tracker_agent import progress_tracker_agent
+from agents.quiz_evaluator_agent import quiz_evaluator_agent
+from agents.quiz_generator_agent import quiz_generator_agent
+from agents.review_agent import review_agent
+from agents.router_agent import router_agent
+from agents.teacher_agent import teacher_agent
+
+
+@dataclass
+class FakeSettings:
+    latency: float = 0.0        # mean seconds per LLM call
+    jitter: float = 0.0         # +/- uniform seconds
+    input_tokens: int = 600
+    output_tokens: int = 250
+    seed: int = 7
+
+
+def _last_prompt(messages) -> str:
+    for message in reversed(messages):
+        for part in reversed(getattr(message, "parts", [])):
+            content = getattr(part, "content", None)
+            if isinstance(content, str) and getattr(part, "part_kind", "") == "user-prompt":
+                return content
+    return ""
+
+
+def _field(prompt: str, name: str, default: str = "") -> str:
+    match = re.search(rf"^{name}:\s*(.+)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else default
+
+
+# ============================================================
+# CANNED OUTPUTS (derived from the prompt)
+# ============================================================
+
+def router_output(prompt: str) -> dict:
+    text = prompt.lower()
+    if any(k in text for k in ("quiz", "practice", "problem", "test me")):
+        intent = "practice"
+    elif any(k in text for k in ("how am i doing", "progress", "review")):
+        intent = "review"
+    elif any(k in text for k in ("hi", "hello", "thanks")) and len(text) < 20:
+        intent = "greeting"
+    else:
+        intent = "learn"
+    return {
+        "intent": intent,
+        "subject": "Math",
+        "topic": "Quadratic Equations",
+        "difficulty": "intermediate",
+        "reasoning": "benchmark router",
+        "direct_response": "Hi! What would you like to study?" if intent == "greeting" else None,
+        "needs_agent": intent != "greeting",
+    }
+
+
+def teacher_output(prompt: str) -> dict:
+    topic = _field(prompt, "Topic", "this topic")
+    return {
+        "explanation": f"Here is how {topic} works. " + "It builds step by step on simpler ideas. " * 12,
+        "examples": [f"A first worked example of {topic}.", f"A second, slightly harder example of {topic}."],
+        "analogies": [f"{topic} is like following a recipe."],
+        "check_question": f"Can you apply {topic} to a new case?",
+        "key_concepts": [topic, "worked examples"],
+        "next_steps": "Try a practice problem next.",
+    }
+
+
+def quiz_generator_output(prompt: str) -> dict:
+    topic = _field(prompt, "Topic", "this topic")
+    return {
+        "problem_text": f"Solve this {topic} problem: x^2 - 5x + 6 = 0. Show your work.",
+        "problem_type": "open_ended",
+        "hints": ["Look for two numbers that multiply to 6.", "They also add to -5."],
+        "expected_concepts": [topic, "factoring"],
+        "difficulty": _field(prompt, "Difficulty", "intermediate"),
+        "sample_solution_approach": "Factor into (x - 2)(x - 3).",
+        "answer_key": {"kind": "none"},
+    }
+
+
+def quiz_evaluator_output(prompt: str) -> dict:
+    answer = _field(prompt, "Student Answer").lower()
+    if answer.startswith("no idea"):
+        correct, retry, score = False, False, 0.0
+    elif answer.startswith("maybe"):
+        correct, retry, score = False, True, 0.4
+    else:
+        correct, retry, score = True, False, 1.0
+    return {
+        "correctness": score,
+        "is_correct": correct,
+        "feedback": "Nice reasoning." if correct else "Check the sign of your roots.",
+        "misconceptions": [] if correct else ["sign error"],
+        "strengths": ["clear steps"],
+        "next_hint": "Try factoring again." if retry else None,
+        "should_retry": retry,
+        "mastery_update": "proficient" if correct else "learning",
+    }
+
+
+def review_output(prompt: str) -> dict:
+    return {
+        "summary": "Steady progress this week.",
+        "topics_covered": [{"topic": "Quadratic Equations", "mastery": "learning", "times_studied": 3}],
+        "strengths": ["Quadratic Equations"],
+        "areas_for_improvement": ["Factoring speed"],
+        "study_recommendations": ["Do two more factoring problems."],
+        "next_review_topics": ["Quadratic Equations"],
+        "motivational_message": "Keep going!",
+    }
+
+
+def progress_tracker_output(prompt: str) -> dict:
+    return {
+        "overall_trajectory": "improving",
+        "mastery_changes": [{"topic": "Quadratic Equations", "from": "learning", "to": "proficient"}],
+        "learning_velocity": "moderate",
+        "engagement_score": 0.7,
+        "intervention_needed": False,
+        "recommendations": ["Keep practicing daily."],
+    }
+
+
+# (agent, output builder) - agents are not hashable, so this is a list
+FAKE_OUTPUTS = [
+    (router_agent, router_output),
+    (teacher_agent, teacher_output),
+    (quiz_generator_agent, quiz_generator_output),
+    (quiz_evaluator_agent, quiz_evaluator_output),
+    (review_agent, review_output),
+    (progress_tracker_agent, progress_tracker_output),
+]
+
+
+# ============================================================
+# FUNCTION MODELS
+# ============================================================
+
+def fake_model(build_output, settings: FakeSettings, rng: random.Random) -> FunctionModel:
+    """FunctionModel answering with build_output(prompt) after a simulated delay"""
+
+    def delay() -> float:
+        return max(0.0, settings.latency + rng.uniform(-settings.jitter, settings.jitter))
+
+    def usage() -> RequestUsage:
+        return RequestUsage(input_tokens=settings.input_tokens, output_tokens=settings.output_tokens)
+
+    async def respond(messages, info):
+        await asyncio.sleep(delay())
+        output = build_output(_last_prompt(messages))
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, output)], usage=usage())
+
+    async def stream(messages, info):
+        # Same total latency as `respond`, spread over ~20 chunks
+        payload = json.dumps(build_output(_last_prompt(messages)))
+        chunk = max(1, len(payload) // 20)
+        pause = delay() / 20
+        for i in range(0, len(payload), chunk):
+            await asyncio.sleep(pause)
+            name = info.output_tools[0].name if i == 0 else None
+            yield {0: DeltaToolCall(name=name, json_args=payload[i:i + chunk])}
+
+    return FunctionModel(respond, stream_function=stream)
+
+
+@contextmanager
+def fake_agents(**settings):
+    """Override every agent in agents/ with a deterministic fake model"""
+    config = FakeSettings(**settings)
+    rng = random.Random(config.seed)
+    with ExitStack() as stack:
+        for agent, build_output in FAKE_OUTPUTS:
+            stack.enter_context(agent.override(model=fake_model(build_output, config, rng)))
+        yield config
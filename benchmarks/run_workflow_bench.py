@@ -0,0 +1,266 @@
+"""
+StudyBuddy - Offline Workflow Benchmark
+Drives the graph (or /chat) with scripted study sessions against fake models
+
+No network or API keys needed: every agent is replaced by a FunctionModel from
+fake_models.py with configurable latency and token counts. With the default
+--latency-ms 0 the numbers are pure orchestration overhead, which is what CI
+tracks for regressions.
+
+Reports p50/p95/p99 turn latency (overall and per step), throughput, checkpoint
+size growth across a session and memory per thread.
+
+The scripted sessions repeat the same messages, so the features that skip LLM
+calls for repeated or predictable turns (teacher cache, router fast path,
+speculation, problem prefetch) would serve most of them. Each run is measured
+twice: "uncached" with those features pinned off, then "cached" with them on.
+The --max-p95-ms gate applies to the uncached run.
+
+Usage:
+    python benchmarks/run_workflow_bench.py --sessions 200 --concurrency 50
+    python benchmarks/run_workflow_bench.py --target api --latency-ms 300 --jitter-ms 100
+    python benchmarks/run_workflow_bench.py --json bench.json --max-p95-ms 50
+    python benchmarks/run_workflow_bench.py --runs uncached
+
+Cassettes (workflow/cassette.py): record a run once, then replay it so agent
+calls are served from disk instead of the fake models:
+    python benchmarks/run_workflow_bench.py --cassette calls.jsonl --cassette-mode record
+    python benchmarks/run_workflow_bench.py --cassette calls.jsonl --cassette-mode replay
+A cassette recorded in production (STUDYBUDDY_CASSETTE_MODE=record) replays the
+same way as long as the scripted sessions send the recorded messages.
+"""
+
+from collections import defaultdict
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_models import fake_agents
+from scenarios import session_for
+
+from workflow.cassette import use_cassette
+import workflow.ini_graph as ini_graph
+import workflow.prefetch as prefetch
+import workflow.semantic_cache as semantic_cache
+
+
+# ============================================================
+# CACHED / UNCACHED RUNS
+# ============================================================
+
+RUNS = ("uncached", "cached")
+
+
+@contextlib.contextmanager
+def llm_call_savers(enabled: bool):
+    """Switch the teacher cache, fast path, speculation and prefetch on or off"""
+    saved = (
+        semantic_cache.TEACHER_CACHE_ENABLED, prefetch.PREFETCH_ENABLED,
+        ini_graph.SPECULATION_ENABLED, ini_graph.preclassify,
+    )
+    if not enabled:
+        semantic_cache.TEACHER_CACHE_ENABLED = False
+        prefetch.PREFETCH_ENABLED = False
+        ini_graph.SPECULATION_ENABLED = False
+        ini_graph.preclassify = lambda message: None
+    try:
+        yield
+    finally:
+        (
+            semantic_cache.TEACHER_CACHE_ENABLED, prefetch.PREFETCH_ENABLED,
+            ini_graph.SPECULATION_ENABLED, ini_graph.preclassify,
+        ) = saved
+
+
+# ============================================================
+# DRIVERS
+# ============================================================
+
+async def graph_driver():
+    async def send(message: str, thread_id: str) -> dict:
+        return await ini_graph.run_studybuddy_workflow(message, thread_id=thread_id)
+    yield send
+
+
+async def api_driver():
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def send(message: str, thread_id: str) -> dict:
+            response = await client.post("/chat", json={"message": message, "thread_id": thread_id})
+            response.raise_for_status()
+            return response.json()
+        yield send
+
+
+DRIVERS = {"graph": graph_driver, "api": api_driver}
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_sessions(send, sessions: int, concurrency: int, prefix: str):
+    latencies: dict[str, list[float]] = defaultdict(list)
+    checkpoint_bytes: dict[int, list[int]] = defaultdict(list)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int):
+        async with semaphore:
+            thread_id = f"{prefix}_{index}"
+            for turn, (step, message) in enumerate(session_for(index)):
+                start = time.perf_counter()
+                result = await send(message, thread_id)
+                latencies[step].append(time.perf_counter() - start)
+                size = result["metadata"].get("checkpoint_bytes")
+                if size is not None:
+                    checkpoint_bytes[turn].append(size)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(i) for i in range(sessions)))
+    return latencies, checkpoint_bytes, time.perf_counter() - start
+
+
+async def measure_memory(send, sessions: int, prefix: str) -> float:
+    """Bytes retained per thread after running `sessions` complete sessions"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await run_sessions(send, sessions, concurrency=sessions, prefix=f"{prefix}_mem")
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return retained / sessions
+
+
+async def benchmark(args, run: str) -> dict:
+    ini_graph._graph = None
+    driver = DRIVERS[args.target]()
+    send = await driver.__anext__()
+    try:
+        # Warm up imports, graph compilation and caches outside the measurement
+        await run_sessions(send, 2, 2, prefix=f"{run}_warmup")
+
+        latencies, checkpoint_bytes, wall = await run_sessions(send, args.sessions, args.concurrency, f"{run}_bench")
+        memory_per_thread = await measure_memory(send, args.memory_sessions, run) if args.memory_sessions else None
+    finally:
+        with contextlib.suppress(StopAsyncIteration):
+            await driver.__anext__()
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    to_ms = lambda seconds: round(1000 * seconds, 3)
+    return {
+        "run": run,
+        "target": args.target,
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+        "turns": len(all_latencies),
+        "wall_s": round(wall, 3),
+        "throughput_turns_per_s": round(len(all_latencies) / wall, 1),
+        "p50_ms": to_ms(percentile(all_latencies, 50)),
+        "p95_ms": to_ms(percentile(all_latencies, 95)),
+        "p99_ms": to_ms(percentile(all_latencies, 99)),
+        "steps": {
+            step: {
+                "p50_ms": to_ms(percentile(values, 50)),
+                "p95_ms": to_ms(percentile(values, 95)),
+                "p99_ms": to_ms(percentile(values, 99)),
+            }
+            for step, values in latencies.items()
+        },
+        "checkpoint_bytes_by_turn": [
+            round(statistics.mean(checkpoint_bytes[turn])) for turn in sorted(checkpoint_bytes)
+        ],
+        "memory_per_thread_bytes": round(memory_per_thread) if memory_per_thread is not None else None,
+    }
+
+
+def print_report(report: dict):
+    print(f"[{report['run']}] target={report['target']} sessions={report['sessions']} "
+          f"concurrency={report['concurrency']} llm_latency={report['latency_ms']}ms")
+    print(f"turns: {report['turns']} in {report['wall_s']}s → {report['throughput_turns_per_s']} turns/s")
+    print(f"latency: p50={report['p50_ms']}ms p95={report['p95_ms']}ms p99={report['p99_ms']}ms")
+    print()
+    print(f"{'step':<16} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for step, values in report["steps"].items():
+        print(f"{step:<16} {values['p50_ms']:>10} {values['p95_ms']:>10} {values['p99_ms']:>10}")
+    print()
+    print(f"checkpoint bytes by turn: {report['checkpoint_bytes_by_turn']}")
+    if report["memory_per_thread_bytes"] is not None:
+        print(f"memory per thread: {report['memory_per_thread_bytes'] / 1024:.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=DRIVERS, default="graph", help="Drive the graph directly or /chat")
+    parser.add_argument("--sessions", type=int, default=100, help="Scripted study sessions (one thread each)")
+    parser.add_argument("--concurrency", type=int, default=25, help="Sessions in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Mean simulated LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--input-tokens", type=int, default=600, help="Reported input tokens per call")
+    parser.add_argument("--output-tokens", type=int, default=250, help="Reported output tokens per call")
+    parser.add_argument("--memory-sessions", type=int, default=50, help="Sessions for the memory pass (0 to skip)")
+    parser.add_argument("--cassette", help="Record agent calls to / replay them from this JSONL file")
+    parser.add_argument("--cassette-mode", choices=("record", "replay"), default="replay")
+    parser.add_argument("--runs", choices=("both",) + RUNS, default="both",
+                        help="Measure with the LLM-call-saving features off (uncached), on (cached), or both")
+    parser.add_argument("--json", help="Write the reports ({run: report}) to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit non-zero if uncached p95 turn latency exceeds this")
+    args = parser.parse_args()
+    runs = RUNS if args.runs == "both" else (args.runs,)
+    if args.max_p95_ms is not None and "uncached" not in runs:
+        parser.error("--max-p95-ms gates the uncached run; use --runs uncached or both")
+
+    if args.cassette:
+        if args.cassette_mode == "record" and os.path.exists(args.cassette):
+            os.remove(args.cassette)
+        tape = use_cassette(args.cassette, args.cassette_mode)
+
+    with fake_agents(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        input_tokens=args.input_tokens,
+        output_tokens=args.output_tokens,
+    ):
+        reports = {}
+        for run in runs:
+            with llm_call_savers(enabled=run == "cached"):
+                reports[run] = asyncio.run(benchmark(args, run))
+
+    for report in reports.values():
+        print_report(report)
+        print()
+    if args.cassette:
+        print(f"cassette: {tape.stats()}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+    if args.max_p95_ms is not None and reports["uncached"]["p95_ms"] > args.max_p95_ms:
+        print(f"❌ uncached p95 {reports['uncached']['p95_ms']}ms exceeds budget {args.max_p95_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
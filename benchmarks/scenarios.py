@@ -0,0 +1,38 @@
+"""
+StudyBuddy - Benchmark Conversation Scripts
+Realistic multi-turn study sessions: learn → quiz → answer → retry → reteach
+
+The fake evaluator in fake_models.py keys off the answer wording:
+"maybe ..." is wrong but retryable, "no idea ..." triggers a reteach,
+anything else is correct.
+"""
+
+# (subject, topic) pairs the sessions rotate through
+TOPICS = [
+    ("Math", "quadratic equations"),
+    ("Biology", "photosynthesis"),
+    ("Physics", "Newton's second law"),
+    ("Chemistry", "covalent bonds"),
+    ("Math", "derivatives"),
+    ("Biology", "mitosis"),
+]
+
+
+def study_session(topic: str) -> list[tuple[str, str]]:
+    """One full session as (step name, user message) pairs"""
+    return [
+        ("greeting", "Hi!"),
+        ("learn", f"Can you help me understand {topic}? I keep mixing it up"),
+        ("quiz", f"quiz me on {topic}"),
+        ("answer_wrong", "maybe x = 7?"),
+        ("hint", "hint"),
+        ("answer_right", "x = 2 and x = 3"),
+        ("quiz_again", "yes, another one please"),
+        ("answer_reteach", "no idea honestly"),
+        ("thanks", "thanks!"),
+    ]
+
+
+def session_for(index: int) -> list[tuple[str, str]]:
+    _, topic = TOPICS[index % len(TOPICS)]
+    return study_session(topic)
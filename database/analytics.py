@@ -0,0 +1,345 @@
+"""
+StudyBuddy - Student Analytics
+Exact per-student statistics for the review and progress tracker prompts
+
+The review and progress tracker agents used to be handed raw history and
+asked to work out topics covered, mastery, times studied, engagement and
+trajectory themselves - slow, costly and not reliably right. These numbers are
+computed here instead, and the agents only receive summary() - a compact dict
+of facts to write about.
+
+A student's stats are loaded with a few aggregate queries (topic_progress rows,
+turns per day, latest graded answers - all on the student_id indexes) and then
+kept up to date incrementally: the background writer passes every persisted
+batch to observe(), which adds its turns to the cached stats instead of
+reloading them. The writer calls begin() before persisting a batch; until the
+batch is observed (or abort()ed) its students' stats are loaded but not
+cached, so a load that already sees the batch's rows can never have the batch
+added to it a second time. Entries are LRU-bounded and reloaded after
+ANALYTICS_TTL_SECONDS, which bounds how stale stats written by another app
+process can be.
+
+Derived metrics:
+    trajectory        mean score of the latest TRAJECTORY_WINDOW graded answers vs
+                      the (up to) TRAJECTORY_WINDOW before them: improving /
+                      declining beyond ±TRAJECTORY_THRESHOLD, else stable
+    engagement_score  0.6 x active days in the last 14 (7+ counts as fully
+                      active) + 0.4 x share of turns that were graded answers
+
+Configuration (environment):
+    ANALYTICS_MAX_STUDENTS   students whose stats are cached (default: 10000)
+    ANALYTICS_TTL_SECONDS    cached stats are reloaded after this (default: 300)
+"""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+import asyncio
+import os
+import threading
+import time
+
+from sqlalchemy import func, select
+
+ANALYTICS_MAX_STUDENTS = int(os.getenv("ANALYTICS_MAX_STUDENTS", "10000"))
+ANALYTICS_TTL_SECONDS = float(os.getenv("ANALYTICS_TTL_SECONDS", "300"))
+
+ACTIVITY_WINDOW_DAYS = 14
+TRAJECTORY_WINDOW = 10
+TRAJECTORY_THRESHOLD = 0.15
+
+
+# ============================================================
+# STATS
+# ============================================================
+
+@dataclass
+class TopicStats:
+    subject: str
+    topic: str
+    mastery: Optional[str] = None
+    studied: int = 0
+    correct: int = 0
+    incorrect: int = 0
+    last_studied: Optional[datetime] = None
+
+
+@dataclass
+class StudentStats:
+    student_id: str
+    topics: dict[tuple[str, str], TopicStats] = field(default_factory=dict)
+    turns: int = 0
+    daily_turns: dict[date, int] = field(default_factory=dict)
+    # Correctness of the latest graded answers, oldest first
+    recent_results: deque = field(default_factory=lambda: deque(maxlen=2 * TRAJECTORY_WINDOW))
+
+    @property
+    def answers(self) -> int:
+        return sum(t.correct + t.incorrect for t in self.topics.values())
+
+    @property
+    def accuracy(self) -> Optional[float]:
+        answers = self.answers
+        return sum(t.correct for t in self.topics.values()) / answers if answers else None
+
+    def active_days(self, today: Optional[date] = None) -> int:
+        since = (today or datetime.utcnow().date()) - timedelta(days=ACTIVITY_WINDOW_DAYS - 1)
+        return sum(1 for day in self.daily_turns if day >= since)
+
+    @property
+    def trajectory(self) -> str:
+        results = list(self.recent_results)
+        recent, earlier = results[-TRAJECTORY_WINDOW:], results[:-TRAJECTORY_WINDOW]
+        if len(earlier) < TRAJECTORY_WINDOW // 2:
+            return "stable"
+        change = sum(recent) / len(recent) - sum(earlier) / len(earlier)
+        if change >= TRAJECTORY_THRESHOLD:
+            return "improving"
+        if change <= -TRAJECTORY_THRESHOLD:
+            return "declining"
+        return "stable"
+
+    @property
+    def engagement_score(self) -> float:
+        activity = min(1.0, self.active_days() / (ACTIVITY_WINDOW_DAYS / 2))
+        practice = min(1.0, self.answers / self.turns) if self.turns else 0.0
+        return round(0.6 * activity + 0.4 * practice, 2)
+
+    def observe(self, turns: list[dict]):
+        """Add freshly persisted turns (persistence turn records) to the stats"""
+        from database.persistence import _progress_updates
+
+        for turn in turns:
+            self.turns += 1
+            day = turn["timestamp"].date()
+            self.daily_turns[day] = self.daily_turns.get(day, 0) + 1
+            if turn.get("is_correct") is not None:
+                correctness = turn.get("correctness")
+                self.recent_results.append(float(turn["is_correct"]) if correctness is None else correctness)
+        for update in _progress_updates(turns):
+            stats = self.topics.setdefault((update.subject, update.topic), TopicStats(update.subject, update.topic))
+            stats.studied += update.studied
+            stats.correct += update.correct
+            stats.incorrect += update.incorrect
+            stats.mastery = update.mastery.value if update.mastery else stats.mastery or "learning"
+            stats.last_studied = max(stats.last_studied or update.at, update.at)
+        cutoff = datetime.utcnow().date() - timedelta(days=ACTIVITY_WINDOW_DAYS)
+        for day in [d for d in self.daily_turns if d < cutoff]:
+            del self.daily_turns[day]
+
+    def summary(self, max_topics: int = 12) -> dict:
+        """Compact facts for an agent prompt - most recently studied topics first"""
+        topics = sorted(self.topics.values(), key=lambda t: t.last_studied or datetime.min, reverse=True)
+        accuracy = self.accuracy
+        return {
+            "turns": self.turns,
+            "answers": self.answers,
+            "accuracy": round(accuracy, 2) if accuracy is not None else None,
+            "active_days_last_14": self.active_days(),
+            "trajectory": self.trajectory,
+            "engagement_score": self.engagement_score,
+            "topics_total": len(topics),
+            # [subject, topic, mastery, times_studied, correct, incorrect]
+            "topics": [
+                [t.subject, t.topic, t.mastery, t.studied, t.correct, t.incorrect]
+                for t in topics[:max_topics]
+            ],
+        }
+
+    def topics_covered(self) -> list[dict]:
+        """ReviewOutput.topics_covered"""
+        return [
+            {"topic": t.topic, "subject": t.subject, "mastery": t.mastery, "times_studied": t.studied}
+            for t in sorted(self.topics.values(), key=lambda t: t.last_studied or datetime.min, reverse=True)
+        ]
+
+
+# ============================================================
+# LOADING
+# ============================================================
+
+def _session():
+    from database.db import SessionLocal, engine
+    from database.migrations import ensure_upgraded
+    ensure_upgraded(engine)
+    return SessionLocal()
+
+
+def load_stats(student_id: str) -> StudentStats:
+    """Compute a student's stats from the database"""
+    from database.models import Conversation, TopicProgress
+
+    stats = StudentStats(student_id)
+    since = datetime.utcnow().date() - timedelta(days=ACTIVITY_WINDOW_DAYS - 1)
+    with _session() as db:
+        for row in db.scalars(select(TopicProgress).where(TopicProgress.student_id == student_id)):
+            stats.topics[(row.subject, row.topic)] = TopicStats(
+                subject=row.subject,
+                topic=row.topic,
+                mastery=row.mastery_level.value if row.mastery_level else None,
+                studied=row.times_studied or 0,
+                correct=row.times_correct or 0,
+                incorrect=row.times_incorrect or 0,
+                last_studied=row.last_studied,
+            )
+
+        mine = Conversation.student_id == student_id
+        stats.turns = db.scalar(select(func.count()).select_from(Conversation).where(mine)) or 0
+
+        day = func.date(Conversation.timestamp)
+        for value, count in db.execute(
+            select(day, func.count())
+            .where(mine, Conversation.timestamp >= datetime.combine(since, datetime.min.time()))
+            .group_by(day)
+        ):
+            # SQLite returns dates as text
+            stats.daily_turns[value if isinstance(value, date) else date.fromisoformat(value)] = count
+
+        results = db.scalars(
+            select(Conversation.correctness)
+            .where(mine, Conversation.correctness.is_not(None))
+            .order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+            .limit(stats.recent_results.maxlen)
+        ).all()
+        stats.recent_results.extend(reversed(results))
+    return stats
+
+
+def recent_interactions(student_id: str, limit: int = 5) -> list[dict]:
+    """The student's latest turns, trimmed for a prompt"""
+    from database.models import Conversation
+
+    with _session() as db:
+        rows = db.execute(
+            select(Conversation.timestamp, Conversation.subject, Conversation.topic,
+                   Conversation.intent, Conversation.primary_agent, Conversation.correctness)
+            .where(Conversation.student_id == student_id)
+            .order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+            .limit(limit)
+        ).all()
+    return [
+        {
+            "at": timestamp.isoformat(timespec="minutes") if timestamp else None,
+            "topic": f"{subject}/{topic}" if topic else None,
+            "intent": intent.value if intent else None,
+            "agent": agent,
+            "score": correctness,
+        }
+        for timestamp, subject, topic, intent, agent, correctness in reversed(rows)
+    ]
+
+
+# ============================================================
+# CACHE
+# ============================================================
+
+class StudentAnalytics:
+    """Per-student stats, loaded once and updated from persisted batches (LRU-bounded, TTL-expired)"""
+
+    def __init__(self, max_students: int = ANALYTICS_MAX_STUDENTS, ttl_seconds: float = ANALYTICS_TTL_SECONDS):
+        self.max_students = max_students
+        self.ttl_seconds = ttl_seconds
+        self._stats: OrderedDict[str, tuple[float, StudentStats]] = OrderedDict()
+        # Loads run in worker threads
+        self._lock = threading.Lock()
+        self._generation = 0
+        # student_id -> batches being written for them
+        self._pending: dict[str, int] = {}
+        self.hits = 0
+        self.loads = 0
+        self.observed = 0
+
+    def _fresh(self, student_id: str) -> Optional[StudentStats]:
+        entry = self._stats.get(student_id)
+        return entry[1] if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds else None
+
+    def cached(self, student_id: str) -> bool:
+        with self._lock:
+            return self._fresh(student_id) is not None
+
+    def get(self, student_id: str) -> StudentStats:
+        with self._lock:
+            stats = self._fresh(student_id)
+            if stats is not None:
+                self._stats.move_to_end(student_id)
+                self.hits += 1
+                return stats
+            generation = self._generation
+
+        loaded_at = time.monotonic()
+        stats = load_stats(student_id)
+        with self._lock:
+            self.loads += 1
+            if generation != self._generation or student_id in self._pending:
+                # A batch was written while loading - it may or may not be in these numbers
+                return stats
+            self._stats[student_id] = (loaded_at, stats)
+            self._stats.move_to_end(student_id)
+            while len(self._stats) > self.max_students:
+                self._stats.popitem(last=False)
+        return stats
+
+    def _release(self, student_ids: Iterable[str]):
+        for student_id in student_ids:
+            count = self._pending.get(student_id, 0) - 1
+            if count > 0:
+                self._pending[student_id] = count
+            else:
+                self._pending.pop(student_id, None)
+
+    def begin(self, turns: Iterable[dict]):
+        """A batch is about to be persisted - stop caching loads of its students until it is observed"""
+        with self._lock:
+            self._generation += 1
+            for student_id in {turn["student_id"] for turn in turns}:
+                self._pending[student_id] = self._pending.get(student_id, 0) + 1
+
+    def observe(self, turns: Iterable[dict]):
+        """Apply a persisted batch (announced with begin()) to the cached stats of its students"""
+        by_student: dict[str, list[dict]] = {}
+        for turn in turns:
+            by_student.setdefault(turn["student_id"], []).append(turn)
+        with self._lock:
+            self._generation += 1
+            for student_id, student_turns in by_student.items():
+                entry = self._stats.get(student_id)
+                if entry is not None:
+                    entry[1].observe(student_turns)
+                    self.observed += len(student_turns)
+            self._release(by_student)
+
+    def abort(self, turns: Iterable[dict]):
+        """The batch announced with begin() failed - it may or may not have been committed"""
+        student_ids = {turn["student_id"] for turn in turns}
+        with self._lock:
+            self._generation += 1
+            for student_id in student_ids:
+                self._stats.pop(student_id, None)
+            self._release(student_ids)
+
+    def invalidate(self, student_ids: Iterable[str]):
+        """Drop cached stats that were changed by something other than a persisted batch"""
+        with self._lock:
+            self._generation += 1
+            for student_id in student_ids:
+                self._stats.pop(student_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "students": len(self._stats),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "loads": self.loads,
+            "observed": self.observed,
+        }
+
+
+student_analytics = StudentAnalytics()
+
+
+async def get_student_stats(student_id: str) -> StudentStats:
+    """Cached stats without leaving the event loop; otherwise loaded in a thread"""
+    if student_analytics.cached(student_id):
+        return student_analytics.get(student_id)
+    return await asyncio.to_thread(student_analytics.get, student_id)
@@ -1,12 +1,163 @@
+"""
+StudyBuddy - Database Engines and Sessions
+Sync engine for background work, async engine for request-path reads
+
+The sync engine (SessionLocal / get_db) serves the background writers and the
+problem bank, which already run in worker threads. Request handlers use the
+async engine (AsyncSessionLocal / get_async_db) so a profile lookup waits on
+the database without blocking the event loop or hopping to a thread.
+
+Both engines share the pool settings below. A small managed Postgres allows few
+connections, so the defaults are conservative. Every worker process holds up
+to (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections per engine.
+
+Configuration (environment):
+    DATABASE_URL              postgresql://... or sqlite:///... (postgres:// is accepted)
+    DATABASE_ASYNC_URL        async URL; derived from DATABASE_URL when unset
+                              (postgresql+asyncpg / sqlite+aiosqlite)
+    DB_POOL_SIZE              connections kept open per engine (default: 5)
+    DB_MAX_OVERFLOW           extra connections under load (default: 5)
+    DB_POOL_TIMEOUT           seconds to wait for a free connection (default: 10)
+    DB_POOL_RECYCLE           reconnect connections older than this, seconds (default: 1800)
+    DB_POOL_PRE_PING          true/false - test connections on checkout (default: true)
+    DB_STATEMENT_TIMEOUT_MS   Postgres statement_timeout, 0 = none (default: 15000)
+"""
+
 from dotenv import load_dotenv
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from typing import Optional
 import os
 load_dotenv()
-DATABASE_URL=os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+
+def _normalize_url(url: Optional[str]) -> Optional[str]:
+    # Render / Heroku hand out postgres:// URLs, which SQLAlchemy no longer accepts
+    if url and url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+DATABASE_URL = _normalize_url(os.getenv("DATABASE_URL"))
+DATABASE_ASYNC_URL = _normalize_url(os.getenv("DATABASE_ASYNC_URL"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+# ============================================================
+# ENGINE OPTIONS
+# ============================================================
+
+def async_url_for(url: str) -> URL:
+    """Async driver URL for a sync DATABASE_URL"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql" and parsed.drivername != "postgresql+psycopg":
+        # psycopg 3 is async-capable as is; everything else moves to asyncpg
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+        if "sslmode" in parsed.query:
+            # asyncpg spells it ?ssl=
+            parsed = parsed.update_query_dict({"ssl": parsed.query["sslmode"]}).difference_update_query(["sslmode"])
+    elif backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed
+
+
+def engine_options(url: URL) -> dict:
+    """create_engine / create_async_engine keyword arguments for this URL"""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if url.get_backend_name() == "sqlite":
+        # File databases get SQLite's default pool; size limits only matter for servers
+        return options
+
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    if url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        if url.drivername == "postgresql+asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+# ============================================================
+# POOL METRICS
+# ============================================================
+
+class PoolMonitor:
+    """Checkout counts and utilization of one engine's pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self.max_checked_out = 0
+        self.checked_out = 0
+
+    def attach(self, engine: Engine):
+        self.pool = engine.pool
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, record):
+            self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, record, proxy):
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, record):
+            self.checked_out = max(0, self.checked_out - 1)
+
+        @event.listens_for(engine, "invalidate")
+        def on_invalidate(dbapi_connection, record, exception):
+            self.invalidated += 1
+
+    def stats(self) -> dict:
+        if self.pool is None:
+            return {}
+        size = getattr(self.pool, "size", lambda: 0)()
+        overflow = getattr(self.pool, "overflow", lambda: 0)()
+        capacity = size + max(0, getattr(self.pool, "_max_overflow", 0))
+        return {
+            "size": size,
+            "checked_out": self.checked_out,
+            "checked_in": getattr(self.pool, "checkedin", lambda: 0)(),
+            "overflow": max(0, overflow),
+            "utilization": self.checked_out / capacity if capacity else 0.0,
+            "max_checked_out": self.max_checked_out,
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "invalidated": self.invalidated,
+        }
+
+
+sync_pool = PoolMonitor("sync")
+async_pool = PoolMonitor("async")
+
+
+def pool_stats() -> dict:
+    """Pool gauges for /metrics, per engine"""
+    return {"sync": sync_pool.stats(), "async": async_pool.stats()}
+
+
+# ============================================================
+# SYNC ENGINE
+# ============================================================
+
+engine = create_engine(DATABASE_URL, **engine_options(make_url(DATABASE_URL))) if DATABASE_URL else None
+if engine is not None:
+    sync_pool.attach(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -20,3 +171,48 @@ def get_db():
         db.close()
 
 
+# ============================================================
+# ASYNC ENGINE
+# ============================================================
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+class DatabaseNotConfigured(RuntimeError):
+    """DATABASE_URL (or DATABASE_ASYNC_URL) is not set"""
+
+
+def get_async_engine():
+    """The async engine, created on first use (needs asyncpg / aiosqlite installed)"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        if not (DATABASE_ASYNC_URL or DATABASE_URL):
+            raise DatabaseNotConfigured("Set DATABASE_URL to use the database")
+        url = make_url(DATABASE_ASYNC_URL) if DATABASE_ASYNC_URL else async_url_for(DATABASE_URL)
+        _async_engine = create_async_engine(url, **engine_options(url))
+        async_pool.attach(_async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    """New AsyncSession on the async engine"""
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+async def get_async_db():
+    """FastAPI dependency: one AsyncSession per request"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_engines():
+    """Close pooled connections (app shutdown)"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
@@ -0,0 +1,181 @@
+"""
+StudyBuddy - Schema Migrations
+Idempotent upgrades for databases created by older versions of models.py
+
+create_all() only creates missing tables (with their indexes); columns and
+indexes added to existing tables are applied here. Safe to run on every startup:
+
+    python -m database.migrations
+
+The API runs migrate() from its lifespan startup hook, so no request pays for
+it and a failed migration stops the app from starting. Several workers starting
+at once serialize on a Postgres advisory lock instead of racing on DDL.
+ensure_upgraded() - a no-op once migrate() has run in the process - keeps
+scripts and benchmarks that use the database without the API working.
+
+Adding the unique (student_id, subject, topic) index to topic_progress first
+merges duplicate rows: counters are summed and the most recent mastery level is
+kept. Indexes are built with a plain CREATE INDEX, which blocks writes to that
+table while it runs - apply it during a quiet period on large databases.
+"""
+
+from contextlib import contextmanager
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+import threading
+
+from database.db import Base
+from database.models import init_db
+from workflow.telemetry import get_logger
+
+logger = get_logger("migrations")
+
+_upgraded: set[str] = set()
+_upgrade_lock = threading.Lock()
+
+# pg_advisory_lock key shared by every process migrating the same database
+MIGRATION_LOCK_ID = 0x5354_5544_5942  # "STUDYB"
+
+
+# table -> [(column, DDL type)] added after the table was first released
+ADDED_COLUMNS = {
+    "practice_problems": [
+        ("problem_type", "VARCHAR(30)"),
+        ("answer_key", "JSON"),
+    ],
+    "conversations": [
+        ("correctness", "FLOAT"),
+    ],
+    "topic_progress": [
+        ("ease_factor", "FLOAT"),
+        ("interval_days", "INTEGER"),
+        ("repetitions", "INTEGER"),
+    ],
+}
+
+
+def add_missing_columns(engine: Engine) -> list[str]:
+    """ALTER TABLE ... ADD COLUMN for every column the database does not have yet"""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for name, ddl_type in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+                    added.append(f"{table}.{name}")
+    return added
+
+
+def dedupe_topic_progress(conn) -> int:
+    """Merge rows sharing (student_id, subject, topic) into the oldest one; returns rows removed"""
+    same_key = (
+        "d.student_id = topic_progress.student_id "
+        "AND d.subject = topic_progress.subject AND d.topic = topic_progress.topic"
+    )
+    conn.execute(text(f"""
+        UPDATE topic_progress SET
+            times_studied = (SELECT SUM(COALESCE(d.times_studied, 0)) FROM topic_progress d WHERE {same_key}),
+            times_correct = (SELECT SUM(COALESCE(d.times_correct, 0)) FROM topic_progress d WHERE {same_key}),
+            times_incorrect = (SELECT SUM(COALESCE(d.times_incorrect, 0)) FROM topic_progress d WHERE {same_key}),
+            first_studied = (SELECT MIN(d.first_studied) FROM topic_progress d WHERE {same_key}),
+            last_studied = (SELECT MAX(d.last_studied) FROM topic_progress d WHERE {same_key}),
+            next_review_date = (SELECT MIN(d.next_review_date) FROM topic_progress d WHERE {same_key}),
+            mastery_level = (
+                SELECT d.mastery_level FROM topic_progress d WHERE {same_key}
+                ORDER BY d.last_studied IS NULL, d.last_studied DESC, d.id DESC LIMIT 1
+            )
+        WHERE id IN (
+            SELECT MIN(id) FROM topic_progress GROUP BY student_id, subject, topic HAVING COUNT(*) > 1
+        )
+    """))
+    result = conn.execute(text("""
+        DELETE FROM topic_progress WHERE id NOT IN (
+            SELECT MIN(id) FROM topic_progress GROUP BY student_id, subject, topic
+        )
+    """))
+    return result.rowcount or 0
+
+
+# index name -> step that makes existing data satisfy it
+INDEX_PREPARATIONS = {
+    "uq_topic_progress_student_subject_topic": dedupe_topic_progress,
+}
+
+
+def add_missing_indexes(engine: Engine) -> list[str]:
+    """CREATE INDEX for every index in models.py that an existing table does not have yet"""
+    inspector = inspect(engine)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in existing:
+                continue
+            with engine.begin() as conn:
+                prepare = INDEX_PREPARATIONS.get(index.name)
+                if prepare is not None:
+                    merged = prepare(conn)
+                    if merged:
+                        logger.info(f"🛠️ MIGRATIONS: Merged {merged} duplicate {table.name} rows")
+                index.create(conn)
+            added.append(index.name)
+    return added
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """Hold a database-wide lock on Postgres (other processes wait); no-op elsewhere"""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+
+
+def upgrade(engine: Engine):
+    """Bring the database schema up to date"""
+    with _migration_lock(engine):
+        init_db(engine)
+        added = add_missing_columns(engine)
+        if added:
+            logger.info(f"🛠️ MIGRATIONS: Added columns {', '.join(added)}")
+        indexes = add_missing_indexes(engine)
+        if indexes:
+            logger.info(f"🛠️ MIGRATIONS: Created indexes {', '.join(indexes)}")
+
+
+def ensure_upgraded(engine: Engine):
+    """upgrade() once per process and database - safe to call from several threads"""
+    key = engine.url.render_as_string(hide_password=False)
+    if key in _upgraded:
+        return
+    with _upgrade_lock:
+        if key not in _upgraded:
+            upgrade(engine)
+            _upgraded.add(key)
+
+
+def migrate():
+    """Upgrade the configured database at app startup (raises if the migration fails)"""
+    from database.db import engine
+    if engine is None:
+        return
+    ensure_upgraded(engine)
+    logger.info("✅ MIGRATIONS: Database schema is up to date")
+
+
+if __name__ == "__main__":
+    from database.db import engine
+    upgrade(engine)
+    print("✅ Database schema is up to date")
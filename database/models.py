@@ -3,7 +3,7 @@ StudyBuddy Lite - SQLAlchemy Database Models
 PostgreSQL schema for student profiles, conversations, and progress tracking
 """
 
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text, JSON, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, JSON, ForeignKey, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -74,6 +74,7 @@ class Conversation(Base):
 
     # Agent that handled it
     primary_agent = Column(String(50), nullable=True)  # teacher, quiz_master, etc.
+    correctness = Column(Float, nullable=True)  # evaluator score, for graded answers
 
     # Session tracking
     session_id = Column(String(100), nullable=True)  # group related messages
@@ -82,6 +83,11 @@ class Conversation(Base):
     # Relationships
     student = relationship("Student", back_populates="conversations")
 
+    __table_args__ = (
+        # Recent conversations for a student
+        Index("ix_conversations_student_timestamp", "student_id", "timestamp"),
+    )
+
 
 class TopicProgress(Base):
     """Track student mastery of specific topics"""
@@ -103,12 +109,22 @@ class TopicProgress(Base):
     first_studied = Column(DateTime, default=datetime.utcnow)
     last_studied = Column(DateTime, default=datetime.utcnow)
 
-    # Next review (for spaced repetition)
+    # Next review (for spaced repetition, see database/scheduler.py)
     next_review_date = Column(DateTime, nullable=True)
+    ease_factor = Column(Float, default=2.5)  # SM-2 ease
+    interval_days = Column(Integer, default=0)  # last review interval
+    repetitions = Column(Integer, default=0)  # successful reviews in a row
 
     # Relationships
     student = relationship("Student", back_populates="topic_progress")
 
+    __table_args__ = (
+        # One row per student and topic - progress updates are upserts on this key
+        Index("uq_topic_progress_student_subject_topic", "student_id", "subject", "topic", unique=True),
+        # Topics due for review
+        Index("ix_topic_progress_student_review", "student_id", "next_review_date"),
+    )
+
 
 class PracticeProblem(Base):
     """Store generated practice problems for reuse"""
@@ -122,13 +138,20 @@ class PracticeProblem(Base):
 
     # Problem content
     problem_text = Column(Text, nullable=False)
+    problem_type = Column(String(30), nullable=True)  # multiple_choice, open_ended, calculation
     hints = Column(JSON, nullable=True)  # ["hint1", "hint2"]
     expected_concepts = Column(JSON, nullable=True)  # ["concept1", "concept2"]
+    answer_key = Column(JSON, nullable=True)  # {"kind": "choice", "choice": "B"} for local grading
 
     # Usage tracking
     times_used = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Problem bank lookups by (subject, topic, difficulty)
+        Index("ix_practice_problems_key", "subject", "topic", "difficulty"),
+    )
+
 
 # Database initialization
 def init_db(engine):
@@ -0,0 +1,241 @@
+"""
+StudyBuddy - Turn Persistence
+Writes completed turns to Conversation / TopicProgress in batches
+
+Called from the background queue (workflow/background.py), never from the
+request path. One batch is one transaction: missing Student rows are created,
+the turns are inserted with one bulk INSERT (COPY on Postgres, see
+database/write_behind.py), and topic counters are merged per
+(student, subject, topic) and applied as one atomic upsert (see
+database/progress.py), so ten answers on one topic cost one statement
+rather than ten read-modify-writes. Graded answers then reschedule their
+topic's next review (database/scheduler.py).
+
+Turn records are plain dicts (picklable, so a batch can run in a worker process):
+
+    student_id, thread_id, user_message, response, subject, topic, intent,
+    difficulty, agent, is_correct, correctness, mastery_update, timestamp
+
+A turn the database rejects (a value too long for its column, ...) must not
+take the rest of its batch down with it: when a batch fails with a data or
+integrity error it is split in halves and retried, so only the offending
+turns are dropped (and logged). Turns whose student_id cannot be a
+students.id are dropped before the write.
+
+Persistence is active when DATABASE_URL is set (disable with PERSISTENCE_ENABLED=false).
+"""
+
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+from sqlalchemy.exc import DataError, IntegrityError
+from typing import Optional
+import os
+
+from database.problem_bank import problem_key
+from database.write_behind import bulk_insert
+from workflow.telemetry import get_logger
+load_dotenv()
+
+logger = get_logger("persistence")
+
+PERSISTENCE_ENABLED = (
+    bool(os.getenv("DATABASE_URL"))
+    and os.getenv("PERSISTENCE_ENABLED", "true").lower() in ("1", "true", "yes")
+)
+
+# Agents whose turns count as studying the topic
+STUDY_AGENTS = {"teacher", "quiz_generator"}
+
+# students.id is String(50)
+MAX_STUDENT_ID_LENGTH = 50
+
+
+def _session():
+    from database.db import SessionLocal, engine
+    from database.migrations import ensure_upgraded
+    ensure_upgraded(engine)
+    return SessionLocal()
+
+
+def reset_after_fork():
+    """Process-pool initializer: drop pooled connections inherited from the parent"""
+    from database.db import engine
+    engine.dispose(close=False)
+
+
+def topic_key(subject: Optional[str], topic: Optional[str]) -> tuple[str, str]:
+    """(subject, topic) as stored in topic_progress - same normalization as the problem bank"""
+    subject, topic, _ = problem_key(subject, topic, None)
+    return subject, topic
+
+
+def _intent(value: Optional[str]):
+    """Router intent -> IntentEnum (greeting / off_topic / ... are not stored)"""
+    from database.models import IntentEnum
+    try:
+        return IntentEnum(value) if value else None
+    except ValueError:
+        return None
+
+
+def _mastery(value: Optional[str]):
+    from database.models import MasteryLevelEnum
+    try:
+        return MasteryLevelEnum(value.strip().lower()) if value else None
+    except ValueError:
+        return None
+
+
+# ============================================================
+# BATCH WRITES
+# ============================================================
+
+def _ensure_students(db, turns: list[dict]):
+    from database.models import Student
+
+    last_active: dict[str, datetime] = {}
+    for turn in turns:
+        student_id = turn["student_id"]
+        last_active[student_id] = max(last_active.get(student_id, turn["timestamp"]), turn["timestamp"])
+
+    existing = set(db.scalars(select(Student.id).where(Student.id.in_(last_active))))
+    new = [{"id": s, "created_at": t, "last_active": t} for s, t in last_active.items() if s not in existing]
+    if new:
+        # Another worker's batch may create the same student concurrently
+        if db.bind.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        db.execute(upsert(Student).on_conflict_do_nothing(index_elements=["id"]), new)
+    for student_id in existing:
+        db.execute(update(Student).where(Student.id == student_id).values(last_active=last_active[student_id]))
+
+
+def _insert_conversations(db, turns: list[dict]):
+    from database.models import Conversation
+
+    bulk_insert(db, Conversation.__table__, [
+        {
+            "student_id": turn["student_id"],
+            "user_message": turn["user_message"],
+            "assistant_response": turn["response"],
+            "subject": turn.get("subject"),
+            "topic": turn.get("topic"),
+            "intent": _intent(turn.get("intent")),
+            "difficulty": turn.get("difficulty"),
+            "primary_agent": turn.get("agent"),
+            "correctness": turn.get("correctness"),
+            "session_id": turn.get("thread_id"),
+            "timestamp": turn["timestamp"],
+        }
+        for turn in turns
+    ])
+
+
+def _progress_updates(turns: list[dict]) -> list:
+    """One ProgressUpdate per studied or evaluated turn (merged per topic when applied)"""
+    from database.progress import ProgressUpdate
+
+    updates = []
+    for turn in turns:
+        if not turn.get("topic"):
+            continue
+        studied = turn.get("agent") in STUDY_AGENTS
+        evaluated = turn.get("is_correct") is not None
+        if not (studied or evaluated):
+            continue
+        subject, topic = topic_key(turn.get("subject"), turn["topic"])
+        updates.append(ProgressUpdate(
+            student_id=turn["student_id"], subject=subject, topic=topic,
+            studied=int(studied),
+            correct=int(evaluated and bool(turn["is_correct"])),
+            incorrect=int(evaluated and not turn["is_correct"]),
+            mastery=_mastery(turn.get("mastery_update")),
+            at=turn["timestamp"],
+        ))
+    return updates
+
+
+def _reviews(turns: list[dict]) -> list:
+    """One spaced-repetition review per graded answer"""
+    from database.scheduler import Review, grade
+
+    return [
+        Review(
+            turn["student_id"], *topic_key(turn.get("subject"), turn["topic"]),
+            quality=grade(turn.get("correctness"), bool(turn["is_correct"])),
+            at=turn["timestamp"],
+        )
+        for turn in turns
+        if turn.get("topic") and turn.get("is_correct") is not None
+    ]
+
+
+def _write_batch(turns: list[dict]):
+    from database.progress import apply_progress_updates
+    from database.scheduler import schedule_reviews
+
+    with _session() as db:
+        _ensure_students(db, turns)
+        _insert_conversations(db, turns)
+        apply_progress_updates(db, _progress_updates(turns))
+        schedule_reviews(db, _reviews(turns))
+        db.commit()
+
+
+def _write_isolating(turns: list[dict]) -> int:
+    """Write the batch; if the database rejects it, retry the halves so only bad turns are lost"""
+    try:
+        _write_batch(turns)
+        return len(turns)
+    except (DataError, IntegrityError) as e:
+        if len(turns) == 1:
+            logger.warning(f"⚠️ PERSISTENCE: Dropped a turn of {turns[0]['student_id']!r} - {e.orig or e}")
+            return 0
+    middle = len(turns) // 2
+    return _write_isolating(turns[:middle]) + _write_isolating(turns[middle:])
+
+
+def save_turns(turns: list[dict]) -> int:
+    """Persist a batch of completed turns in one transaction; returns the number written"""
+    valid = [t for t in turns if t.get("student_id") and len(t["student_id"]) <= MAX_STUDENT_ID_LENGTH]
+    if len(valid) < len(turns):
+        logger.warning(f"⚠️ PERSISTENCE: Dropped {len(turns) - len(valid)} turns without a valid student_id")
+    if not valid:
+        return 0
+    return _write_isolating(valid)
+
+
+# ============================================================
+# PROGRESS TRACKER OUTPUT
+# ============================================================
+
+def apply_mastery_changes(student_id: str, changes: list[dict]) -> int:
+    """
+    Apply the progress tracker's mastery_changes to topic_progress.
+
+    Entries are free-form dicts; the topic is read from "topic" and the new level
+    from "new_level" / "to" / "mastery_level" / "mastery". Unknown topics and
+    levels are ignored. Returns the number of rows updated.
+    """
+    from database.models import TopicProgress
+
+    updated = 0
+    with _session() as db:
+        for change in changes:
+            level = _mastery(next(
+                (change[k] for k in ("new_level", "to", "mastery_level", "mastery") if isinstance(change.get(k), str)),
+                None,
+            ))
+            if level is None or not change.get("topic"):
+                continue
+            subject, topic = topic_key(change.get("subject"), change["topic"])
+            query = update(TopicProgress).where(
+                TopicProgress.student_id == student_id, TopicProgress.topic == topic
+            )
+            if change.get("subject"):
+                query = query.where(TopicProgress.subject == subject)
+            updated += db.execute(query.values(mastery_level=level)).rowcount or 0
+        db.commit()
+    return updated
@@ -0,0 +1,189 @@
+"""
+StudyBuddy - Practice Problem Bank
+Serves stored PracticeProblem rows before asking the quiz generator for new ones
+
+Problems are keyed by (subject, normalized topic, difficulty). While the pool
+for a key is below PROBLEM_BANK_TARGET_SIZE every practice request generates
+(and stores) a new problem; once it is full, students are served problems they
+have not seen yet and the LLM is only called if they have seen them all.
+
+The bank is active when DATABASE_URL is set (disable with PROBLEM_BANK_ENABLED=false).
+"""
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select, update
+from typing import Optional
+import asyncio
+import os
+import re
+
+from workflow.telemetry import get_logger
+load_dotenv()
+
+logger = get_logger("problem_bank")
+
+PROBLEM_BANK_ENABLED = (
+    bool(os.getenv("DATABASE_URL"))
+    and os.getenv("PROBLEM_BANK_ENABLED", "true").lower() in ("1", "true", "yes")
+)
+PROBLEM_BANK_TARGET_SIZE = int(os.getenv("PROBLEM_BANK_TARGET_SIZE", "20"))
+
+
+def normalize_topic(topic: Optional[str]) -> str:
+    """'The Quadratic Equations!' -> 'quadratic equations'"""
+    text = re.sub(r"[^\w\s]", " ", (topic or "").lower())
+    text = re.sub(r"^(the|a|an)\s+", "", " ".join(text.split()))
+    return text
+
+
+def problem_key(subject: Optional[str], topic: Optional[str], difficulty: Optional[str]) -> tuple[str, str, str]:
+    return (
+        (subject or "general").strip().lower(),
+        normalize_topic(topic),
+        (difficulty or "intermediate").strip().lower(),
+    )
+
+
+def problem_to_quiz(problem) -> dict:
+    """PracticeProblem row -> active_quiz dict used by the workflow"""
+    return {
+        "problem_id": problem.id,
+        "problem_text": problem.problem_text,
+        "problem_type": problem.problem_type,
+        "hints": problem.hints or [],
+        "expected_concepts": problem.expected_concepts or [],
+        "difficulty": problem.difficulty,
+        "answer_key": problem.answer_key,
+    }
+
+
+# ============================================================
+# SYNC DB OPERATIONS
+# ============================================================
+
+def _session():
+    from database.db import SessionLocal, engine
+    from database.migrations import ensure_upgraded
+    ensure_upgraded(engine)
+    return SessionLocal()
+
+
+def _serve(key: tuple[str, str, str], seen_ids: list[int], target_size: int) -> Optional[dict]:
+    from database.models import PracticeProblem
+
+    subject, topic, difficulty = key
+    same_key = (
+        PracticeProblem.subject == subject,
+        PracticeProblem.topic == topic,
+        PracticeProblem.difficulty == difficulty,
+    )
+
+    with _session() as db:
+        pool_size = db.scalar(select(func.count()).select_from(PracticeProblem).where(*same_key))
+        if pool_size < target_size:
+            return None
+
+        # Least-used problem this student has not seen yet
+        query = select(PracticeProblem).where(*same_key)
+        if seen_ids:
+            query = query.where(PracticeProblem.id.not_in(seen_ids))
+        problem = db.scalars(query.order_by(PracticeProblem.times_used, PracticeProblem.id).limit(1)).first()
+        if problem is None:
+            return None
+
+        db.execute(
+            update(PracticeProblem)
+            .where(PracticeProblem.id == problem.id)
+            .values(times_used=PracticeProblem.times_used + 1)
+        )
+        db.commit()
+        return problem_to_quiz(problem)
+
+
+def _pool_size(key: tuple[str, str, str]) -> int:
+    from database.models import PracticeProblem
+
+    subject, topic, difficulty = key
+    with _session() as db:
+        return db.scalar(
+            select(func.count()).select_from(PracticeProblem).where(
+                PracticeProblem.subject == subject,
+                PracticeProblem.topic == topic,
+                PracticeProblem.difficulty == difficulty,
+            )
+        )
+
+
+def _store(key: tuple[str, str, str], quiz: dict) -> int:
+    from database.models import PracticeProblem
+
+    subject, topic, difficulty = key
+    with _session() as db:
+        problem = PracticeProblem(
+            subject=subject,
+            topic=topic,
+            difficulty=difficulty,
+            problem_text=quiz["problem_text"],
+            problem_type=quiz.get("problem_type"),
+            hints=quiz["hints"],
+            expected_concepts=quiz["expected_concepts"],
+            answer_key=quiz.get("answer_key"),
+            times_used=1,
+        )
+        db.add(problem)
+        db.commit()
+        return problem.id
+
+
+# ============================================================
+# ASYNC API (used by the workflow)
+# ============================================================
+
+async def serve_problem(
+    subject: Optional[str],
+    topic: Optional[str],
+    difficulty: Optional[str],
+    seen_ids: list[int],
+    target_size: int = PROBLEM_BANK_TARGET_SIZE,
+) -> Optional[dict]:
+    """Return an unseen stored problem, or None if a new one should be generated"""
+    if not PROBLEM_BANK_ENABLED:
+        return None
+    try:
+        return await asyncio.to_thread(_serve, problem_key(subject, topic, difficulty), seen_ids, target_size)
+    except Exception as e:
+        logger.warning(f"⚠️ PROBLEM BANK: lookup failed - {e}")
+        return None
+
+
+async def bank_is_full(
+    subject: Optional[str],
+    topic: Optional[str],
+    difficulty: Optional[str],
+    target_size: int = PROBLEM_BANK_TARGET_SIZE,
+) -> bool:
+    """True when serve_problem will draw from stored problems for this key"""
+    if not PROBLEM_BANK_ENABLED:
+        return False
+    try:
+        size = await asyncio.to_thread(_pool_size, problem_key(subject, topic, difficulty))
+    except Exception as e:
+        logger.warning(f"⚠️ PROBLEM BANK: count failed - {e}")
+        return False
+    return size >= target_size
+
+
+async def store_problem(
+    subject: Optional[str],
+    topic: Optional[str],
+    difficulty: Optional[str],
+    quiz: dict,
+) -> Optional[int]:
+    """Persist a freshly generated problem; returns its id"""
+    if not PROBLEM_BANK_ENABLED:
+        return None
+    try:
+        return await asyncio.to_thread(_store, problem_key(subject, topic, difficulty), quiz)
+    except Exception as e:
+        logger.warning(f"⚠️ PROBLEM BANK: store failed - {e}")
+        return None
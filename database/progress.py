@@ -0,0 +1,142 @@
+"""
+StudyBuddy - Topic Progress Upserts
+Applies study / evaluation results to topic_progress without read-modify-write
+
+Every update is a single INSERT ... ON CONFLICT (student_id, subject, topic)
+DO UPDATE whose SET clause increments the counters in SQL, so concurrent
+writers never lose each other's increments and no row has to be read first.
+Postgres and SQLite (3.24+) share the same statement shape; it relies on the
+unique index uq_topic_progress_student_subject_topic (see migrations.py).
+
+apply_progress_updates() takes many results at once: they are summed per
+topic and written as one multi-row upsert (one per chunk of
+UPSERT_CHUNK_ROWS topics), so an exam week's worth of quiz answers costs a
+handful of statements instead of one round trip per answer.
+
+A new row is scheduled for its first review (see scheduler.py); the SM-2
+update for graded answers is applied afterwards, on the same transaction.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+
+from database.models import MasteryLevelEnum, TopicProgress
+from database.scheduler import FIRST_REVIEW_DAYS
+
+# Topics per statement (keeps SQLite under its bound-parameter limit)
+UPSERT_CHUNK_ROWS = 500
+
+
+@dataclass
+class ProgressUpdate:
+    """Counter increments for one (student, subject, topic); subject/topic already normalized"""
+    student_id: str
+    subject: str
+    topic: str
+    studied: int = 0
+    correct: int = 0
+    incorrect: int = 0
+    mastery: Optional[MasteryLevelEnum] = None  # None keeps the stored level
+    at: datetime = field(default_factory=datetime.utcnow)
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        return self.student_id, self.subject, self.topic
+
+
+def merge_updates(updates: Iterable[ProgressUpdate]) -> list[ProgressUpdate]:
+    """One update per topic: counters summed, the latest mastery and timestamp kept"""
+    merged: OrderedDict[tuple[str, str, str], ProgressUpdate] = OrderedDict()
+    for update in updates:
+        current = merged.get(update.key)
+        if current is None:
+            merged[update.key] = ProgressUpdate(**vars(update))
+            continue
+        current.studied += update.studied
+        current.correct += update.correct
+        current.incorrect += update.incorrect
+        if update.at >= current.at:
+            current.mastery = update.mastery or current.mastery
+            current.at = update.at
+        elif current.mastery is None:
+            current.mastery = update.mastery
+    return list(merged.values())
+
+
+def _upsert_statement(dialect: str, rows: list[dict], set_mastery: bool):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = TopicProgress.__table__
+    stmt = insert(table).values(rows)
+    excluded = stmt.excluded
+    set_ = {
+        "times_studied": func.coalesce(table.c.times_studied, 0) + excluded.times_studied,
+        "times_correct": func.coalesce(table.c.times_correct, 0) + excluded.times_correct,
+        "times_incorrect": func.coalesce(table.c.times_incorrect, 0) + excluded.times_incorrect,
+        "last_studied": excluded.last_studied,
+        # Rows created before scheduling existed get their first review too
+        "next_review_date": func.coalesce(table.c.next_review_date, excluded.next_review_date),
+    }
+    if set_mastery:
+        set_["mastery_level"] = excluded.mastery_level
+    return stmt.on_conflict_do_update(index_elements=["student_id", "subject", "topic"], set_=set_)
+
+
+def apply_progress_updates(conn, updates: Iterable[ProgressUpdate]) -> int:
+    """
+    Upsert a batch of progress updates on the connection's (or session's) transaction.
+
+    Updates that carry a mastery level and those that don't are written by
+    separate statements, so a study-only update never overwrites the level.
+    Returns the number of topics written.
+    """
+    merged = merge_updates(updates)
+    if not merged:
+        return 0
+    connection = conn.connection() if hasattr(conn, "get_bind") else conn
+    dialect = connection.dialect.name
+
+    for set_mastery in (True, False):
+        rows = [
+            {
+                "student_id": u.student_id,
+                "subject": u.subject,
+                "topic": u.topic,
+                "mastery_level": u.mastery or MasteryLevelEnum.LEARNING,
+                "times_studied": u.studied,
+                "times_correct": u.correct,
+                "times_incorrect": u.incorrect,
+                "first_studied": u.at,
+                "last_studied": u.at,
+                "next_review_date": u.at + timedelta(days=FIRST_REVIEW_DAYS),
+            }
+            for u in merged
+            if (u.mastery is not None) == set_mastery
+        ]
+        for start in range(0, len(rows), UPSERT_CHUNK_ROWS):
+            connection.execute(_upsert_statement(dialect, rows[start:start + UPSERT_CHUNK_ROWS], set_mastery))
+    return len(merged)
+
+
+def record_progress(
+    conn,
+    student_id: str,
+    subject: str,
+    topic: str,
+    studied: int = 0,
+    correct: int = 0,
+    incorrect: int = 0,
+    mastery: Optional[MasteryLevelEnum] = None,
+    at: Optional[datetime] = None,
+) -> int:
+    """Apply one update with a single statement"""
+    return apply_progress_updates(conn, [ProgressUpdate(
+        student_id, subject, topic, studied, correct, incorrect, mastery, at or datetime.utcnow()
+    )])
@@ -0,0 +1,244 @@
+"""
+StudyBuddy - Spaced Repetition Scheduler
+SM-2 review intervals over topic_progress, and a cache of what is due per student
+
+Every evaluated answer is a review of its topic. Its grade (0-5, from the
+evaluator's correctness) moves the topic's ease factor, interval and
+repetition count the way SM-2 does, and sets next_review_date. A topic that is
+only studied (no quiz yet) gets its first review FIRST_REVIEW_DAYS later -
+progress.py sets that when it creates the row.
+
+"What's due for student X" never goes to the review agent: DueQueue answers it
+from each student's schedule, loaded with one query on the
+(student_id, next_review_date) index and held as a heap keyed by due time.
+The background writer invalidates a student's entry whenever it writes their
+turns; entries also expire after REVIEW_QUEUE_TTL_SECONDS, which bounds how
+stale a schedule written by another app process can be.
+
+Configuration (environment):
+    REVIEW_QUEUE_MAX_STUDENTS   students whose schedule is cached (default: 10000)
+    REVIEW_QUEUE_TTL_SECONDS    cached schedules are reloaded after this (default: 60)
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+import asyncio
+import heapq
+import os
+import threading
+import time
+
+from sqlalchemy import select, tuple_
+
+REVIEW_QUEUE_MAX_STUDENTS = int(os.getenv("REVIEW_QUEUE_MAX_STUDENTS", "10000"))
+REVIEW_QUEUE_TTL_SECONDS = float(os.getenv("REVIEW_QUEUE_TTL_SECONDS", "60"))
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_REVIEW_DAYS = 1
+SECOND_REVIEW_DAYS = 6
+PASSING_GRADE = 3
+
+
+# ============================================================
+# SM-2
+# ============================================================
+
+@dataclass
+class ReviewState:
+    ease: float = DEFAULT_EASE
+    interval_days: int = 0
+    repetitions: int = 0  # successful reviews in a row
+
+
+def grade(correctness: Optional[float], is_correct: bool) -> int:
+    """Evaluator result -> SM-2 grade 0-5 (correct answers always pass, wrong ones never do)"""
+    score = round(5 * min(1.0, max(0.0, correctness if correctness is not None else float(is_correct))))
+    return max(score, PASSING_GRADE) if is_correct else min(score, PASSING_GRADE - 1)
+
+
+def sm2(state: ReviewState, quality: int) -> ReviewState:
+    """State after one review graded `quality` (0-5)"""
+    if quality >= PASSING_GRADE:
+        if state.repetitions == 0:
+            interval = FIRST_REVIEW_DAYS
+        elif state.repetitions == 1:
+            interval = SECOND_REVIEW_DAYS
+        else:
+            interval = max(1, round(state.interval_days * state.ease))
+        repetitions = state.repetitions + 1
+    else:
+        # Lapse: start over, but keep the (lowered) ease
+        interval, repetitions = FIRST_REVIEW_DAYS, 0
+    miss = 5 - quality
+    ease = max(MIN_EASE, state.ease + 0.1 - miss * (0.08 + miss * 0.02))
+    return ReviewState(ease=ease, interval_days=interval, repetitions=repetitions)
+
+
+# ============================================================
+# WRITES
+# ============================================================
+
+@dataclass
+class Review:
+    """One graded answer; subject/topic already normalized"""
+    student_id: str
+    subject: str
+    topic: str
+    quality: int
+    at: datetime
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        return self.student_id, self.subject, self.topic
+
+
+def schedule_reviews(db, reviews: Iterable[Review]) -> int:
+    """
+    Apply reviews to their topic_progress rows on the session's transaction.
+
+    Call after progress.apply_progress_updates() in the same transaction: the
+    upsert has created the rows and holds their locks until commit, so
+    concurrent batches cannot interleave between this read and write.
+    Reviews of the same topic are applied in time order. Returns the number of
+    topics rescheduled.
+    """
+    from database.models import TopicProgress
+
+    reviews = sorted(reviews, key=lambda r: r.at)
+    if not reviews:
+        return 0
+    keys = list({r.key for r in reviews})
+    columns = (TopicProgress.student_id, TopicProgress.subject, TopicProgress.topic)
+    rows = {
+        (row.student_id, row.subject, row.topic): row
+        for row in db.scalars(select(TopicProgress).where(tuple_(*columns).in_(keys)).with_for_update())
+    }
+
+    for review in reviews:
+        row = rows.get(review.key)
+        if row is None:
+            continue
+        state = sm2(
+            ReviewState(
+                ease=row.ease_factor or DEFAULT_EASE,
+                interval_days=row.interval_days or 0,
+                repetitions=row.repetitions or 0,
+            ),
+            review.quality,
+        )
+        row.ease_factor = state.ease
+        row.interval_days = state.interval_days
+        row.repetitions = state.repetitions
+        row.next_review_date = review.at + timedelta(days=state.interval_days)
+    return len(rows)
+
+
+# ============================================================
+# DUE QUEUE
+# ============================================================
+
+def _session():
+    from database.db import SessionLocal, engine
+    from database.migrations import ensure_upgraded
+    ensure_upgraded(engine)
+    return SessionLocal()
+
+
+def load_schedule(student_id: str) -> list[tuple[datetime, str, str, Optional[str]]]:
+    """(due, subject, topic, mastery) for every scheduled topic of the student, soonest first"""
+    from database.models import TopicProgress
+
+    with _session() as db:
+        rows = db.execute(
+            select(TopicProgress.next_review_date, TopicProgress.subject, TopicProgress.topic, TopicProgress.mastery_level)
+            .where(TopicProgress.student_id == student_id, TopicProgress.next_review_date.is_not(None))
+            .order_by(TopicProgress.next_review_date)
+        ).all()
+    return [(due, subject, topic, mastery.value if mastery else None) for due, subject, topic, mastery in rows]
+
+
+class DueQueue:
+    """Per-student review schedules as heaps keyed by due time (LRU-bounded, TTL-expired)"""
+
+    def __init__(self, max_students: int = REVIEW_QUEUE_MAX_STUDENTS, ttl_seconds: float = REVIEW_QUEUE_TTL_SECONDS):
+        self.max_students = max_students
+        self.ttl_seconds = ttl_seconds
+        self._heaps: OrderedDict[str, tuple[float, list]] = OrderedDict()
+        # Lookups run in worker threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+        self._generation = 0
+
+    def _fresh(self, student_id: str) -> Optional[tuple[float, list]]:
+        entry = self._heaps.get(student_id)
+        return entry if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds else None
+
+    def cached(self, student_id: str) -> bool:
+        with self._lock:
+            return self._fresh(student_id) is not None
+
+    def _heap(self, student_id: str) -> list:
+        with self._lock:
+            entry = self._fresh(student_id)
+            if entry is not None:
+                self._heaps.move_to_end(student_id)
+                self.hits += 1
+                return entry[1]
+
+            generation = self._generation
+
+        loaded_at = time.monotonic()
+        heap = load_schedule(student_id)  # sorted, so already a heap
+        with self._lock:
+            self.loads += 1
+            if generation != self._generation:
+                # A write landed while loading - serve it, but don't cache what may predate it
+                return heap
+            self._heaps[student_id] = (loaded_at, heap)
+            self._heaps.move_to_end(student_id)
+            while len(self._heaps) > self.max_students:
+                self._heaps.popitem(last=False)
+        return heap
+
+    def lookup(self, student_id: str, now: Optional[datetime] = None, limit: int = 5) -> tuple[list[dict], Optional[dict]]:
+        """(topics due at `now`, most overdue first; the next scheduled review, due or not)"""
+        now = now or datetime.utcnow()
+        heap = self._heap(student_id)
+        due = [self._as_dict(entry) for entry in heapq.nsmallest(limit, heap) if entry[0] <= now]
+        return due, self._as_dict(heap[0]) if heap else None
+
+    def invalidate(self, student_ids: Iterable[str]):
+        """Forget cached schedules (their turns were just written)"""
+        with self._lock:
+            self._generation += 1
+            for student_id in student_ids:
+                if self._heaps.pop(student_id, None) is not None:
+                    self.invalidations += 1
+
+    @staticmethod
+    def _as_dict(entry: tuple) -> dict:
+        due, subject, topic, mastery = entry
+        return {"subject": subject, "topic": topic, "mastery_level": mastery, "due": due}
+
+    def stats(self) -> dict:
+        return {
+            "students": len(self._heaps),
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+due_queue = DueQueue()
+
+
+async def due_reviews(student_id: str, limit: int = 5) -> tuple[list[dict], Optional[dict]]:
+    """DueQueue.lookup() - a cached schedule is answered without leaving the event loop"""
+    if due_queue.cached(student_id):
+        return due_queue.lookup(student_id, limit=limit)
+    return await asyncio.to_thread(due_queue.lookup, student_id, None, limit)
@@ -70,6 +70,7 @@ class ConversationBase(BaseModel):
     intent: Optional[IntentEnum] = None
     difficulty: Optional[str] = None
     primary_agent: Optional[str] = None
+    correctness: Optional[float] = None
     session_id: Optional[str] = None
 
 
@@ -109,11 +110,19 @@ class TopicProgressRead(TopicProgressBase):
     first_studied: datetime
     last_studied: datetime
     next_review_date: Optional[datetime] = None
+    ease_factor: Optional[float] = None
+    interval_days: Optional[int] = None
+    repetitions: Optional[int] = None
 
     class Config:
         from_attributes = True
 
 
+class StudentProfile(StudentRead):
+    """Student with their per-topic progress (GET /students/{id})"""
+    topic_progress: List[TopicProgressRead] = []
+
+
 # ============================================================
 # PRACTICE PROBLEM SCHEMAS
 # ============================================================
@@ -123,8 +132,10 @@ class PracticeProblemBase(BaseModel):
     topic: str
     difficulty: str
     problem_text: str
+    problem_type: Optional[str] = None
     hints: Optional[List[str]] = None
     expected_concepts: Optional[List[str]] = None
+    answer_key: Optional[Dict[str, Any]] = None
 
 
 class PracticeProblemCreate(PracticeProblemBase):
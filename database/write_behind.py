@@ -0,0 +1,269 @@
+"""
+StudyBuddy - Write-Behind Buffer
+Accumulates rows in memory and writes them in bulk, off the request path
+
+Committing one Conversation row per /chat call costs a round trip and a
+transaction (and on Postgres an fsync) per message. WriteBehindBuffer collects
+rows and hands them to a flush function in batches - when `batch_size` rows are
+waiting or the oldest has waited `flush_seconds` - from one or more flusher tasks.
+
+Backpressure: the buffer holds at most `max_rows` rows, counting batches still
+being written. put() waits for room (up to its timeout) instead of letting
+memory grow without bound; put_nowait() refuses the row. close() flushes
+everything left, so a clean shutdown loses nothing.
+
+bulk_insert() is the matching write path: one executemany INSERT, or COPY ...
+FROM STDIN on Postgres for larger batches.
+
+Configuration (environment):
+    WRITE_BEHIND_COPY            true/false - use COPY on Postgres (default: true)
+    WRITE_BEHIND_COPY_MIN_ROWS   smallest batch sent with COPY (default: 50)
+"""
+
+from datetime import date, datetime
+from typing import Awaitable, Callable, Optional
+import asyncio
+import enum
+import io
+import json
+import os
+import time
+
+from sqlalchemy import Table, insert
+
+from workflow.telemetry import get_logger
+
+logger = get_logger("write_behind")
+
+WRITE_BEHIND_COPY = os.getenv("WRITE_BEHIND_COPY", "true").lower() in ("1", "true", "yes")
+WRITE_BEHIND_COPY_MIN_ROWS = int(os.getenv("WRITE_BEHIND_COPY_MIN_ROWS", "50"))
+
+
+class BufferFull(RuntimeError):
+    """The buffer is at capacity"""
+
+
+# ============================================================
+# BULK INSERT
+# ============================================================
+
+def _copy_value(value) -> str:
+    """One field in COPY text format"""
+    if value is None:
+        return r"\N"
+    if isinstance(value, enum.Enum):
+        # SQLAlchemy Enum columns store the member name
+        value = value.name
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    elif isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_rows(connection, table: Table, rows: list[dict]):
+    """COPY rows into a Postgres table on the connection's current transaction"""
+    columns = list(rows[0])
+    data = "".join("\t".join(_copy_value(row.get(c)) for c in columns) + "\n" for row in rows)
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2
+            cursor.copy_expert(sql, io.StringIO(data))
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(data)
+    finally:
+        cursor.close()
+
+
+def bulk_insert(db, table: Table, rows: list[dict]) -> int:
+    """
+    Insert rows with one statement on the session's (or connection's) transaction.
+
+    Postgres batches of WRITE_BEHIND_COPY_MIN_ROWS or more use COPY; everything
+    else is an executemany INSERT. All rows must have the same keys.
+    """
+    if not rows:
+        return 0
+    connection = db.connection() if hasattr(db, "get_bind") else db
+    if WRITE_BEHIND_COPY and len(rows) >= WRITE_BEHIND_COPY_MIN_ROWS and connection.dialect.name == "postgresql":
+        _copy_rows(connection, table, rows)
+    else:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+# ============================================================
+# BUFFER
+# ============================================================
+
+class WriteBehindBuffer:
+    """Bounded in-memory buffer flushed in batches by background tasks"""
+
+    def __init__(
+        self,
+        flush: Callable[[list], Awaitable[None]],
+        max_rows: int = 10000,
+        batch_size: int = 100,
+        flush_seconds: float = 0.5,
+        flushers: int = 1,
+        name: str = "write_behind",
+    ):
+        self.flush = flush
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.flushers = flushers
+        self.name = name
+        self._rows: list = []
+        self._oldest: Optional[float] = None
+        self._writing = 0
+        self._closing = False
+        # Set when a flusher should look at the buffer / when a batch has been written
+        self._kick: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        self.added = 0
+        self.rejected = 0
+        self.waited = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        self.flush_seconds_total = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def __len__(self) -> int:
+        return len(self._rows) + self._writing
+
+    def start(self):
+        if self.running:
+            return
+        self._closing = False
+        self._kick = asyncio.Event()
+        self._room = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._flusher()) for _ in range(self.flushers)]
+
+    async def close(self, timeout: Optional[float] = None):
+        """Flush every buffered row (up to `timeout`), then stop the flushers"""
+        if not self.running:
+            return
+        self._closing = True
+        self._kick.set()
+        self._room.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        if pending:
+            logger.warning(f"⚠️ {self.name.upper()}: {len(self)} rows not flushed before shutdown")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def put_nowait(self, row):
+        """Buffer a row; raises BufferFull at capacity"""
+        if not self.running or self._closing:
+            raise BufferFull(f"{self.name} is not accepting rows")
+        if len(self) >= self.max_rows:
+            self.rejected += 1
+            raise BufferFull(f"{self.name} holds {len(self)} rows")
+
+        if not self._rows:
+            self._oldest = time.monotonic()
+        self._rows.append(row)
+        self.added += 1
+        # Flushers sleep until the first row starts the clock or a batch is full
+        if len(self._rows) in (1, self.batch_size):
+            self._kick.set()
+
+    async def put(self, row, timeout: Optional[float] = None):
+        """Buffer a row, waiting up to `timeout` for room; raises BufferFull on timeout"""
+        if self.running and len(self) >= self.max_rows:
+            self.waited += 1
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while len(self) >= self.max_rows and not self._closing:
+                self._room.clear()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                try:
+                    if remaining is not None and remaining <= 0:
+                        raise asyncio.TimeoutError
+                    await asyncio.wait_for(self._room.wait(), remaining)
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    raise BufferFull(f"{self.name} stayed full for {timeout}s")
+        self.put_nowait(row)
+
+    def _due(self) -> bool:
+        if not self._rows:
+            return False
+        return (
+            self._closing
+            or len(self._rows) >= self.batch_size
+            or time.monotonic() - self._oldest >= self.flush_seconds
+        )
+
+    async def _take(self) -> Optional[list]:
+        """Next batch to write, or None once closing and empty"""
+        while not self._due():
+            if self._closing and not self._rows:
+                return None
+            self._kick.clear()
+            timeout = self.flush_seconds - (time.monotonic() - self._oldest) if self._rows else None
+            try:
+                await asyncio.wait_for(self._kick.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch, self._rows = self._rows[:self.batch_size], self._rows[self.batch_size:]
+        if self._rows:
+            # Another flusher can start on the rest right away
+            self._kick.set()
+        else:
+            self._oldest = None
+        self._writing += len(batch)
+        return batch
+
+    async def _flusher(self):
+        while True:
+            batch = await self._take()
+            if batch is None:
+                # Wake the other flushers so they see the buffer is closed and empty
+                self._kick.set()
+                return
+            start = time.perf_counter()
+            try:
+                await self.flush(batch)
+                self.flushed += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"⚠️ {self.name.upper()}: Failed to write {len(batch)} rows - {e}")
+            finally:
+                self.flush_seconds_total += time.perf_counter() - start
+                self._writing -= len(batch)
+                self._room.set()
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._rows),
+            "writing": self._writing,
+            "added": self.added,
+            "rejected": self.rejected,
+            "waited": self.waited,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "flush_seconds": self.flush_seconds_total,
+        }
@@ -3,22 +3,72 @@ StudyBuddy FastAPI Application
 Simple endpoint for chat with thread-based memory
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
+from sqlalchemy import select
 from typing import Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import uvicorn
 
-from workflow.ini_graph import run_studybuddy_workflow
+from agents.model_registry import close_http_client
+from database.analytics import student_analytics
+from database.db import DATABASE_URL, dispose_engines, get_async_db, pool_stats
+from database.migrations import migrate
+from database.models import Student, TopicProgress
+from database.schemas import StudentProfile, StudentRead, TopicProgressRead
+from database.scheduler import due_queue
+from workflow.background import start_background_queue, turn_queue
+from workflow.cassette import get_cassette
+from workflow.concurrency import ThreadBusyError, thread_gate
+from workflow.fast_path import fast_path_stats
+from workflow.idempotency import IdempotencyConflict, get_idempotency_cache, request_fingerprint
+from workflow.ini_graph import get_graph, run_studybuddy_workflow, stream_studybuddy_workflow
+from workflow.prefetch import prefetcher
+from workflow.semantic_cache import teacher_cache_metrics
+from workflow.speculation import speculations
+from workflow.telemetry import register_collector, render_metrics, shutdown_logging
 
 # ============================================================
 # FASTAPI APP
 # ============================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks"""
+    # Component stats exported as gauges on /metrics
+    register_collector("fast_path", fast_path_stats)
+    register_collector("teacher_cache", teacher_cache_metrics)
+    register_collector("checkpoints", lambda: get_graph().checkpointer.stats())
+    register_collector("threads", thread_gate.stats)
+    register_collector("speculation", speculations.stats)
+    register_collector("prefetch", prefetcher.stats)
+    register_collector("idempotency", lambda: get_idempotency_cache().stats())
+    register_collector("cassette", lambda: get_cassette().stats() if get_cassette() else {})
+    register_collector("background", turn_queue.stats)
+    register_collector("db_pool", pool_stats)
+    register_collector("review_queue", due_queue.stats)
+    register_collector("analytics", student_analytics.stats)
+    # Schema upgrades run before the first request; a failure aborts startup
+    await asyncio.to_thread(migrate)
+    # Conversation / progress writes happen off the request path
+    start_background_queue()
+    yield
+    await turn_queue.stop()
+    await dispose_engines()
+    # Release the pooled LLM connections
+    await close_http_client()
+    shutdown_logging()
+
+
 app = FastAPI(
     title="StudyBuddy API",
     description="AI tutoring system with conversation memory",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -38,7 +88,16 @@ app.add_middleware(
 class ChatRequest(BaseModel):
     message: str = Field(..., description="User's message", min_length=1)
     thread_id: Optional[str] = Field(
-        "", description="Thread ID for conversation continuity (leave empty to start new thread)"
+        "", max_length=50,
+        description="Thread ID for conversation continuity (leave empty to start new thread)"
+    )
+    student_id: Optional[str] = Field(
+        None, max_length=50,
+        description="Student whose progress this turn counts towards (defaults to the thread ID)"
+    )
+    idempotency_key: Optional[str] = Field(
+        None, max_length=200,
+        description="Client-generated key; retries with the same key return the first response"
     )
 
     class Config:
@@ -98,25 +157,55 @@ async def health():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: node/LLM latency, retries, tokens and component stats"""
+    return render_metrics()
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=200)
+):
     """
     Main chat endpoint
 
     - **message**: User's input message
     - **thread_id**: Optional thread ID to continue a conversation
                      If not provided, a new thread is created
+    - **student_id**: Optional student the turn is recorded for (defaults to the thread ID)
+    - **idempotency_key** (or `Idempotency-Key` header): Optional; a retry with
+                     the same key returns the original response without re-running
+                     the workflow (marked with `Idempotent-Replayed: true`)
 
     Returns the AI response and thread_id for conversation continuity
     """
-    try:
-        result = await run_studybuddy_workflow(
+    key = idempotency_key or request.idempotency_key
+
+    def execute():
+        return run_studybuddy_workflow(
             user_message=request.message,
-            thread_id=request.thread_id
+            thread_id=request.thread_id,
+            student_id=request.student_id
         )
 
+    try:
+        if key:
+            fingerprint = request_fingerprint(request.message, request.thread_id, request.student_id)
+            result, replayed = await get_idempotency_cache().run(key, fingerprint, execute)
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+        else:
+            result = await execute()
+
         return ChatResponse(**result)
 
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ThreadBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -124,6 +213,72 @@ async def chat(request: ChatRequest):
         )
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+
+    Same input as /chat. Emits:
+    - **node**: a graph node started (router, teacher, ...)
+    - **token**: partial agent output as it is generated
+    - **done**: final payload, same shape as the /chat response
+    - **error**: processing failed
+    """
+    async def event_stream():
+        try:
+            async for event in stream_studybuddy_workflow(
+                user_message=request.message,
+                thread_id=request.thread_id,
+                student_id=request.student_id
+            ):
+                name = event.pop("event")
+                yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            error = {"detail": f"Error processing request: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Disable proxy buffering so events reach the client immediately
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+async def database_session():
+    """get_async_db, or 503 when no database is configured"""
+    if not DATABASE_URL:
+        raise HTTPException(status_code=503, detail="Database is not configured")
+    async for db in get_async_db():
+        yield db
+
+
+@app.get("/students/{student_id}", response_model=StudentProfile)
+async def get_student(student_id: str, db=Depends(database_session)):
+    """
+    Student profile with per-topic progress
+
+    Progress is written in the background, so the latest turn may take a moment to appear.
+    """
+    student = await db.get(Student, student_id)
+    if student is None:
+        raise HTTPException(status_code=404, detail=f"Student {student_id!r} not found")
+
+    topics = await db.scalars(
+        select(TopicProgress)
+        .where(TopicProgress.student_id == student_id)
+        .order_by(TopicProgress.last_studied.desc())
+    )
+    # Built field by field - touching the lazy relationships would need sync IO
+    return StudentProfile(
+        **StudentRead.model_validate(student).model_dump(),
+        topic_progress=[TopicProgressRead.model_validate(t) for t in topics]
+    )
+
+
 # @app.post("/new-conversation", response_model=ChatResponse)
 # async def new_conversation(request: ChatRequest):
 #     """
@@ -0,0 +1,242 @@
+"""
+StudyBuddy - Background Turn Queue
+Persists completed turns and runs the progress tracker off the request path
+
+run_studybuddy_workflow hands every completed turn to `turn_queue.submit()`,
+which only appends to a write-behind buffer (database/write_behind.py) - /chat
+never waits for a database write or an analytics LLM call. BACKGROUND_WORKERS
+flusher tasks write it in batches (BACKGROUND_BATCH_SIZE turns, or whatever
+arrived within BACKGROUND_BATCH_WAIT_SECONDS of the first) with
+database.persistence.save_turns in a thread - or in a process pool when
+BACKGROUND_PROCESS_POOL is on.
+
+The progress tracker agent runs once per PROGRESS_TRACKER_EVERY_N_TURNS turns of
+a student, not per message, and at most one run per student at a time.
+
+When the buffer is full (the database is not keeping up) submit() waits up to
+BACKGROUND_SUBMIT_TIMEOUT_SECONDS for a batch to be written, then drops the
+turn and counts it. On shutdown the buffer is flushed for up to
+BACKGROUND_DRAIN_SECONDS.
+
+Configuration (environment):
+    BACKGROUND_WORKERS                worker tasks draining the queue (default: 2)
+    BACKGROUND_QUEUE_SIZE             max buffered turns, including batches being written (default: 10000)
+    BACKGROUND_BATCH_SIZE             max turns per database write (default: 100)
+    BACKGROUND_BATCH_WAIT_SECONDS     how long a batch may wait to fill (default: 0.5)
+    BACKGROUND_PROCESS_POOL           true/false - write batches in worker processes (default: false)
+    BACKGROUND_PROCESSES              size of that pool (default: 2)
+    BACKGROUND_SUBMIT_TIMEOUT_SECONDS how long a turn waits for room in a full buffer (default: 1)
+    BACKGROUND_DRAIN_SECONDS          shutdown drain timeout (default: 10)
+    PROGRESS_TRACKER_EVERY_N_TURNS    turns per student between tracker runs, 0 = off (default: 20)
+    PROGRESS_TRACKER_CONCURRENCY      tracker runs at once (default: 2)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Optional
+import asyncio
+import os
+import time
+
+from database.analytics import student_analytics
+from database.persistence import PERSISTENCE_ENABLED, reset_after_fork, save_turns
+from database.scheduler import due_queue
+from database.write_behind import BufferFull, WriteBehindBuffer
+from workflow.telemetry import get_logger
+
+logger = get_logger("background")
+
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "2"))
+BACKGROUND_QUEUE_SIZE = int(os.getenv("BACKGROUND_QUEUE_SIZE", "10000"))
+BACKGROUND_BATCH_SIZE = int(os.getenv("BACKGROUND_BATCH_SIZE", "100"))
+BACKGROUND_BATCH_WAIT_SECONDS = float(os.getenv("BACKGROUND_BATCH_WAIT_SECONDS", "0.5"))
+BACKGROUND_PROCESS_POOL = os.getenv("BACKGROUND_PROCESS_POOL", "false").lower() in ("1", "true", "yes")
+BACKGROUND_PROCESSES = int(os.getenv("BACKGROUND_PROCESSES", "2"))
+BACKGROUND_SUBMIT_TIMEOUT_SECONDS = float(os.getenv("BACKGROUND_SUBMIT_TIMEOUT_SECONDS", "1"))
+BACKGROUND_DRAIN_SECONDS = float(os.getenv("BACKGROUND_DRAIN_SECONDS", "10"))
+PROGRESS_TRACKER_EVERY_N_TURNS = int(os.getenv("PROGRESS_TRACKER_EVERY_N_TURNS", "20"))
+PROGRESS_TRACKER_CONCURRENCY = int(os.getenv("PROGRESS_TRACKER_CONCURRENCY", "2"))
+
+Persist = Callable[[list[dict]], int]
+Track = Callable[[str], Awaitable[None]]
+
+
+class TurnQueue:
+    """Write-behind buffer of completed turns plus periodic progress tracking"""
+
+    def __init__(
+        self,
+        persist: Persist = save_turns,
+        workers: int = BACKGROUND_WORKERS,
+        max_size: int = BACKGROUND_QUEUE_SIZE,
+        batch_size: int = BACKGROUND_BATCH_SIZE,
+        batch_wait: float = BACKGROUND_BATCH_WAIT_SECONDS,
+        track_every: int = PROGRESS_TRACKER_EVERY_N_TURNS,
+        track_concurrency: int = PROGRESS_TRACKER_CONCURRENCY,
+    ):
+        self.persist = persist
+        self.workers = workers
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.track_every = track_every
+        self.track_concurrency = track_concurrency
+        self._buffer: Optional[WriteBehindBuffer] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tracker_slots: Optional[asyncio.Semaphore] = None
+        self._written: Optional[asyncio.Condition] = None
+        self._trackers: dict[str, asyncio.Task] = {}
+        self._since_tracked: dict[str, int] = {}
+        self.submitted = 0
+        self.dropped = 0
+        self.persisted = 0
+        self.failed = 0
+        self.tracked = 0
+        self.tracker_failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._buffer is not None and self._buffer.running
+
+    def start(self, process_pool: bool = BACKGROUND_PROCESS_POOL):
+        if self.running:
+            return
+        self._buffer = WriteBehindBuffer(
+            self._write,
+            max_rows=self.max_size,
+            batch_size=self.batch_size,
+            flush_seconds=self.batch_wait,
+            flushers=self.workers,
+            name="background",
+        )
+        self._buffer.start()
+        self._tracker_slots = asyncio.Semaphore(self.track_concurrency)
+        self._written = asyncio.Condition()
+        if process_pool:
+            self._executor = ProcessPoolExecutor(max_workers=BACKGROUND_PROCESSES, initializer=reset_after_fork)
+        logger.info(
+            f"📥 BACKGROUND: {self.workers} workers, batch={self.batch_size}, "
+            f"{'process' if process_pool else 'thread'} writes, tracker every {self.track_every} turns"
+        )
+
+    async def stop(self, timeout: float = BACKGROUND_DRAIN_SECONDS):
+        """Drain queued turns and running tracker jobs (up to `timeout`), then stop the workers"""
+        if not self.running:
+            return
+        deadline = time.monotonic() + timeout
+        await self._buffer.close(timeout)
+        if self._trackers:
+            await asyncio.wait(list(self._trackers.values()), timeout=max(0.0, deadline - time.monotonic()))
+        for task in self._trackers.values():
+            task.cancel()
+        await asyncio.gather(*self._trackers.values(), return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._trackers.clear()
+
+    async def submit(
+        self,
+        turn: dict,
+        track: Optional[Track] = None,
+        timeout: float = BACKGROUND_SUBMIT_TIMEOUT_SECONDS,
+    ) -> bool:
+        """Buffer a completed turn (waits only while the buffer is full); `track(student_id)` runs every N turns"""
+        if not self.running:
+            return False
+        try:
+            await self._buffer.put(turn, timeout)
+        except BufferFull:
+            self.dropped += 1
+            logger.warning("⚠️ BACKGROUND: Buffer full - turn not persisted")
+            return False
+        self.submitted += 1
+        if track is not None:
+            self._count_turn(turn["student_id"], track)
+        return True
+
+    # ------------------------------------------------------------
+    # WRITES
+    # ------------------------------------------------------------
+
+    async def _write(self, batch: list[dict]):
+        """Flush callback of the buffer (which logs failures)"""
+        student_analytics.begin(batch)
+        try:
+            if self._executor is not None:
+                written = await asyncio.get_running_loop().run_in_executor(self._executor, self.persist, batch)
+            else:
+                written = await asyncio.to_thread(self.persist, batch)
+            # Rejected turns count as failed
+            self.persisted += written
+            self.failed += len(batch) - written
+            # Their review schedules may have moved; cached stats are updated in place
+            due_queue.invalidate({turn["student_id"] for turn in batch})
+            if written == len(batch):
+                student_analytics.observe(batch)
+            else:
+                # Some turns were rejected - reload these students' stats instead
+                student_analytics.abort(batch)
+            logger.debug(f"💾 BACKGROUND: Wrote {len(batch)} turns")
+        except Exception:
+            self.failed += len(batch)
+            student_analytics.abort(batch)
+            raise
+        finally:
+            async with self._written:
+                self._written.notify_all()
+
+    # ------------------------------------------------------------
+    # PROGRESS TRACKER
+    # ------------------------------------------------------------
+
+    def _count_turn(self, student_id: str, track: Track):
+        if self.track_every <= 0:
+            return
+        count = self._since_tracked.get(student_id, 0) + 1
+        if count < self.track_every or student_id in self._trackers:
+            self._since_tracked[student_id] = count
+            return
+        self._since_tracked.pop(student_id, None)
+        target = self.submitted
+
+        async def run():
+            # Let the turns that triggered this run reach the database first
+            async with self._written:
+                await self._written.wait_for(lambda: self.persisted + self.failed >= target)
+            async with self._tracker_slots:
+                try:
+                    await track(student_id)
+                    self.tracked += 1
+                except Exception as e:
+                    self.tracker_failed += 1
+                    logger.warning(f"⚠️ BACKGROUND: Progress tracker failed for {student_id} - {e}")
+                finally:
+                    self._trackers.pop(student_id, None)
+
+        self._trackers[student_id] = asyncio.ensure_future(run())
+
+    def stats(self) -> dict:
+        buffer = self._buffer.stats() if self._buffer is not None else {}
+        return {
+            "buffered": buffer.get("buffered", 0),
+            "writing": buffer.get("writing", 0),
+            "submitted": self.submitted,
+            "waited": buffer.get("waited", 0),
+            "dropped": self.dropped,
+            "persisted": self.persisted,
+            "batches": buffer.get("batches", 0),
+            "failed": self.failed,
+            "write_seconds": buffer.get("flush_seconds", 0.0),
+            "tracker_running": len(self._trackers),
+            "tracked": self.tracked,
+            "tracker_failed": self.tracker_failed,
+        }
+
+
+turn_queue = TurnQueue()
+
+
+def start_background_queue():
+    """Start the turn queue when persistence is configured (called from the app lifespan)"""
+    if PERSISTENCE_ENABLED:
+        turn_queue.start()
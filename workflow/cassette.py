@@ -0,0 +1,152 @@
+"""
+StudyBuddy - Agent Call Cassettes
+Record agent prompts and structured outputs to disk, then replay them offline
+
+In record mode every agent call made by the workflow is appended to a JSONL
+cassette as {"key", "agent", "prompt", "output"}, keyed by a hash of the agent
+name and prompt. In replay mode the cassette is loaded into memory and calls
+are answered from it without touching a model, so load tests and regression
+runs measure pure orchestration overhead on real traffic shapes.
+
+When a prompt was recorded more than once (e.g. the same quiz answered by
+several students) replay cycles through the recorded outputs in order. Each
+replayed output is a fresh copy - nodes may modify the outputs they get.
+
+Recording appends to the file in a worker thread, off the event loop.
+
+Configuration (environment):
+    STUDYBUDDY_CASSETTE_MODE   off | record | replay (default: off)
+    STUDYBUDDY_CASSETTE_PATH   cassette file (default: cassettes/agent_calls.jsonl)
+"""
+
+from collections import defaultdict
+from typing import Optional
+from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+from workflow.telemetry import get_logger
+
+logger = get_logger("cassette")
+
+CASSETTE_MODE = os.getenv("STUDYBUDDY_CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = os.getenv("STUDYBUDDY_CASSETTE_PATH", "cassettes/agent_calls.jsonl")
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(LookupError):
+    """Replay mode was asked for a prompt that is not on the cassette"""
+
+
+def prompt_key(agent_name: str, prompt: str) -> str:
+    return hashlib.sha256(f"{agent_name}\x00{prompt}".encode()).hexdigest()[:24]
+
+
+class Cassette:
+    """JSONL-backed store of agent outputs keyed by prompt hash"""
+
+    def __init__(self, path: str, mode: str = "off"):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r} (expected one of {CASSETTE_MODES})")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._records: dict[str, list[dict]] = defaultdict(list)
+        self._parsed: dict[str, list[BaseModel]] = {}
+        self._cursor: dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        if mode == "replay":
+            self.load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def load(self):
+        """Read every recorded call into memory"""
+        self._records.clear()
+        self._parsed.clear()
+        self._cursor.clear()
+        if not os.path.exists(self.path):
+            logger.warning(f"⚠️ CASSETTE: {self.path} does not exist - every call will miss")
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[record["key"]].append(record["output"])
+        logger.info(f"📼 CASSETTE: Loaded {sum(map(len, self._records.values()))} calls from {self.path}")
+
+    def replay(self, agent_name: str, prompt: str, output_type: type[BaseModel]) -> BaseModel:
+        """Copy of the next recorded output for this prompt (outputs are validated once)"""
+        key = prompt_key(agent_name, prompt)
+        parsed = self._parsed.get(key)
+        if parsed is None:
+            records = self._records.get(key)
+            if not records:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded {agent_name} call for prompt {prompt[:60]!r}")
+            parsed = self._parsed[key] = [output_type.model_validate(r) for r in records]
+
+        self.hits += 1
+        index = self._cursor[key]
+        self._cursor[key] = (index + 1) % len(parsed)
+        return parsed[index].model_copy(deep=True)
+
+    def _append(self, line: str):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    async def record(self, agent_name: str, prompt: str, output: BaseModel):
+        """Append one call to the cassette file"""
+        line = json.dumps(
+            {
+                "key": prompt_key(agent_name, prompt),
+                "agent": agent_name,
+                "prompt": prompt,
+                "output": output.model_dump(mode="json", exclude_none=True),
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        await asyncio.to_thread(self._append, line)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "prompts": len(self._records),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+        }
+
+
+cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+
+
+def use_cassette(path: str, mode: str) -> Cassette:
+    """Swap the active cassette (benchmarks and regression runs)"""
+    global cassette
+    cassette = Cassette(path, mode)
+    return cassette
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The active cassette, or None when record/replay is off"""
+    return cassette if cassette.mode != "off" else None
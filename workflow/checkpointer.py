@@ -0,0 +1,446 @@
+"""
+StudyBuddy - Bounded, Durable Checkpointer
+Replaces the unbounded in-process MemorySaver
+
+Only the latest checkpoint of each thread is kept. It lives in a hot in-memory
+LRU and, when a durable backend is configured, is written through to SQLite
+(single node) or Postgres (reusing database/db.py's engine) so any uvicorn
+worker can serve any thread_id and state survives restarts.
+
+With a durable backend another worker may have moved a thread on since it was
+cached here, so a read first checks the stored checkpoint_id (a primary-key
+lookup, no payload) and reloads the record when it differs. Pending writes for
+the checkpoint a task is running on are served from the hot layer directly.
+
+Configuration (environment):
+    CHECKPOINT_BACKEND       memory | sqlite | postgres   (default: memory)
+    CHECKPOINT_SQLITE_PATH   file used by the sqlite backend
+    CHECKPOINT_CACHE_SIZE    max threads held in the hot LRU
+    CHECKPOINT_TTL_SECONDS   idle threads older than this are evicted
+"""
+
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+import asyncio
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from sqlalchemy import Column, Float, Integer, LargeBinary, MetaData, String, Table, create_engine, delete, select
+from sqlalchemy.engine import Engine
+
+from workflow.telemetry import get_logger
+load_dotenv()
+
+logger = get_logger("checkpointer")
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory").lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "studybuddy_checkpoints.db")
+CHECKPOINT_CACHE_SIZE = int(os.getenv("CHECKPOINT_CACHE_SIZE", "1000"))
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Durable rows are swept for idle threads once every N writes
+PRUNE_EVERY_N_PUTS = 500
+
+
+# ============================================================
+# DURABLE STORE (SQLite / Postgres)
+# ============================================================
+
+metadata = MetaData()
+
+checkpoints_table = Table(
+    "workflow_checkpoints",
+    metadata,
+    Column("thread_id", String(150), primary_key=True),
+    Column("checkpoint_ns", String(150), primary_key=True),
+    Column("checkpoint_id", String(64), nullable=False),
+    Column("type", String(32), nullable=False),
+    Column("payload", LargeBinary, nullable=False),
+    Column("size_bytes", Integer, nullable=False),
+    Column("updated_at", Float, nullable=False, index=True),
+)
+
+
+class CheckpointStore:
+    """One row per (thread_id, checkpoint_ns) holding the latest serialized checkpoint"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        metadata.create_all(bind=engine)
+
+    def _insert(self):
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(checkpoints_table)
+
+    def load(self, thread_id: str, checkpoint_ns: str) -> Optional[tuple[str, bytes]]:
+        query = select(checkpoints_table.c.type, checkpoints_table.c.payload).where(
+            checkpoints_table.c.thread_id == thread_id,
+            checkpoints_table.c.checkpoint_ns == checkpoint_ns,
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        return (row.type, row.payload) if row else None
+
+    def checkpoint_id(self, thread_id: str, checkpoint_ns: str) -> Optional[str]:
+        query = select(checkpoints_table.c.checkpoint_id).where(
+            checkpoints_table.c.thread_id == thread_id,
+            checkpoints_table.c.checkpoint_ns == checkpoint_ns,
+        )
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def save(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, typed: tuple[str, bytes]):
+        values = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+            "type": typed[0],
+            "payload": typed[1],
+            "size_bytes": len(typed[1]),
+            "updated_at": time.time(),
+        }
+        stmt = self._insert().values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["thread_id", "checkpoint_ns"],
+            set_={k: stmt.excluded[k] for k in ("checkpoint_id", "type", "payload", "size_bytes", "updated_at")},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def delete_thread(self, thread_id: str):
+        with self.engine.begin() as conn:
+            conn.execute(delete(checkpoints_table).where(checkpoints_table.c.thread_id == thread_id))
+
+    def prune_idle(self, ttl_seconds: float) -> int:
+        """Delete threads untouched for longer than `ttl_seconds`"""
+        cutoff = time.time() - ttl_seconds
+        with self.engine.begin() as conn:
+            result = conn.execute(delete(checkpoints_table).where(checkpoints_table.c.updated_at < cutoff))
+        return result.rowcount or 0
+
+
+# ============================================================
+# CHECKPOINTER
+# ============================================================
+
+class BoundedCheckpointer(BaseCheckpointSaver):
+    """
+    Latest-checkpoint-only saver with a hot LRU and optional write-through store.
+
+    Records are cached serialized, so the hot layer is compact and every read
+    returns a fresh copy (same guarantee MemorySaver gives). Pending writes are
+    kept in the hot layer only; after a crash the run restarts from the last
+    durable checkpoint.
+    """
+
+    get_next_version = InMemorySaver.get_next_version
+
+    def __init__(
+        self,
+        store: Optional[CheckpointStore] = None,
+        max_threads: int = CHECKPOINT_CACHE_SIZE,
+        ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+    ):
+        super().__init__()
+        self.store = store
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        # (thread_id, checkpoint_ns) -> (typed record, checkpoint_id, last access time)
+        self._cache: OrderedDict[tuple[str, str], tuple[tuple[str, bytes], str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    # ---------------- hot layer ----------------
+
+    def _cache_get(self, key: tuple[str, str]) -> Optional[tuple[tuple[str, bytes], str]]:
+        """(typed record, checkpoint_id) from the hot layer"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            typed, checkpoint_id, last_access = entry
+            if time.time() - last_access > self.ttl_seconds:
+                del self._cache[key]
+                return None
+            self._cache[key] = (typed, checkpoint_id, time.time())
+            self._cache.move_to_end(key)
+            return typed, checkpoint_id
+
+    def _cache_put(self, key: tuple[str, str], typed: tuple[str, bytes], checkpoint_id: str):
+        with self._lock:
+            self._cache[key] = (typed, checkpoint_id, time.time())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_threads:
+                self._cache.popitem(last=False)
+
+    # ---------------- size metrics ----------------
+
+    def thread_size(self, thread_id: str, checkpoint_ns: str = "") -> Optional[int]:
+        """Serialized size in bytes of a thread's checkpoint (None if not in the hot layer)"""
+        with self._lock:
+            entry = self._cache.get((thread_id, checkpoint_ns))
+        return len(entry[0][1]) if entry else None
+
+    def stats(self) -> dict:
+        """Checkpoint size distribution across the threads in the hot layer"""
+        with self._lock:
+            sizes = [len(typed[1]) for typed, _, _ in self._cache.values()]
+        return {
+            "threads": len(sizes),
+            "total_bytes": sum(sizes),
+            "avg_bytes": sum(sizes) / len(sizes) if sizes else 0,
+            "max_bytes": max(sizes, default=0),
+        }
+
+    # ---------------- record helpers ----------------
+
+    def _serves_from_cache(self, key: tuple[str, str], checkpoint_id: Optional[str] = None) -> bool:
+        """
+        True if the hot layer's record can be used without touching the store:
+        always without a store, otherwise only for the caller's own checkpoint
+        """
+        cached = self._cache_get(key)
+        return cached is not None and (self.store is None or (checkpoint_id is not None and cached[1] == checkpoint_id))
+
+    def _load_record(self, key: tuple[str, str], checkpoint_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Latest record of a thread. With a store, the cached copy is only used
+        when it is still the stored checkpoint or is `checkpoint_id` - the one
+        the caller is working on.
+        """
+        cached = self._cache_get(key)
+        typed = cached[0] if cached is not None else None
+        if self.store is not None and not (cached is not None and checkpoint_id is not None and cached[1] == checkpoint_id):
+            stored_id = self.store.checkpoint_id(*key)
+            if stored_id is None:
+                typed = None
+            elif cached is None or cached[1] != stored_id:
+                # Not cached here, or another worker has written a newer checkpoint
+                typed = self.store.load(*key)
+                if typed is not None:
+                    self._cache_put(key, typed, stored_id)
+        return self.serde.loads_typed(typed) if typed is not None else None
+
+    def _save_record(self, key: tuple[str, str], record: dict, durable: bool) -> tuple[str, bytes]:
+        typed = self.serde.dumps_typed(record)
+        self._cache_put(key, typed, record["checkpoint"]["id"])
+        if durable and self.store is not None:
+            self.store.save(key[0], key[1], record["checkpoint"]["id"], typed)
+            self._maybe_prune()
+        return typed
+
+    def _maybe_prune(self):
+        self._puts += 1
+        if self._puts % PRUNE_EVERY_N_PUTS == 0:
+            pruned = self.store.prune_idle(self.ttl_seconds)
+            if pruned:
+                logger.info(f"🧹 CHECKPOINTER: Pruned {pruned} idle threads")
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> tuple[str, str]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _to_tuple(self, key: tuple[str, str], record: dict) -> CheckpointTuple:
+        thread_id, checkpoint_ns = key
+        parent_id = record["parent_checkpoint_id"]
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": record["checkpoint"]["id"],
+                }
+            },
+            checkpoint=record["checkpoint"],
+            metadata=record["metadata"],
+            pending_writes=[(task_id, channel, value) for task_id, channel, value, _ in record["writes"].values()],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+        )
+
+    # ---------------- BaseCheckpointSaver API ----------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        record = self._load_record(key)
+        if record is None:
+            return None
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != record["checkpoint"]["id"]:
+            # Older checkpoints are not retained
+            return None
+        return self._to_tuple(key, record)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config is None or limit == 0:
+            return
+        checkpoint_tuple = self.get_tuple(config)
+        if checkpoint_tuple is None:
+            return
+        if before and get_checkpoint_id(before) and checkpoint_tuple.checkpoint["id"] >= get_checkpoint_id(before):
+            return
+        if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+            return
+        yield checkpoint_tuple
+
+    def _build_put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> tuple[tuple[str, str], dict]:
+        key = self._key(config)
+        previous = self._load_record(key, config["configurable"].get("checkpoint_id"))
+        values = dict(previous["checkpoint"]["channel_values"]) if previous else {}
+        values.update(checkpoint.get("channel_values", {}))
+        for channel in new_versions:
+            if channel not in checkpoint.get("channel_values", {}):
+                values.pop(channel, None)
+        record = {
+            "checkpoint": {**checkpoint, "channel_values": values},
+            "metadata": get_checkpoint_metadata(config, metadata),
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "writes": {},
+        }
+        return key, record
+
+    def _next_config(self, key: tuple[str, str], checkpoint: Checkpoint) -> RunnableConfig:
+        return {"configurable": {"thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": checkpoint["id"]}}
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        key, record = self._build_put(config, checkpoint, metadata, new_versions)
+        self._save_record(key, record, durable=True)
+        return self._next_config(key, checkpoint)
+
+    def _apply_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str):
+        key = self._key(config)
+        record = self._load_record(key, config["configurable"]["checkpoint_id"])
+        if record is None or record["checkpoint"]["id"] != config["configurable"]["checkpoint_id"]:
+            return
+        for idx, (channel, value) in enumerate(writes):
+            inner_idx = WRITES_IDX_MAP.get(channel, idx)
+            inner_key = f"{task_id}:{inner_idx}"
+            if inner_idx >= 0 and inner_key in record["writes"]:
+                continue
+            record["writes"][inner_key] = (task_id, channel, value, task_path)
+        self._save_record(key, record, durable=False)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._apply_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == thread_id]:
+                del self._cache[key]
+        if self.store is not None:
+            self.store.delete_thread(thread_id)
+
+    # ---------------- async API ----------------
+    # Hot-layer hits never leave the event loop; store I/O (including the
+    # freshness check of a cached record) runs in a worker thread.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self.store is None:
+            return self.get_tuple(config)
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self.store is None:
+            return self.put(config, checkpoint, metadata, new_versions)
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # Writes only touch the hot layer unless the record has to be reloaded
+        if self._serves_from_cache(self._key(config), config["configurable"].get("checkpoint_id")):
+            return self.put_writes(config, writes, task_id, task_path)
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+# ============================================================
+# FACTORY
+# ============================================================
+
+def build_checkpointer(backend: str = CHECKPOINT_BACKEND) -> BoundedCheckpointer:
+    """Create the checkpointer for the configured backend"""
+    if backend == "memory":
+        store = None
+    elif backend == "sqlite":
+        store = CheckpointStore(create_engine(f"sqlite:///{CHECKPOINT_SQLITE_PATH}"))
+    elif backend == "postgres":
+        from database.db import DatabaseNotConfigured, engine
+        if engine is None:
+            raise DatabaseNotConfigured("CHECKPOINT_BACKEND=postgres reuses the app database - set DATABASE_URL")
+        store = CheckpointStore(engine)
+    else:
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend!r} (expected memory, sqlite or postgres)")
+
+    logger.info(f"💾 CHECKPOINTER: backend={backend}, cache={CHECKPOINT_CACHE_SIZE}, ttl={CHECKPOINT_TTL_SECONDS:.0f}s")
+    return BoundedCheckpointer(store=store)
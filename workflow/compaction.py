@@ -0,0 +1,109 @@
+"""
+StudyBuddy - Message History Compaction
+Keeps the last N turns verbatim and folds older turns into a rolling digest
+
+Used as the reducer for StudyBuddyState.messages, so every checkpoint write
+stays bounded no matter how long a study session runs.
+
+Configuration (environment):
+    HISTORY_KEEP_TURNS       turns kept verbatim (default: 10)
+    HISTORY_DIGEST_TOPICS    max topics remembered in the digest (default: 20)
+    HISTORY_DIGEST_QUESTIONS max earlier questions remembered (default: 5)
+"""
+
+from typing import Optional
+import os
+
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "10"))
+HISTORY_DIGEST_TOPICS = int(os.getenv("HISTORY_DIGEST_TOPICS", "20"))
+HISTORY_DIGEST_QUESTIONS = int(os.getenv("HISTORY_DIGEST_QUESTIONS", "5"))
+
+# Earlier questions are stored truncated to this many characters
+QUESTION_SNIPPET_CHARS = 120
+
+
+def is_digest(message: dict) -> bool:
+    return message.get("type") == "digest"
+
+
+def split_turns(messages: list[dict]) -> list[list[dict]]:
+    """Group messages into turns, each starting at a user message"""
+    turns: list[list[dict]] = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def empty_digest() -> dict:
+    return {"turns": 0, "topics": [], "recent_questions": []}
+
+
+def fold_turns(digest: dict, turns: list[list[dict]]) -> dict:
+    """Fold verbatim turns into the structured digest"""
+    digest = {
+        "turns": digest["turns"],
+        "topics": list(digest["topics"]),
+        "recent_questions": list(digest["recent_questions"]),
+    }
+
+    for turn in turns:
+        digest["turns"] += 1
+        for message in turn:
+            if message.get("role") != "user":
+                continue
+            topic = message.get("topic")
+            if topic:
+                label = f"{message['subject']}/{topic}" if message.get("subject") else topic
+                if label in digest["topics"]:
+                    digest["topics"].remove(label)
+                digest["topics"].append(label)
+            digest["recent_questions"].append(message["content"][:QUESTION_SNIPPET_CHARS])
+
+    digest["topics"] = digest["topics"][-HISTORY_DIGEST_TOPICS:]
+    digest["recent_questions"] = digest["recent_questions"][-HISTORY_DIGEST_QUESTIONS:]
+    return digest
+
+
+def render_digest(digest: dict) -> str:
+    """Short text form of the digest, usable directly as prompt context"""
+    text = f"Earlier in this session ({digest['turns']} turns)"
+    if digest["topics"]:
+        text += f" the student studied: {', '.join(digest['topics'])}."
+    else:
+        text += "."
+    if digest["recent_questions"]:
+        text += " Recent questions: " + " | ".join(digest["recent_questions"])
+    return text
+
+
+def compact_messages(
+    messages: list[dict],
+    keep_turns: int = HISTORY_KEEP_TURNS,
+) -> list[dict]:
+    """Keep the last `keep_turns` turns verbatim, fold the rest into one digest message"""
+    digest: Optional[dict] = None
+    if messages and is_digest(messages[0]):
+        digest, messages = messages[0]["digest"], messages[1:]
+
+    turns = split_turns(messages)
+    if len(turns) <= keep_turns:
+        return ([_digest_message(digest)] if digest else []) + messages
+
+    if keep_turns > 0:
+        old, recent = turns[:-keep_turns], turns[-keep_turns:]
+    else:
+        old, recent = turns, []
+    digest = fold_turns(digest or empty_digest(), old)
+    return [_digest_message(digest)] + [message for turn in recent for message in turn]
+
+
+def _digest_message(digest: dict) -> dict:
+    return {"role": "system", "type": "digest", "content": render_digest(digest), "digest": digest}
+
+
+def add_and_compact(left: list[dict], right: list[dict]) -> list[dict]:
+    """State reducer: append new messages, then compact the history"""
+    return compact_messages((left or []) + (right or []))
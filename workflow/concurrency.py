@@ -0,0 +1,128 @@
+"""
+StudyBuddy - Per-Thread Concurrency Control
+Serializes turns on the same conversation thread and coalesces duplicates
+
+Each turn reads the thread's checkpoint and writes a new one, so two turns
+running at once on one thread (double-clicks, client retries) race and the
+later write silently drops the earlier one's state (e.g. active_quiz).
+
+ThreadGate gives every thread an asyncio.Lock (FIFO wait queue) and, while a
+turn is queued or running, an identical message on the same thread attaches to
+that execution and shares its result instead of running the pipeline again.
+Executions are shielded: a disconnected caller does not cancel a turn other
+callers are waiting on, and the checkpoint stays consistent.
+
+Configuration (environment):
+    THREAD_MAX_QUEUE   max turns queued or running per thread (default: 8)
+"""
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+import asyncio
+import os
+
+THREAD_MAX_QUEUE = int(os.getenv("THREAD_MAX_QUEUE", "8"))
+
+
+class ThreadBusyError(RuntimeError):
+    """Too many turns are already queued on this thread"""
+
+
+@dataclass
+class _ThreadSlot:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # normalized message -> shared execution
+    inflight: dict[str, asyncio.Future] = field(default_factory=dict)
+    pending: int = 0
+
+
+def _message_key(message: str) -> str:
+    return " ".join(message.split()).lower()
+
+
+class ThreadGate:
+    """Per-thread FIFO locks with coalescing of identical in-flight messages"""
+
+    def __init__(self, max_queue: int = THREAD_MAX_QUEUE):
+        self.max_queue = max_queue
+        self._slots: dict[str, _ThreadSlot] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.waited = 0
+        self.rejected = 0
+        self.max_depth = 0
+
+    def _enter(self, thread_id: str) -> _ThreadSlot:
+        slot = self._slots.get(thread_id)
+        if slot is None:
+            slot = self._slots[thread_id] = _ThreadSlot()
+        if slot.pending >= self.max_queue:
+            self.rejected += 1
+            raise ThreadBusyError(f"Thread {thread_id} already has {slot.pending} turns in progress")
+        if slot.pending:
+            self.waited += 1
+        slot.pending += 1
+        self.max_depth = max(self.max_depth, slot.pending)
+        return slot
+
+    def _leave(self, thread_id: str, slot: _ThreadSlot):
+        slot.pending -= 1
+        if slot.pending == 0 and self._slots.get(thread_id) is slot:
+            del self._slots[thread_id]
+
+    @asynccontextmanager
+    async def hold(self, thread_id: str):
+        """Exclusive access to a thread (waits behind earlier turns)"""
+        slot = self._enter(thread_id)
+        try:
+            async with slot.lock:
+                yield
+        finally:
+            self._leave(thread_id, slot)
+
+    async def run(self, thread_id: str, message: str, execute: Callable[[], Awaitable]):
+        """
+        Run execute() with exclusive access to the thread.
+
+        If the same message is already queued or running on this thread, wait for
+        that execution and return its result instead.
+        """
+        slot = self._slots.get(thread_id)
+        key = _message_key(message)
+        shared = slot.inflight.get(key) if slot else None
+        if shared is not None:
+            self.coalesced += 1
+            return await asyncio.shield(shared)
+
+        slot = self._enter(thread_id)
+        self.executions += 1
+
+        async def serialized():
+            try:
+                async with slot.lock:
+                    return await execute()
+            finally:
+                slot.inflight.pop(key, None)
+                self._leave(thread_id, slot)
+
+        task = asyncio.ensure_future(serialized())
+        slot.inflight[key] = task
+        return await asyncio.shield(task)
+
+    def queue_depth(self, thread_id: str) -> int:
+        slot = self._slots.get(thread_id)
+        return slot.pending if slot else 0
+
+    def stats(self) -> dict:
+        return {
+            "active_threads": len(self._slots),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "max_queue_depth": self.max_depth,
+        }
+
+
+thread_gate = ThreadGate()
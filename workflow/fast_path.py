@@ -0,0 +1,263 @@
+"""
+StudyBuddy - Router Fast Path
+Local pre-classifier that answers trivial turns without an LLM call
+
+Greetings, thanks, goodbyes and obvious off-topic requests get a canned reply.
+Unambiguous requests ("quiz me on X", "explain X") are classified locally:
+- "certain": subject and topic were recognized, the router is skipped
+- "likely":  intent is clear but the subject is not, the router still runs
+
+Subject keywords match whole words (plural "-s"/"-es" included), so "cell"
+does not match "cellphone". A routed request is only "certain" when its topic
+is nothing but keywords of one subject ("explain photosynthesis", "quiz me on
+quadratic equations"), not when it merely contains one ("quiz me on the
+history of the atom bomb"), and not when those keywords are all ambiguous
+across subjects or everyday use ("quiz me on bases").
+
+An optional classifier (e.g. a small on-CPU model) can be plugged in with
+set_classifier(); it is consulted when no rule matches.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+import re
+import time
+
+from agents.schemas import RouterOutput
+
+
+@dataclass
+class FastPathDecision:
+    output: RouterOutput
+    confidence: str  # "certain" or "likely"
+    rule: str
+
+
+# ============================================================
+# RULES
+# ============================================================
+
+GREETING_RE = re.compile(
+    r"^(hi|hello|hey|hiya|howdy|yo|greetings|good (morning|afternoon|evening))"
+    r"( there| buddy| studybuddy)?[\s!.,:)]*$",
+    re.IGNORECASE,
+)
+THANKS_RE = re.compile(
+    r"^(thanks|thank you|thx|ty|cheers|appreciate it|thanks a lot|thank you so much)"
+    r"( so much| a lot)?[\s!.,:)]*$",
+    re.IGNORECASE,
+)
+GOODBYE_RE = re.compile(
+    r"^(bye|goodbye|see you|see ya|good night|gotta go|later)[\s!.,:)]*$",
+    re.IGNORECASE,
+)
+OFF_TOPIC_RE = re.compile(
+    r"^(tell me a joke|what'?s the weather|what is the weather|who won the (game|match)|"
+    r"what'?s your favou?rite (movie|song|food))\b",
+    re.IGNORECASE,
+)
+
+PRACTICE_RE = re.compile(
+    r"^(please )?(quiz me|test me|give me (a |some )?(practice )?(problems?|questions?|quiz)|"
+    r"i want to practi[cs]e|let me practi[cs]e)\s+(on|about|with|for)\s+(?P<topic>.+?)[\s?.!]*$",
+    re.IGNORECASE,
+)
+LEARN_RE = re.compile(
+    r"^(please )?(can you )?(explain|teach me( about)?|what is|what are|how does|how do)\s+"
+    r"(?P<topic>.+?)[\s?.!]*$",
+    re.IGNORECASE,
+)
+
+SUBJECT_KEYWORDS = {
+    "Math": [
+        "algebra", "quadratic", "equation", "calculus", "derivative", "integral", "fraction",
+        "geometry", "trigonometry", "probability", "statistics", "polynomial", "logarithm",
+        "matrix", "matrices", "pythagorean", "linear function", "percentage",
+    ],
+    "Physics": [
+        "newton", "force", "velocity", "acceleration", "momentum", "gravity", "kinetic energy",
+        "potential energy", "thermodynamics", "electromagnet", "optics", "wave", "friction",
+    ],
+    "Chemistry": [
+        "atom", "molecule", "chemical bond", "covalent", "ionic", "periodic table", "mole",
+        "stoichiometry", "acid", "base", "oxidation", "reduction", "chemical reaction",
+    ],
+    "Biology": [
+        "photosynthesis", "cell", "dna", "rna", "mitosis", "meiosis", "evolution", "genetics",
+        "enzyme", "respiration", "ecosystem", "protein synthesis",
+    ],
+}
+
+# Keywords that alone don't settle the subject (acid-base vs number base, ...)
+AMBIGUOUS_KEYWORDS = {"base", "wave", "force", "reduction", "atom", "mole", "cell", "evolution", "statistics"}
+
+GREETING_RESPONSE = "Hi there! 👋 I'm StudyBuddy. What would you like to learn or practice today?"
+THANKS_RESPONSE = "You're welcome! 😊 Anything else you'd like to learn or practice?"
+GOODBYE_RESPONSE = "Great work today! 🎓 Come back anytime to keep learning."
+OFF_TOPIC_RESPONSE = (
+    "I'm best at helping you learn! 📚 Ask me to explain a topic or quiz you on something "
+    "you're studying."
+)
+
+
+def _keyword_pattern(keywords: list[str]) -> str:
+    return "|".join(rf"{re.escape(kw)}(?:s|es)?" for kw in sorted(keywords, key=len, reverse=True))
+
+
+# Whole words only; plurals included
+SUBJECT_RES = {
+    subject: re.compile(rf"\b(?:{_keyword_pattern(keywords)})\b", re.IGNORECASE)
+    for subject, keywords in SUBJECT_KEYWORDS.items()
+}
+_ANY_KEYWORD = rf"(?:{_keyword_pattern([kw for kws in SUBJECT_KEYWORDS.values() for kw in kws])})"
+# The topic is nothing but keywords ("cells", "quadratic equations", "acids and bases")
+KEYWORD_TOPIC_RE = re.compile(rf"{_ANY_KEYWORD}(?:\s+(?:and\s+)?{_ANY_KEYWORD})*", re.IGNORECASE)
+AMBIGUOUS_RE = re.compile(rf"\b(?:{_keyword_pattern(sorted(AMBIGUOUS_KEYWORDS))})\b", re.IGNORECASE)
+
+
+def infer_subject(topic: str) -> Optional[str]:
+    """Map a topic to a subject by keyword, or None if it is not recognized"""
+    for subject, pattern in SUBJECT_RES.items():
+        if pattern.search(topic):
+            return subject
+    return None
+
+
+def is_unambiguous(topic: str) -> bool:
+    """The topic is only keywords, of a single subject, and not only ambiguous ones"""
+    if KEYWORD_TOPIC_RE.fullmatch(topic) is None:
+        return False
+    if sum(1 for pattern in SUBJECT_RES.values() if pattern.search(topic)) != 1:
+        return False
+    return bool(re.sub(r"\band\b", "", AMBIGUOUS_RE.sub("", topic)).strip())
+
+
+def _clean_topic(topic: str) -> str:
+    topic = re.sub(r"^(the|a|an)\s+", "", topic.strip(), flags=re.IGNORECASE)
+    topic = re.sub(r"\s+works?$", "", topic, flags=re.IGNORECASE)  # "how does gravity work"
+    return topic[:1].upper() + topic[1:]
+
+
+def _direct(intent: str, response: str, rule: str) -> FastPathDecision:
+    return FastPathDecision(
+        output=RouterOutput(
+            intent=intent,
+            reasoning=f"fast path: {rule}",
+            direct_response=response,
+            needs_agent=False,
+        ),
+        confidence="certain",
+        rule=rule,
+    )
+
+
+def _routed(intent: str, topic: str, rule: str) -> FastPathDecision:
+    subject = infer_subject(topic)
+    certain = subject is not None and is_unambiguous(_clean_topic(topic))
+    return FastPathDecision(
+        output=RouterOutput(
+            intent=intent,
+            subject=subject,
+            topic=_clean_topic(topic),
+            difficulty=None,
+            reasoning=f"fast path: {rule}",
+            needs_agent=True,
+        ),
+        confidence="certain" if certain else "likely",
+        rule=rule,
+    )
+
+
+def apply_rules(message: str) -> Optional[FastPathDecision]:
+    text = " ".join(message.strip().split())
+    if not text:
+        return None
+
+    if GREETING_RE.match(text):
+        return _direct("greeting", GREETING_RESPONSE, "greeting")
+    if THANKS_RE.match(text):
+        return _direct("greeting", THANKS_RESPONSE, "thanks")
+    if GOODBYE_RE.match(text):
+        return _direct("greeting", GOODBYE_RESPONSE, "goodbye")
+    if OFF_TOPIC_RE.match(text):
+        return _direct("off_topic", OFF_TOPIC_RESPONSE, "off_topic")
+
+    if match := PRACTICE_RE.match(text):
+        return _routed("practice", match.group("topic"), "practice")
+    if match := LEARN_RE.match(text):
+        return _routed("learn", match.group("topic"), "learn")
+
+    return None
+
+
+# ============================================================
+# OPTIONAL CLASSIFIER HOOK
+# ============================================================
+
+_classifier: Optional[Callable[[str], Optional[FastPathDecision]]] = None
+
+
+def set_classifier(classifier: Optional[Callable[[str], Optional[FastPathDecision]]]):
+    """Plug in a local model consulted when no rule matches (None to disable)"""
+    global _classifier
+    _classifier = classifier
+
+
+# ============================================================
+# STATS
+# ============================================================
+
+_stats = {
+    "calls": 0,
+    "certain": 0,
+    "likely": 0,
+    "misses": 0,
+    "classify_seconds": 0.0,
+    "router_calls": 0,
+    "router_seconds": 0.0,
+}
+_rule_hits: dict[str, int] = {}
+
+
+def record_router_latency(seconds: float):
+    """Called after every real router LLM call so savings can be estimated"""
+    _stats["router_calls"] += 1
+    _stats["router_seconds"] += seconds
+
+
+def fast_path_stats() -> dict:
+    calls = _stats["calls"] or 1
+    avg_router = _stats["router_seconds"] / _stats["router_calls"] if _stats["router_calls"] else 0.0
+    return {
+        "calls": _stats["calls"],
+        "hits": _stats["certain"],
+        "likely": _stats["likely"],
+        "misses": _stats["misses"],
+        "hit_rate": _stats["certain"] / calls,
+        "rule_hits": dict(_rule_hits),
+        "avg_classify_ms": 1000 * _stats["classify_seconds"] / calls,
+        "avg_router_ms": 1000 * avg_router,
+        "est_latency_saved_s": _stats["certain"] * avg_router,
+    }
+
+
+# ============================================================
+# ENTRY POINT
+# ============================================================
+
+def preclassify(message: str) -> Optional[FastPathDecision]:
+    """Classify a message locally; None means the LLM router must decide"""
+    start = time.perf_counter()
+    decision = apply_rules(message)
+    if decision is None and _classifier is not None:
+        decision = _classifier(message)
+    _stats["classify_seconds"] += time.perf_counter() - start
+
+    _stats["calls"] += 1
+    if decision is None:
+        _stats["misses"] += 1
+    else:
+        # A plugged-in classifier may use its own confidence labels
+        _stats[decision.confidence] = _stats.get(decision.confidence, 0) + 1
+        _rule_hits[decision.rule] = _rule_hits.get(decision.rule, 0) + 1
+    return decision
@@ -0,0 +1,344 @@
+"""
+StudyBuddy - Local Quiz Grader
+Deterministic grading against the quiz generator's answer key
+
+Only answers that are unambiguous as a whole are graded here: a bare option
+letter ("B", "(b)"), a single number ("42", "x = -3/4"), or - when sympy is
+installed - a single expression ("2x + 1", "y = (x-1)^2"). Anything else,
+including prose around the answer, returns None and goes to
+quiz_evaluator_agent.
+
+Numbers may use thousands separators ("1,500") but not a decimal comma:
+"1,5" is left to the evaluator agent rather than read as 15.
+
+Expressions are never handed to sympy's parser (which evals its input): they
+are parsed here from a whitelisted token set - numbers, single-letter
+variables, + - * / ^, parentheses and a few functions - and rejected when their
+polynomial degree could exceed MAX_DEGREE, which is what keeps simplify()
+cheap. Comparisons run on a small dedicated thread pool, so they never occupy
+the default executor the rest of the app uses for database I/O. The timeout
+only bounds how long a turn waits for the result - a running comparison cannot
+be interrupted and finishes in its worker. Symbolic comparison can only
+confirm an answer; when it cannot show equality, the evaluator agent decides.
+
+Configuration (environment):
+    LOCAL_GRADING_ENABLED        true/false (default: true)
+    LOCAL_GRADE_INCORRECT        also grade wrong letters / numbers locally (default: true)
+    LOCAL_GRADE_TIMEOUT_SECONDS  how long a turn waits for a symbolic comparison (default: 1)
+    LOCAL_GRADE_WORKERS          threads for symbolic comparisons (default: 2)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
+import math
+import os
+import re
+
+from agents.schemas import QuizEvaluatorOutput
+
+LOCAL_GRADING_ENABLED = os.getenv("LOCAL_GRADING_ENABLED", "true").lower() in ("1", "true", "yes")
+LOCAL_GRADE_INCORRECT = os.getenv("LOCAL_GRADE_INCORRECT", "true").lower() in ("1", "true", "yes")
+LOCAL_GRADE_TIMEOUT_SECONDS = float(os.getenv("LOCAL_GRADE_TIMEOUT_SECONDS", "1"))
+LOCAL_GRADE_WORKERS = int(os.getenv("LOCAL_GRADE_WORKERS", "2"))
+
+# Relative tolerance used when the answer key does not give one
+DEFAULT_REL_TOLERANCE = 1e-3
+
+# Bounds that keep symbolic work small
+MAX_EXPRESSION_LENGTH = 100
+MAX_EXPONENT = 10
+MAX_DEGREE = 20
+
+try:
+    import sympy
+except ImportError:
+    sympy = None
+
+
+# ============================================================
+# ANSWER EXTRACTION
+# ============================================================
+
+# The whole answer is one option letter
+CHOICE_RE = re.compile(r"\(?([a-d])\)?[.)]?", re.IGNORECASE)
+
+# Commas only as thousands separators - "1,5" may be a decimal comma
+NUMBER = r"[-+]?(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)(?:[eE][-+]?\d+)?(?:\s*/\s*\d+(?:\.\d+)?)?"
+# The whole answer is one number, optionally assigned to one variable ("x = 2")
+NUMBER_ANSWER_RE = re.compile(rf"(?:[a-z]\s*=\s*)?({NUMBER})", re.IGNORECASE)
+
+
+def _bare(answer: str) -> str:
+    return " ".join(answer.strip().rstrip(".!").split())
+
+
+def extract_choice(answer: str) -> Optional[str]:
+    """The option letter when the whole answer is just that letter, else None"""
+    match = CHOICE_RE.fullmatch(_bare(answer))
+    return match.group(1).upper() if match else None
+
+
+def _to_float(token: str) -> Optional[float]:
+    token = token.replace(",", "").replace(" ", "")
+    try:
+        if "/" in token:
+            numerator, denominator = token.split("/")
+            return float(numerator) / float(denominator)
+        return float(token)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def extract_number(answer: str) -> Optional[float]:
+    """The number when the whole answer is a single number (or "x = <number>"), else None"""
+    match = NUMBER_ANSWER_RE.fullmatch(_bare(answer))
+    return _to_float(match.group(1)) if match else None
+
+
+# ============================================================
+# EXPRESSIONS (whitelisted parser, no eval)
+# ============================================================
+
+TOKEN_RE = re.compile(r"\s*(?:(\d+(?:\.\d+)?|\.\d+)|([a-z]+)|(\*\*|[-+*/^()]))", re.IGNORECASE)
+FUNCTIONS = {"sqrt", "sin", "cos", "tan", "log", "ln", "exp"}
+CONSTANTS = {"pi"}
+
+
+class _Unparseable(ValueError):
+    pass
+
+
+def _tokens(text: str) -> list[tuple[str, str]]:
+    tokens, position = [], 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if not match:
+            raise _Unparseable(text[position:])
+        number, name, operator = match.groups()
+        if number:
+            tokens.append(("num", number))
+        elif name:
+            name = name.lower()
+            if name in FUNCTIONS or name in CONSTANTS or len(name) == 1:
+                tokens.append(("name", name))
+            else:
+                # "maybe", "answer" ... - prose, not an expression
+                raise _Unparseable(name)
+        else:
+            tokens.append(("op", "^" if operator == "**" else operator))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser building sympy objects from whitelisted tokens"""
+
+    def __init__(self, tokens: list[tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, value: Optional[str] = None) -> tuple[str, str]:
+        token = self.peek()
+        if token is None or (value is not None and token[1] != value):
+            raise _Unparseable(value or "end of input")
+        self.position += 1
+        return token
+
+    def parse(self):
+        result = self.expression()
+        if self.peek() is not None:
+            raise _Unparseable(self.peek()[1])
+        return result
+
+    def expression(self):
+        result = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            operator = self.take()[1]
+            right = self.term()
+            result = result + right if operator == "+" else result - right
+        return result
+
+    def term(self):
+        result = self.unary()
+        while True:
+            token = self.peek()
+            if token in (("op", "*"), ("op", "/")):
+                self.take()
+                right = self.unary()
+                result = result * right if token[1] == "*" else result / right
+            elif token is not None and (token[0] in ("num", "name") or token == ("op", "(")):
+                # Implicit multiplication: 2x, 3(x+1), (x+1)(x-1), x y
+                result = result * self.power()
+            else:
+                return result
+
+    def unary(self):
+        if self.peek() in (("op", "+"), ("op", "-")):
+            operator = self.take()[1]
+            operand = self.unary()
+            return operand if operator == "+" else -operand
+        return self.power()
+
+    def power(self):
+        base = self.atom()
+        if self.peek() == ("op", "^"):
+            self.take()
+            exponent = self.unary()
+            if not exponent.is_number or abs(exponent) > MAX_EXPONENT:
+                raise _Unparseable("exponent")
+            return base ** exponent
+        return base
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == "num":
+            return sympy.Rational(value)
+        if kind == "name":
+            if value in FUNCTIONS:
+                self.take("(")
+                argument = self.expression()
+                self.take(")")
+                return {
+                    "sqrt": sympy.sqrt, "sin": sympy.sin, "cos": sympy.cos, "tan": sympy.tan,
+                    "log": sympy.log, "ln": sympy.log, "exp": sympy.exp,
+                }[value](argument)
+            if value == "pi":
+                return sympy.pi
+            return sympy.Symbol(value)
+        if value == "(":
+            result = self.expression()
+            self.take(")")
+            return result
+        raise _Unparseable(value)
+
+
+def _degree_bound(expr) -> float:
+    """Upper bound on the polynomial degree of a parsed expression (inf if unbounded)"""
+    if expr.is_Symbol:
+        return 1
+    if expr.is_Number or not expr.args:
+        return 0
+    if expr.is_Pow:
+        base, exponent = expr.args
+        if not exponent.is_Number:
+            return math.inf
+        return _degree_bound(base) * abs(float(exponent))
+    degrees = [_degree_bound(arg) for arg in expr.args]
+    return sum(degrees) if expr.is_Mul else max(degrees)
+
+
+def parse_expression(text: str):
+    """sympy expression for `text` ("y = ..." allowed), or None if it isn't a plain expression"""
+    if sympy is None or len(text) > MAX_EXPRESSION_LENGTH:
+        return None
+    left, equals, right = text.partition("=")
+    if equals:
+        # Only "<variable> = <expression>"
+        if "=" in right or not re.fullmatch(r"\s*[a-z]\s*", left, re.IGNORECASE):
+            return None
+        text = right
+    try:
+        expression = _Parser(_tokens(text)).parse()
+    except (_Unparseable, ZeroDivisionError, TypeError, ValueError):
+        return None
+    # ((x+1)^10)^10 passes the per-exponent limit but would expand to degree 100
+    return expression if _degree_bound(expression) <= MAX_DEGREE else None
+
+
+def _equal(expected: str, answer: str) -> Optional[bool]:
+    left, right = parse_expression(expected), parse_expression(_bare(answer))
+    if left is None or right is None:
+        return None
+    return sympy.simplify(left - right) == 0
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def expressions_equal(expected: str, answer: str) -> Optional[bool]:
+    """True if the answer is provably equal to the expected expression; None otherwise"""
+    global _executor
+    if sympy is None:
+        return None
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LOCAL_GRADE_WORKERS, thread_name_prefix="grader")
+    try:
+        # Timing out stops the wait (and drops a queued comparison), not a running one
+        comparison = asyncio.get_running_loop().run_in_executor(_executor, _equal, expected, answer)
+        equal = await asyncio.wait_for(comparison, LOCAL_GRADE_TIMEOUT_SECONDS)
+    except Exception:
+        return None
+    # simplify() failing to show equality is not proof the answer is wrong
+    return True if equal else None
+
+
+# ============================================================
+# GRADING
+# ============================================================
+
+async def check_answer(answer_key: dict, answer: str) -> Optional[bool]:
+    """True/False when the answer can be checked mechanically, None otherwise"""
+    kind = (answer_key.get("kind") or "none").lower()
+
+    if kind == "choice" and answer_key.get("choice"):
+        picked = extract_choice(answer)
+        return None if picked is None else picked == answer_key["choice"].strip().upper()
+
+    if kind == "numeric" and answer_key.get("value") is not None:
+        value = extract_number(answer)
+        if value is None:
+            return None
+        expected = float(answer_key["value"])
+        tolerance = answer_key.get("tolerance")
+        if tolerance is not None:
+            return abs(value - expected) <= float(tolerance)
+        return math.isclose(value, expected, rel_tol=DEFAULT_REL_TOLERANCE, abs_tol=1e-9)
+
+    if kind == "expression" and answer_key.get("expression"):
+        return await expressions_equal(answer_key["expression"], answer)
+
+    return None
+
+
+async def grade_answer(quiz: dict, answer: str) -> Optional[QuizEvaluatorOutput]:
+    """Grade locally from quiz["answer_key"]; None means the LLM evaluator must decide"""
+    answer_key = quiz.get("answer_key")
+    if not LOCAL_GRADING_ENABLED or not answer_key:
+        return None
+
+    correct = await check_answer(answer_key, answer)
+    if correct is None:
+        return None
+
+    hints_used = quiz.get("hints_used", 0)
+    if correct:
+        return QuizEvaluatorOutput(
+            correctness=1.0,
+            is_correct=True,
+            feedback="That's exactly right!",
+            misconceptions=[],
+            strengths=["Correct final answer"] + (["Solved it without hints"] if hints_used == 0 else []),
+            should_retry=False,
+            mastery_update="proficient" if hints_used == 0 else "learning",
+        )
+
+    if not LOCAL_GRADE_INCORRECT:
+        return None
+
+    hints = quiz.get("hints") or []
+    next_hint = hints[hints_used] if hints_used < len(hints) else None
+    return QuizEvaluatorOutput(
+        correctness=0.0,
+        is_correct=False,
+        feedback="Not quite - that isn't the answer I was looking for.",
+        misconceptions=[],
+        strengths=[],
+        next_hint=next_hint,
+        should_retry=next_hint is not None,
+        mastery_update="struggling" if next_hint is None else "learning",
+    )
@@ -0,0 +1,262 @@
+"""
+StudyBuddy - Idempotency Keys for /chat
+Replays the stored response when a client retries a request it already sent
+
+Clients send an Idempotency-Key header (or `idempotency_key` in the body). The
+first request with a key runs the workflow; its response is kept in a bounded
+TTL cache and, when a durable backend is configured, written through to
+SQLite/Postgres so retries that land on another worker are answered too.
+A retry that arrives while the first request is still running attaches to that
+execution instead of starting another one. Failed executions are not stored,
+so the client's retry runs the turn again.
+
+Reusing a key with a different message or thread is rejected (IdempotencyConflict).
+
+Configuration (environment):
+    IDEMPOTENCY_BACKEND       memory | sqlite | postgres   (default: memory)
+    IDEMPOTENCY_SQLITE_PATH   file used by the sqlite backend
+    IDEMPOTENCY_CACHE_SIZE    max responses held in memory
+    IDEMPOTENCY_TTL_SECONDS   how long a key is remembered (default: 24h)
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, create_engine, delete, select
+from sqlalchemy.engine import Engine
+
+from workflow.telemetry import get_logger
+load_dotenv()
+
+logger = get_logger("idempotency")
+
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+IDEMPOTENCY_SQLITE_PATH = os.getenv("IDEMPOTENCY_SQLITE_PATH", "studybuddy_idempotency.db")
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+
+# Durable rows are swept for expired keys once every N saves
+PRUNE_EVERY_N_SAVES = 500
+
+
+class IdempotencyConflict(ValueError):
+    """The key was already used for a different request"""
+
+
+def request_fingerprint(*parts: Optional[str]) -> str:
+    return hashlib.sha256("\x00".join(p or "" for p in parts).encode()).hexdigest()[:32]
+
+
+# ============================================================
+# DURABLE STORE (SQLite / Postgres)
+# ============================================================
+
+metadata = MetaData()
+
+idempotency_table = Table(
+    "idempotency_keys",
+    metadata,
+    Column("key", String(200), primary_key=True),
+    Column("fingerprint", String(32), nullable=False),
+    Column("response", Text, nullable=False),
+    Column("created_at", Float, nullable=False, index=True),
+)
+
+
+class IdempotencyStore:
+    """One row per idempotency key holding the JSON response"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        metadata.create_all(bind=engine)
+
+    def load(self, key: str, ttl_seconds: float) -> Optional[tuple[str, dict]]:
+        query = select(idempotency_table.c.fingerprint, idempotency_table.c.response).where(
+            idempotency_table.c.key == key,
+            idempotency_table.c.created_at >= time.time() - ttl_seconds,
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        return (row.fingerprint, json.loads(row.response)) if row else None
+
+    def save(self, key: str, fingerprint: str, response: dict):
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(idempotency_table).values(
+            key=key, fingerprint=fingerprint, response=json.dumps(response), created_at=time.time()
+        )
+        # First writer wins - a concurrent worker's response is just as valid
+        with self.engine.begin() as conn:
+            conn.execute(stmt.on_conflict_do_nothing(index_elements=["key"]))
+
+    def prune(self, ttl_seconds: float) -> int:
+        cutoff = time.time() - ttl_seconds
+        with self.engine.begin() as conn:
+            result = conn.execute(delete(idempotency_table).where(idempotency_table.c.created_at < cutoff))
+        return result.rowcount or 0
+
+
+# ============================================================
+# CACHE
+# ============================================================
+
+class IdempotencyCache:
+    """Bounded TTL cache of completed responses plus in-flight executions"""
+
+    def __init__(
+        self,
+        store: Optional[IdempotencyStore] = None,
+        max_entries: int = IDEMPOTENCY_CACHE_SIZE,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+    ):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (fingerprint, response, stored_at)
+        self._entries: OrderedDict[str, tuple[str, dict, float]] = OrderedDict()
+        self._inflight: dict[str, tuple[str, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        self._saves = 0
+        self.executions = 0
+        self.replayed = 0
+        self.attached = 0
+        self.conflicts = 0
+
+    def _get_local(self, key: str) -> Optional[tuple[str, dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[2] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def _put_local(self, key: str, fingerprint: str, response: dict):
+        with self._lock:
+            self._entries[key] = (fingerprint, response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _save(self, key: str, fingerprint: str, response: dict):
+        self.store.save(key, fingerprint, response)
+        self._saves += 1
+        if self._saves % PRUNE_EVERY_N_SAVES == 0:
+            pruned = self.store.prune(self.ttl_seconds)
+            if pruned:
+                logger.info(f"🧹 IDEMPOTENCY: Pruned {pruned} expired keys")
+
+    async def lookup(self, key: str) -> Optional[tuple[str, dict]]:
+        """Stored (fingerprint, response) for a key, memory first"""
+        found = self._get_local(key)
+        if found is None and self.store is not None:
+            found = await asyncio.to_thread(self.store.load, key, self.ttl_seconds)
+            if found is not None:
+                self._put_local(key, *found)
+        return found
+
+    def _check(self, key: str, expected: str, actual: str):
+        if expected != actual:
+            self.conflicts += 1
+            raise IdempotencyConflict(f"Idempotency key {key!r} was already used for a different request")
+
+    def _attach(self, key: str, fingerprint: str) -> Optional[asyncio.Future]:
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            return None
+        self._check(key, inflight[0], fingerprint)
+        self.attached += 1
+        return inflight[1]
+
+    async def run(self, key: str, fingerprint: str, execute: Callable[[], Awaitable[dict]]) -> tuple[dict, bool]:
+        """
+        Return (response, replayed).
+
+        replayed is True when the response comes from an earlier or concurrent
+        request with the same key rather than from this call's own execution.
+        """
+        running = self._attach(key, fingerprint)
+        if running is not None:
+            return await asyncio.shield(running), True
+
+        stored = await self.lookup(key)
+        if stored is not None:
+            self._check(key, stored[0], fingerprint)
+            self.replayed += 1
+            return stored[1], True
+
+        # Another request may have claimed the key while the store was queried
+        running = self._attach(key, fingerprint)
+        if running is not None:
+            return await asyncio.shield(running), True
+
+        async def execute_and_store():
+            try:
+                response = await execute()
+                self._put_local(key, fingerprint, response)
+                if self.store is not None:
+                    try:
+                        await asyncio.to_thread(self._save, key, fingerprint, response)
+                    except Exception as e:
+                        logger.warning(f"⚠️ IDEMPOTENCY: store failed - {e}")
+                return response
+            finally:
+                self._inflight.pop(key, None)
+
+        self.executions += 1
+        task = asyncio.ensure_future(execute_and_store())
+        self._inflight[key] = (fingerprint, task)
+        return await asyncio.shield(task), False
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "executions": self.executions,
+            "replayed": self.replayed,
+            "attached": self.attached,
+            "conflicts": self.conflicts,
+        }
+
+
+# ============================================================
+# FACTORY
+# ============================================================
+
+def build_idempotency_cache(backend: str = IDEMPOTENCY_BACKEND) -> IdempotencyCache:
+    """Create the idempotency cache for the configured backend"""
+    if backend == "memory":
+        store = None
+    elif backend == "sqlite":
+        store = IdempotencyStore(create_engine(f"sqlite:///{IDEMPOTENCY_SQLITE_PATH}"))
+    elif backend == "postgres":
+        from database.db import DatabaseNotConfigured, engine
+        if engine is None:
+            raise DatabaseNotConfigured("IDEMPOTENCY_BACKEND=postgres reuses the app database - set DATABASE_URL")
+        store = IdempotencyStore(engine)
+    else:
+        raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {backend!r} (expected memory, sqlite or postgres)")
+
+    logger.info(f"🔑 IDEMPOTENCY: backend={backend}, cache={IDEMPOTENCY_CACHE_SIZE}, ttl={IDEMPOTENCY_TTL_SECONDS:.0f}s")
+    return IdempotencyCache(store=store)
+
+
+_idempotency_cache: Optional[IdempotencyCache] = None
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    global _idempotency_cache
+    if _idempotency_cache is None:
+        _idempotency_cache = build_idempotency_cache()
+    return _idempotency_cache
@@ -3,11 +3,20 @@ StudyBuddy - Simplified LangGraph Workflow with Memory
 Ready for FastAPI integration
 """
 
-from typing import TypedDict, Literal, Annotated, Optional
+from typing import TypedDict, Literal, Annotated, Optional, AsyncIterator
+from langchain_core.runnables import RunnableConfig
+from pydantic_ai import capture_run_messages
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.usage import RunUsage
+from pydantic_core import from_json
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END, START
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.state import CompiledStateGraph
-import operator
+from datetime import datetime
+import asyncio
+import re
+import time
 import uuid
 
 # Import your agents
@@ -15,7 +24,31 @@ from agents.router_agent import router_agent
 from agents.teacher_agent import teacher_agent
 from agents.quiz_generator_agent import quiz_generator_agent
 from agents.quiz_evaluator_agent import quiz_evaluator_agent
-from agents.schemas import RouterOutput, TeacherOutput, QuizGeneratorOutput, QuizEvaluatorOutput
+from agents.progress_tracker_agent import progress_tracker_agent
+from agents.review_agent import review_agent
+from agents.model_registry import get_model
+from agents.model_tiers import ESCALATE_ON_FAILURE, escalate, estimate_cost, model_name_for, select_tier
+from agents.schemas import (
+    RouterOutput, TeacherOutput, QuizGeneratorOutput, QuizEvaluatorOutput,
+    ReviewInput, ReviewOutput, ProgressTrackerInput, ProgressTrackerOutput
+)
+from database.analytics import StudentStats, get_student_stats, recent_interactions, student_analytics
+from database.persistence import PERSISTENCE_ENABLED, apply_mastery_changes
+from database.problem_bank import bank_is_full, serve_problem, store_problem
+from database.scheduler import due_queue, due_reviews
+from workflow.background import turn_queue
+from workflow.cassette import get_cassette
+from workflow.checkpointer import build_checkpointer
+from workflow.concurrency import thread_gate
+from workflow.compaction import add_and_compact
+from workflow.fast_path import preclassify, record_router_latency
+from workflow.grader import grade_answer
+from workflow.prefetch import PREFETCH_AFTER_TEACHER, prefetcher
+from workflow.semantic_cache import cached_teacher_output, cache_teacher_output
+from workflow.speculation import INTENT_NODES, SPECULATION_ENABLED, SPECULATIVE_NODES, speculations
+from workflow.telemetry import LLM_ESCALATIONS, TURN_DURATION, get_logger, instrument_node, record_llm_call, span
+
+logger = get_logger("workflow")
 
 
 # ============================================================
@@ -26,9 +59,10 @@ class StudyBuddyState(TypedDict):
     """Minimal state for the workflow"""
     # Input
     user_message: str
+    student_id: str  # defaults to the thread id
 
-    # Messages history (accumulates)
-    messages: Annotated[list[dict], operator.add]
+    # Messages history (accumulates, older turns folded into a digest)
+    messages: Annotated[list[dict], add_and_compact]
 
     # Router output
     intent: Optional[str]
@@ -39,23 +73,372 @@ class StudyBuddyState(TypedDict):
 
     # Active quiz tracking
     active_quiz: Optional[dict]
+    seen_problem_ids: list[int]  # problem bank ids already served in this thread
 
     # Final response
     response: str
     next_action: Optional[str]  # "wait_answer", "retry", None
+    agent: Optional[str]  # node that produced the response
+    evaluation: Optional[dict]  # this turn's grading (is_correct, correctness, mastery_update)
+
+
+# ============================================================
+# STREAMING HELPERS
+# ============================================================
+
+def _emit(event: dict):
+    """Send a custom stream event (no-op unless the graph is being streamed)"""
+    get_stream_writer()(event)
+
+
+def _partial_field(response: ModelResponse, field: str) -> str:
+    """Extract a (possibly incomplete) string field from a streamed structured response"""
+    for part in response.parts:
+        if not isinstance(part, ToolCallPart):
+            continue
+        args = part.args
+        if isinstance(args, str):
+            try:
+                args = from_json(args, allow_partial="trailing-strings")
+            except ValueError:
+                continue
+        value = (args or {}).get(field)
+        if isinstance(value, str):
+            return value
+    return ""
+
+
+def _usage_of(messages) -> RunUsage:
+    """Usage of the model responses in a (failed) run's messages"""
+    usage = RunUsage()
+    for message in messages:
+        if isinstance(message, ModelResponse):
+            usage.incr(message.usage)
+            usage.requests += 1
+    return usage
+
+
+async def _run_agent(
+    agent,
+    prompt: str,
+    config: RunnableConfig,
+    node: str,
+    stream_field: Optional[str] = None,
+    difficulty: Optional[str] = None
+):
+    """
+    Run an agent and return its output.
+
+    The model comes from the node's tier (agents/model_tiers.py), one tier up for
+    advanced turns; if the output still fails validation after the agent's own
+    retries, a non-streamed call is retried once per stronger tier.
+
+    When the graph is streamed (`stream_tokens` in the config) and the node has a
+    `stream_field`, the agent is run with run_stream and the growing field text is
+    emitted as token deltas.
+
+    Calls go through the active cassette (see workflow/cassette.py): recorded in
+    record mode, answered from disk in replay mode.
+    """
+    streaming = bool(stream_field) and config.get("configurable", {}).get("stream_tokens")
+    tape = get_cassette()
+
+    if tape and tape.replaying:
+        output = tape.replay(node, prompt, agent.output_type)
+        if streaming:
+            _emit({"event": "token", "node": node, "delta": getattr(output, stream_field, "") or ""})
+        return output
+
+    tier = select_tier(node, difficulty)
+    while True:
+        model_name = model_name_for(tier)
+        model = get_model(model_name)
+        start = time.perf_counter()
+        try:
+            with span(f"studybuddy.llm.{node}", agent=node, model=model_name), capture_run_messages() as messages:
+                if streaming:
+                    output, usage = await _stream_agent(agent, prompt, node, stream_field, model)
+                else:
+                    result = await agent.run(prompt, model=model)
+                    output, usage = result.output, result.usage()
+            break
+        except UnexpectedModelBehavior as e:
+            # The failed attempt took time and (usually) tokens too
+            failed = _usage_of(messages)
+            record_llm_call(
+                node, time.perf_counter() - start, failed, model=model_name, cost=estimate_cost(model_name, failed)
+            )
+            # Tokens already sent to a streaming client can't be taken back
+            stronger = escalate(tier) if ESCALATE_ON_FAILURE and not streaming else None
+            if stronger is None:
+                raise
+            logger.warning(f"⚠️ LLM: {node} failed on {model_name} ({e}) - escalating to {stronger}")
+            LLM_ESCALATIONS.inc(agent=node, tier=stronger)
+            tier = stronger
+
+    elapsed = time.perf_counter() - start
+    cost = estimate_cost(model_name, usage)
+    record_llm_call(node, elapsed, usage, model=model_name, cost=cost)
+    logger.info(
+        f"🤖 LLM: {node} tier={tier} model={model_name} {elapsed * 1000:.0f}ms "
+        f"tokens={usage.input_tokens}/{usage.output_tokens} cost=${cost:.6f}"
+    )
+
+    if tape and tape.recording:
+        await tape.record(node, prompt, output)
+    return output
+
+
+async def _stream_agent(agent, prompt: str, node: str, stream_field: str, model):
+    """run_stream the agent, emitting `stream_field` as token deltas; returns (output, usage)"""
+    writer = get_stream_writer()
+    sent = ""
+    async with agent.run_stream(prompt, model=model) as result:
+        # Structured outputs only validate once every required field has arrived,
+        # so read the field straight from the partial tool-call JSON instead
+        async for response, _ in result.stream_responses(debounce_by=0.05):
+            text = _partial_field(response, stream_field)
+            if len(text) > len(sent) and text.startswith(sent):
+                writer({"event": "token", "node": node, "delta": text[len(sent):]})
+                sent = text
+        output = await result.get_output()
+        usage = result.usage()
+
+    # Flush whatever the debounced stream did not deliver
+    text = getattr(output, stream_field, "") or ""
+    if text.startswith(sent) and len(text) > len(sent):
+        writer({"event": "token", "node": node, "delta": text[len(sent):]})
+    return output, usage
+
+
+# ============================================================
+# PROMPTS
+# ============================================================
+
+def _teacher_prompt(user_message: str, subject: Optional[str], topic: Optional[str], difficulty: Optional[str]) -> str:
+    return f"""
+Student Question: {user_message}
+Subject: {subject}
+Topic: {topic}
+Difficulty: {difficulty}
+
+Provide a clear explanation with examples.
+"""
+
+
+def _quiz_prompt(subject: Optional[str], topic: Optional[str], difficulty: Optional[str]) -> str:
+    return f"""
+Generate a practice problem:
+Subject: {subject}
+Topic: {topic}
+Difficulty: {difficulty}
+
+Create an engaging problem with hints.
+"""
+
+
+# ============================================================
+# SPECULATION
+# ============================================================
+
+def _thread_id(config: RunnableConfig) -> Optional[str]:
+    return config.get("configurable", {}).get("thread_id")
+
+
+def _speculate(state: StudyBuddyState, decision, config: RunnableConfig) -> bool:
+    """Start the predicted downstream agent alongside the router (see workflow/speculation.py)"""
+    if not (SPECULATION_ENABLED and decision and decision.confidence == "likely") or state.get("active_quiz"):
+        return False
+    if _thread_id(config) is None:
+        return False
+    guess = decision.output
+    node = INTENT_NODES.get(guess.intent)
+    if node not in SPECULATIVE_NODES:
+        return False
+
+    difficulty = guess.difficulty or "intermediate"
+    # Speculative calls never stream; a committed result is sent in one piece
+    quiet = {**config, "configurable": {**config.get("configurable", {}), "stream_tokens": False}}
+    if node == "teacher":
+        prompt = _teacher_prompt(state["user_message"], guess.subject, guess.topic, difficulty)
+        call = _run_agent(teacher_agent, prompt, quiet, "teacher", difficulty=difficulty)
+    else:
+        prompt = _quiz_prompt(guess.subject, guess.topic, difficulty)
+        call = _run_agent(quiz_generator_agent, prompt, quiet, "quiz_generator", difficulty=difficulty)
+
+    speculations.start(_thread_id(config), node, guess.topic, difficulty, call)
+    return True
+
+
+async def _speculative_output(config: RunnableConfig, node: str):
+    """Output of a committed speculation for this node, or None"""
+    task = speculations.take(_thread_id(config), node)
+    if task is None:
+        return None
+    try:
+        return await task
+    except Exception as e:
+        logger.warning(f"⚠️ SPECULATION: {node} failed - {e}")
+        return None
+
+
+# ============================================================
+# PROBLEM GENERATION / PREFETCH
+# ============================================================
+
+def _quiz_from_output(output: QuizGeneratorOutput) -> dict:
+    return {
+        "problem_text": output.problem_text,
+        "problem_type": output.problem_type,
+        "hints": output.hints,
+        "expected_concepts": output.expected_concepts,
+        "difficulty": output.difficulty,
+        "answer_key": output.answer_key.model_dump() if output.answer_key else None
+    }
+
+
+async def _generate_problem(
+    subject: Optional[str],
+    topic: Optional[str],
+    difficulty: Optional[str],
+    config: RunnableConfig
+) -> dict:
+    """Call the quiz generator and store the new problem in the bank"""
+    prompt = _quiz_prompt(subject, topic, difficulty)
+    output: QuizGeneratorOutput = await _run_agent(
+        quiz_generator_agent, prompt, config, "quiz_generator", difficulty=difficulty
+    )
+    quiz = _quiz_from_output(output)
+    quiz["problem_id"] = await store_problem(subject, topic, difficulty, quiz)
+    return quiz
+
+
+def _has_practiced(state: StudyBuddyState) -> bool:
+    """The thread has asked for or answered a practice problem before"""
+    return bool(state.get("seen_problem_ids")) or any(
+        message.get("intent") in ("practice", "answer") for message in state.get("messages") or []
+    )
+
+
+def _prefetch_next_problem(state: StudyBuddyState, config: RunnableConfig):
+    """Start generating the likely next practice problem in the background"""
+    subject, topic, difficulty = state["subject"], state["topic"], state["difficulty"]
+    # Background work never streams into this turn's response
+    quiet = {"configurable": {"thread_id": _thread_id(config), "stream_tokens": False}}
+
+    async def generate() -> Optional[dict]:
+        # A full bank serves the next problem without an LLM call anyway
+        if await bank_is_full(subject, topic, difficulty):
+            return None
+        return await _generate_problem(subject, topic, difficulty, quiet)
+
+    prefetcher.schedule(_thread_id(config), subject, topic, difficulty, generate)
+
+
+# ============================================================
+# BACKGROUND PERSISTENCE / PROGRESS TRACKING
+# ============================================================
+
+def _turn_record(result: dict, thread_id: str) -> dict:
+    """Completed turn as queued for persistence (see database/persistence.py)"""
+    evaluation = result.get("evaluation") or {}
+    return {
+        "student_id": result.get("student_id") or thread_id,
+        "thread_id": thread_id,
+        "user_message": result["user_message"],
+        "response": result["response"],
+        "subject": result.get("subject"),
+        "topic": result.get("topic"),
+        "intent": result.get("intent"),
+        "difficulty": result.get("difficulty"),
+        "agent": result.get("agent"),
+        "is_correct": evaluation.get("is_correct"),
+        "correctness": evaluation.get("correctness"),
+        "mastery_update": evaluation.get("mastery_update"),
+        "timestamp": datetime.utcnow()
+    }
+
+
+async def _track_progress(student_id: str):
+    """Run the progress tracker over the student's stats and apply its mastery changes"""
+    stats = await get_student_stats(student_id)
+    if not stats.turns:
+        return
+
+    tracker_input = ProgressTrackerInput(
+        student_id=student_id,
+        recent_interactions=await asyncio.to_thread(recent_interactions, student_id),
+        stats=stats.summary(),
+    )
+    prompt = f"""
+Analyze this student's progress. The stats are exact - use them as given:
+{tracker_input.model_dump_json(exclude_none=True)}
+"""
+    output: ProgressTrackerOutput = await _run_agent(
+        progress_tracker_agent, prompt, {"configurable": {}}, "progress_tracker"
+    )
+    # Computed locally - not left to the model's estimate
+    output.overall_trajectory = stats.trajectory
+    output.engagement_score = stats.engagement_score
+    updated = await asyncio.to_thread(apply_mastery_changes, student_id, output.mastery_changes)
+    if updated:
+        student_analytics.invalidate([student_id])
+        due_queue.invalidate([student_id])
+
+    logger.info(
+        f"📈 PROGRESS: {student_id} {output.overall_trajectory}, engagement={output.engagement_score:.2f}, "
+        f"velocity={output.learning_velocity}, {updated} mastery updates"
+    )
+    if output.intervention_needed:
+        logger.warning(f"⚠️ PROGRESS: {student_id} needs support - {'; '.join(output.recommendations[:2])}")
+
+
+async def _record_turn(result: dict, thread_id: str):
+    """Hand the finished turn to the background queue (waits only while its buffer is full)"""
+    await turn_queue.submit(_turn_record(result, thread_id), track=_track_progress)
 
 
 # ============================================================
 # NODE FUNCTIONS
 # ============================================================
 
-def router_node(state: StudyBuddyState) -> StudyBuddyState:
+@instrument_node("router")
+async def router_node(state: StudyBuddyState, config: RunnableConfig) -> StudyBuddyState:
     """Route user intent"""
-    print(f"🔀 ROUTER: {state['user_message'][:50]}")
+    logger.debug(f"🔀 ROUTER: {state['user_message'][:50]}")
+    _emit({"event": "node", "node": "router"})
+
+    # Trivial or unambiguous turns are classified locally without an LLM call
+    decision = preclassify(state["user_message"])
+    if wants_another_problem(state):
+        # The previous quiz's topic carries over (and its follow-up may be prefetched)
+        output = RouterOutput(
+            intent="practice",
+            subject=state["subject"],
+            topic=state["topic"],
+            difficulty=state["difficulty"],
+            reasoning="another problem after a completed quiz",
+            needs_agent=True
+        )
+        logger.info("⚡ ROUTER: Another problem")
+    elif decision and decision.confidence == "certain":
+        output: RouterOutput = decision.output
+        logger.info(f"⚡ ROUTER: Fast path ({decision.rule})")
+    else:
+        speculating = _speculate(state, decision, config)
+        thread_id = _thread_id(config)
 
-    # Call router agent
-    result = router_agent.run_sync(state["user_message"])
-    output: RouterOutput = result.output
+        # Call router agent
+        start = time.perf_counter()
+        try:
+            output: RouterOutput = await _run_agent(router_agent, state["user_message"], config, "router")
+        except BaseException:
+            speculations.discard(thread_id)
+            raise
+        record_router_latency(time.perf_counter() - start)
+
+        if speculating:
+            speculations.resolve(thread_id, output.intent, output.topic, output.difficulty)
 
     # Update state
     state["intent"] = output.intent
@@ -64,44 +447,62 @@ def router_node(state: StudyBuddyState) -> StudyBuddyState:
     state["difficulty"] = output.difficulty or "intermediate"
     state["needs_agent"] = output.needs_agent
 
-    # Add to messages
+    # Add to messages (only new messages - the reducer appends them)
     state["messages"] = [{
         "role": "user",
-        "content": state["user_message"]
+        "content": state["user_message"],
+        "intent": output.intent,
+        "subject": output.subject,
+        "topic": output.topic
     }]
 
     # Handle direct responses (greetings, off-topic)
     if not output.needs_agent:
         state["response"] = output.direct_response
         state["next_action"] = None
+        state["agent"] = "router"
         state["messages"].append({
             "role": "assistant",
             "content": output.direct_response
         })
-        print(f"✅ ROUTER: Direct response - {output.intent}")
+        logger.info(f"✅ ROUTER: Direct response - {output.intent}")
         return state
 
-    print(f"✅ ROUTER: {output.intent} → {output.subject}/{output.topic}")
+    logger.info(f"✅ ROUTER: {output.intent} → {output.subject}/{output.topic}")
     return state
 
 
-def teacher_node(state: StudyBuddyState) -> StudyBuddyState:
+@instrument_node("teacher")
+async def teacher_node(state: StudyBuddyState, config: RunnableConfig) -> StudyBuddyState:
     """Teach concepts"""
-    print(f"👨‍🏫 TEACHER: {state['topic']}")
+    logger.debug(f"👨‍🏫 TEACHER: {state['topic']}")
+    _emit({"event": "node", "node": "teacher"})
 
     # Build prompt with context
-    prompt = f"""
-Student Question: {state['user_message']}
-Subject: {state['subject']}
-Topic: {state['topic']}
-Difficulty: {state['difficulty']}
-
-Provide a clear explanation with examples.
-"""
-
-    # Call teacher agent
-    result = teacher_agent.run_sync(prompt)
-    output: TeacherOutput = result.output
+    prompt = _teacher_prompt(state["user_message"], state["subject"], state["topic"], state["difficulty"])
+
+    cache_key = (state["subject"], state["topic"], state["difficulty"], state["user_message"])
+    # A reteach or a clarification needs a new explanation, not the one that didn't land
+    cacheable = state.get("next_action") != "reteach" and state.get("intent") != "clarify"
+    output: Optional[TeacherOutput] = cached_teacher_output(*cache_key) if cacheable else None
+
+    if output is not None:
+        speculations.discard(_thread_id(config))
+        logger.info("♻️ TEACHER: Served from cache")
+        _emit({"event": "token", "node": "teacher", "delta": output.explanation})
+    elif (output := await _speculative_output(config, "teacher")) is not None:
+        # Started alongside the router and confirmed by it
+        logger.info("🎯 TEACHER: Served speculative explanation")
+        _emit({"event": "token", "node": "teacher", "delta": output.explanation})
+        if cacheable:
+            cache_teacher_output(*cache_key, output)
+    else:
+        # Call teacher agent (explanation streams as it is generated)
+        output = await _run_agent(
+            teacher_agent, prompt, config, "teacher", "explanation", difficulty=state["difficulty"]
+        )
+        if cacheable:
+            cache_teacher_output(*cache_key, output)
 
     # Format response
     response = f"{output.explanation}\n\n"
@@ -120,64 +521,79 @@ Provide a clear explanation with examples.
 
     state["response"] = response
     state["next_action"] = "wait_answer"
+    state["agent"] = "teacher"
+
+    # "Quiz me" often follows an explanation - for students who practice on this thread
+    if PREFETCH_AFTER_TEACHER or _has_practiced(state):
+        _prefetch_next_problem(state, config)
 
-    state["messages"].append({
+    state["messages"] = [{
         "role": "assistant",
         "content": response
-    })
+    }]
 
-    print(f"✅ TEACHER: Explanation provided")
+    logger.info("✅ TEACHER: Explanation provided")
     return state
 
 
-def quiz_generator_node(state: StudyBuddyState) -> StudyBuddyState:
+@instrument_node("quiz_generator")
+async def quiz_generator_node(state: StudyBuddyState, config: RunnableConfig) -> StudyBuddyState:
     """Generate quiz"""
-    print(f"📝 QUIZ: {state['topic']}")
-
-    prompt = f"""
-Generate a practice problem:
-Subject: {state['subject']}
-Topic: {state['topic']}
-Difficulty: {state['difficulty']}
-
-Create an engaging problem with hints.
-"""
-
-    # Call quiz generator
-    result = quiz_generator_agent.run_sync(prompt)
-    output: QuizGeneratorOutput = result.output
+    logger.debug(f"📝 QUIZ: {state['topic']}")
+    _emit({"event": "node", "node": "quiz_generator"})
+
+    seen_ids = state.get("seen_problem_ids") or []
+    key = (state["subject"], state["topic"], state["difficulty"])
+
+    # A problem generated in the background after the previous turn comes first,
+    # then a stored problem when the bank for this topic is full
+    quiz = await prefetcher.take(_thread_id(config), *key)
+    if quiz is not None:
+        speculations.discard(_thread_id(config))
+        logger.info("⏩ QUIZ: Served prefetched problem")
+    elif (quiz := await serve_problem(*key, seen_ids)) is not None:
+        speculations.discard(_thread_id(config))
+        logger.info(f"♻️ QUIZ: Served problem #{quiz['problem_id']} from the bank")
+    else:
+        # Use the speculative problem if the router confirmed it, else call quiz generator
+        output: Optional[QuizGeneratorOutput] = await _speculative_output(config, "quiz_generator")
+        if output is not None:
+            quiz = _quiz_from_output(output)
+            quiz["problem_id"] = await store_problem(*key, quiz)
+        else:
+            quiz = await _generate_problem(*key, config)
 
     # Save quiz to state
-    state["active_quiz"] = {
-        "problem_text": output.problem_text,
-        "hints": output.hints,
-        "expected_concepts": output.expected_concepts,
-        "difficulty": output.difficulty
-    }
+    state["active_quiz"] = quiz
+    if quiz.get("problem_id") is not None:
+        state["seen_problem_ids"] = seen_ids + [quiz["problem_id"]]
 
     # Format response
     difficulty_emoji = {"beginner": "🌱", "intermediate": "🌿", "advanced": "🌳"}
-    emoji = difficulty_emoji.get(output.difficulty, "📝")
+    emoji = difficulty_emoji.get(quiz["difficulty"], "📝")
 
-    response = f"{emoji} **Practice Problem** ({output.difficulty})\n\n"
-    response += f"{output.problem_text}\n\n"
+    response = f"{emoji} **Practice Problem** ({quiz['difficulty']})\n\n"
+    response += f"{quiz['problem_text']}\n\n"
     response += "Type your answer when ready! 💡 Need a hint? Just ask!"
 
     state["response"] = response
     state["next_action"] = "wait_answer"
+    state["agent"] = "quiz_generator"
 
-    state["messages"].append({
+    state["messages"] = [{
         "role": "assistant",
         "content": response
-    })
+    }]
 
-    print(f"✅ QUIZ: Problem created")
+    logger.info("✅ QUIZ: Problem ready")
     return state
 
 
-def quiz_evaluator_node(state: StudyBuddyState) -> StudyBuddyState:
+@instrument_node("quiz_evaluator")
+async def quiz_evaluator_node(state: StudyBuddyState, config: RunnableConfig) -> StudyBuddyState:
     """Evaluate answer"""
-    print(f"🔍 EVALUATOR: Checking answer")
+    logger.debug("🔍 EVALUATOR: Checking answer")
+    _emit({"event": "node", "node": "quiz_evaluator"})
 
     quiz = state["active_quiz"]
 
@@ -187,13 +603,25 @@ Evaluate this answer:
 Problem: {quiz["problem_text"]}
 Student Answer: {state["user_message"]}
 Expected Concepts: {', '.join(quiz["expected_concepts"])}
+Hints Used: {quiz.get("hints_used", 0)}
 
 Provide feedback.
 """
 
-    # Call evaluator
-    result = quiz_evaluator_agent.run_sync(prompt)
-    output: QuizEvaluatorOutput = result.output
+    # Multiple-choice / numeric / symbolic answers are checked against the answer key
+    output: Optional[QuizEvaluatorOutput] = await grade_answer(quiz, state["user_message"])
+
+    if output is not None:
+        logger.info("⚡ EVALUATOR: Graded locally")
+        _emit({"event": "token", "node": "quiz_evaluator", "delta": output.feedback})
+        if output.next_hint:
+            # The hint comes from the stored list - count it as used
+            state["active_quiz"] = {**quiz, "hints_used": quiz.get("hints_used", 0) + 1}
+    else:
+        # Call evaluator (feedback streams as it is generated)
+        output = await _run_agent(
+            quiz_evaluator_agent, prompt, config, "quiz_evaluator", "feedback", difficulty=quiz.get("difficulty")
+        )
 
     # Format response
     if output.is_correct:
@@ -228,15 +656,139 @@ Provide feedback.
         response += "🎯 Ready for another problem?"
         state["next_action"] = None
         state["active_quiz"] = None  # Clear quiz
+        _prefetch_next_problem(state, config)
 
     state["response"] = response
+    state["agent"] = "quiz_evaluator"
+    state["evaluation"] = {
+        "is_correct": output.is_correct,
+        "correctness": output.correctness,
+        "mastery_update": output.mastery_update
+    }
+
+    # Entered via the router, the user message is already in the history
+    history = state.get("messages") or []
+    via_router = bool(history) and history[-1].get("role") == "user" and history[-1].get("content") == state["user_message"]
+    state["messages"] = [
+        *([] if via_router else [{"role": "user", "content": state["user_message"], "intent": "answer"}]),
+        {"role": "assistant", "content": response}
+    ]
+
+    logger.info(f"✅ EVALUATOR: Score={output.correctness:.2f}")
+    return state
+
+
+@instrument_node("hint")
+async def hint_node(state: StudyBuddyState) -> StudyBuddyState:
+    """Serve the next stored hint for the active quiz (no LLM call)"""
+    logger.debug("💡 HINT: Serving stored hint")
+    _emit({"event": "node", "node": "hint"})
+
+    quiz = dict(state["active_quiz"])
+    hints = quiz.get("hints") or []
+    used = quiz.get("hints_used", 0)
+
+    if used < len(hints):
+        response = f"💡 **Hint {used + 1}/{len(hints)}:** {hints[used]}\n\nGive it another try!"
+        quiz["hints_used"] = used + 1
+    else:
+        response = (
+            "That's every hint I have for this one! Give it your best shot - "
+            "or say \"explain\" and I'll walk you through the topic again."
+        )
+
+    state["active_quiz"] = quiz
+    state["response"] = response
+    state["agent"] = "hint"
+    state["messages"] = [
+        {"role": "user", "content": state["user_message"], "intent": "hint"},
+        {"role": "assistant", "content": response}
+    ]
+
+    logger.info(f"✅ HINT: {quiz.get('hints_used', 0)}/{len(hints)} used")
+    return state
+
+
+def _review_response(due: list[dict], upcoming: Optional[dict]) -> str:
+    if due:
+        response = "📚 **Due for review:**\n"
+        for i, item in enumerate(due, 1):
+            mastery = f" - {item['mastery_level']}" if item["mastery_level"] else ""
+            response += f"{i}. **{item['topic'].title()}** ({item['subject']}){mastery}\n"
+        return response + f"\nSay \"quiz me on {due[0]['topic']}\" to start with the first one! 💪"
+    if upcoming:
+        return (
+            "✅ Nothing is due for review right now. "
+            f"Next up: **{upcoming['topic'].title()}** on {upcoming['due']:%b %d}."
+        )
+    return "No reviews scheduled yet - learn or practice a topic and I'll remind you when it's time to review it!"
+
+
+async def _progress_report(
+    state: StudyBuddyState,
+    config: RunnableConfig,
+    stats: StudentStats,
+    due: list[dict],
+    upcoming: Optional[dict]
+) -> str:
+    """Review agent write-up of the student's precomputed stats"""
+    review_input = ReviewInput(
+        student_id=stats.student_id,
+        subject=state["subject"],
+        topic=state["topic"],
+        stats=stats.summary(),
+        due_topics=[item["topic"] for item in due],
+    )
+    prompt = f"""
+Review this student's progress. The stats are exact - quote them, don't recompute or invent numbers:
+{review_input.model_dump_json(exclude_none=True)}
+"""
+    output: ReviewOutput = await _run_agent(review_agent, prompt, config, "review", "summary")
+    # Facts come from the database, not the model
+    output.topics_covered = stats.topics_covered()
+    output.next_review_topics = [item["topic"] for item in due]
+
+    response = f"{output.summary}\n\n"
+    if output.strengths:
+        response += "**Strengths:**\n" + "".join(f"✓ {s}\n" for s in output.strengths) + "\n"
+    if output.areas_for_improvement:
+        response += "**To work on:**\n" + "".join(f"• {a}\n" for a in output.areas_for_improvement) + "\n"
+    if output.study_recommendations:
+        response += "**Next steps:**\n" + "".join(
+            f"{i}. {r}\n" for i, r in enumerate(output.study_recommendations, 1)
+        ) + "\n"
+    response += _review_response(due, upcoming) + "\n\n"
+    response += f"*{output.motivational_message}*"
+    return response
+
+
+@instrument_node("review")
+async def review_node(state: StudyBuddyState, config: RunnableConfig) -> StudyBuddyState:
+    """List the topics due for spaced repetition (no LLM call)"""
+    logger.debug("📚 REVIEW: Checking due topics")
+    _emit({"event": "node", "node": "review"})
+
+    student_id = state.get("student_id") or _thread_id(config)
+    due, upcoming = await due_reviews(student_id) if PERSISTENCE_ENABLED else ([], None)
+
+    # "How am I doing?" gets a written review of the stats; "what should I
+    # review?" only needs the schedule
+    stats = await get_student_stats(student_id) if PERSISTENCE_ENABLED and is_report_request(state["user_message"]) else None
+    if stats is not None and stats.turns:
+        response = await _progress_report(state, config, stats, due, upcoming)
+    else:
+        response = _review_response(due, upcoming)
+        _emit({"event": "token", "node": "review", "delta": response})
 
-    state["messages"].append({
+    state["response"] = response
+    state["next_action"] = None
+    state["agent"] = "review"
+    state["messages"] = [{
         "role": "assistant",
         "content": response
-    })
+    }]
 
-    print(f"✅ EVALUATOR: Score={output.correctness:.2f}")
+    logger.info(f"✅ REVIEW: {len(due)} topics due")
     return state
 
 
@@ -244,7 +796,28 @@ Provide feedback.
 # ROUTING LOGIC
 # ============================================================
 
-def route_after_router(state: StudyBuddyState) -> Literal["teacher", "quiz_generator", "end"]:
+# Whole-message hint requests ("hint", "can I get another hint please") ...
+HINT_REQUEST_RE = re.compile(
+    r"(please )?(can i (get|have) |could i (get|have) |i need |give me |need |i want )?"
+    r"(a |another |one more |more )?(hint|hints|clue|help)( please)?",
+    re.IGNORECASE,
+)
+# ... or messages that start by saying they are stuck
+STUCK_RE = re.compile(r"(i'?m |i am )?stuck\b", re.IGNORECASE)
+# Review turns asking for a progress report rather than the review schedule
+REPORT_REQUEST_RE = re.compile(
+    r"\b(how am i doing|how'?m i doing|how have i been doing|progress|summary|report|stats|statistics|"
+    r"strengths?|weakness(es)?|weak (spots|areas|topics))\b",
+    re.IGNORECASE,
+)
+# Replies to "Ready for another problem?"
+ANOTHER_PROBLEM_RE = re.compile(
+    r"(yes|yeah|yep|yup|sure|ok|okay|ready|let'?s go|go on|bring it on)?( please)?,? ?"
+    r"((give me |hit me with )?(another|next|one more)( one| problem| question)?)?( please)?",
+    re.IGNORECASE,
+)
+
+def route_after_router(state: StudyBuddyState) -> Literal["teacher", "quiz_generator", "quiz_evaluator", "review", "end"]:
     """Route based on intent"""
     if not state["needs_agent"]:
         return "end"
@@ -259,6 +832,8 @@ def route_after_router(state: StudyBuddyState) -> Literal["teacher", "quiz_gener
         return "teacher"
     elif intent == "practice":
         return "quiz_generator"
+    elif intent == "review":
+        return "review"
     else:
         return "end"
 
@@ -273,9 +848,30 @@ def route_after_evaluation(state: StudyBuddyState) -> Literal["teacher", "end"]:
         return "end"
 
 
-def should_evaluate(state: StudyBuddyState) -> Literal["quiz_evaluator", "router"]:
-    """Check if message is an answer to active quiz"""
+def wants_another_problem(state: StudyBuddyState) -> bool:
+    """Affirmative reply right after a completed quiz offered another problem"""
+    if state.get("active_quiz") or state.get("next_action") is not None or state.get("intent") != "practice":
+        return False
+    text = " ".join(state["user_message"].strip().rstrip("?!.").split())
+    return bool(text) and bool(ANOTHER_PROBLEM_RE.fullmatch(text))
+
+
+def is_report_request(message: str) -> bool:
+    return bool(REPORT_REQUEST_RE.search(message))
+
+
+def is_hint_request(message: str) -> bool:
+    text = " ".join(message.strip().rstrip("?!.").split())
+    return bool(HINT_REQUEST_RE.fullmatch(text) or STUCK_RE.match(text))
+
+
+def should_evaluate(state: StudyBuddyState) -> Literal["quiz_evaluator", "hint", "router"]:
+    """Check if message is an answer to (or a hint request for) the active quiz"""
     if state.get("active_quiz") and state.get("next_action") in ["wait_answer", "retry"]:
+        # Hint requests are served from the stored hint list
+        if is_hint_request(state["user_message"]):
+            return "hint"
+
         # Simple check: not a new question
         msg = state["user_message"].lower()
         is_new_request = any(kw in msg for kw in ["explain", "teach", "new problem", "different"])
@@ -300,6 +896,8 @@ def build_graph() -> CompiledStateGraph:
     workflow.add_node("teacher", teacher_node)
     workflow.add_node("quiz_generator", quiz_generator_node)
     workflow.add_node("quiz_evaluator", quiz_evaluator_node)
+    workflow.add_node("hint", hint_node)
+    workflow.add_node("review", review_node)
 
     # Entry point with quiz detection
     workflow.add_conditional_edges(
@@ -307,6 +905,7 @@ def build_graph() -> CompiledStateGraph:
         should_evaluate,
         {
             "quiz_evaluator": "quiz_evaluator",
+            "hint": "hint",
             "router": "router"
         }
     )
@@ -319,6 +918,7 @@ def build_graph() -> CompiledStateGraph:
             "teacher": "teacher",
             "quiz_generator": "quiz_generator",
             "quiz_evaluator": "quiz_evaluator",
+            "review": "review",
             "end": END
         }
     )
@@ -329,6 +929,12 @@ def build_graph() -> CompiledStateGraph:
     # Quiz generator → END (waits for answer)
     workflow.add_edge("quiz_generator", END)
 
+    # Hint → END (still waiting for the answer)
+    workflow.add_edge("hint", END)
+
+    # Review → END
+    workflow.add_edge("review", END)
+
     # Quiz evaluator → conditional
     workflow.add_conditional_edges(
         "quiz_evaluator",
@@ -339,9 +945,8 @@ def build_graph() -> CompiledStateGraph:
         }
     )
 
-    # Compile with memory
-    memory = MemorySaver()
-    return workflow.compile(checkpointer=memory)
+    # Compile with a bounded (optionally durable) checkpointer
+    return workflow.compile(checkpointer=build_checkpointer())
 
 
 # ============================================================
@@ -359,20 +964,98 @@ def get_graph() -> CompiledStateGraph:
     return _graph
 
 
+def _fresh_state(user_message: str, student_id: str) -> dict:
+    """Initial state for a brand new thread"""
+    return {
+        "user_message": user_message,
+        "student_id": student_id,
+        "messages": [],
+        "intent": None,
+        "subject": None,
+        "topic": None,
+        "difficulty": None,
+        "needs_agent": True,
+        "active_quiz": None,
+        "seen_problem_ids": [],
+        "response": "",
+        "next_action": None,
+        "agent": None,
+        "evaluation": None
+    }
+
+
+async def _prepare_turn(
+    graph: CompiledStateGraph,
+    config: dict,
+    user_message: str,
+    student_id: Optional[str] = None
+) -> dict:
+    """Build the graph input for this turn from the checkpointed thread state"""
+    fresh_student = student_id or _thread_id(config)
+    try:
+        current_state = await graph.aget_state(config)
+        if current_state.values:
+            # Existing thread - only send this turn's input; the checkpoint
+            # supplies the rest (re-sending `messages` would duplicate history)
+            logger.debug(f"📚 Loaded existing state - Active quiz: {current_state.values.get('active_quiz') is not None}")
+            turn = {"user_message": user_message, "evaluation": None}
+            if student_id or not current_state.values.get("student_id"):
+                turn["student_id"] = fresh_student
+            return turn
+
+        # No existing state - create new
+        logger.debug("🆕 No existing state - starting fresh")
+        return _fresh_state(user_message, fresh_student)
+    except Exception as e:
+        # Error loading state - start fresh
+        logger.warning(f"⚠️ Error loading state: {e}")
+        return _fresh_state(user_message, fresh_student)
+
+
+def _format_result(graph: CompiledStateGraph, result: dict, thread_id: str) -> dict:
+    """Shape the final graph state into the /chat response payload"""
+    return {
+        "response": result["response"],
+        "thread_id": thread_id,
+        "next_action": result.get("next_action"),
+        "metadata": {
+            "intent": result.get("intent"),
+            "subject": result.get("subject"),
+            "topic": result.get("topic"),
+            "has_active_quiz": result.get("active_quiz") is not None,
+            "history_messages": len(result.get("messages", [])),
+            "checkpoint_bytes": graph.checkpointer.thread_size(thread_id)
+        }
+    }
+
+
 async def run_studybuddy_workflow(
     user_message: str,
-    thread_id: Optional[str] = None
+    thread_id: Optional[str] = None,
+    student_id: Optional[str] = None
 ) -> dict:
     """
     Main function to run the workflow with proper state preservation
+
+    Turns on the same thread run one at a time; an identical message sent while
+    a turn is still queued or running shares that turn's result.
+
+    Progress is recorded under `student_id` (the thread id when not given).
     """
-    # Generate thread_id if not provided
-    if thread_id is None:
+    # Generate thread_id if not provided ("" from the API means a new thread)
+    if not thread_id:
         thread_id = f"thread_{uuid.uuid4().hex[:8]}"
-        print(f"🆕 New conversation: {thread_id}")
+        logger.info(f"🆕 New conversation: {thread_id}")
     else:
-        print(f"📝 Continuing: {thread_id}")
+        logger.info(f"📝 Continuing: {thread_id}")
+
+    return await thread_gate.run(
+        thread_id, user_message, lambda: _run_turn(user_message, thread_id, student_id)
+    )
+
 
+async def _run_turn(user_message: str, thread_id: str, student_id: Optional[str] = None) -> dict:
+    """One graph execution (callers hold the thread's lock)"""
     # Get graph
     graph = get_graph()
 
@@ -383,69 +1066,63 @@ async def run_studybuddy_workflow(
         }
     }
 
-    # Get current state from memory
-    try:
-        current_state = graph.get_state(config)
-        if current_state.values:
-            # Preserve existing state and only update user_message
-            initial_state = dict(current_state.values)
-            initial_state["user_message"] = user_message
-            print(f"📚 Loaded existing state - Active quiz: {initial_state.get('active_quiz') is not None}")
-        else:
-            # No existing state - create new
-            initial_state = {
-                "user_message": user_message,
-                "messages": [],
-                "intent": None,
-                "subject": None,
-                "topic": None,
-                "difficulty": None,
-                "needs_agent": True,
-                "active_quiz": None,
-                "response": "",
-                "next_action": None
-            }
-            print(f"🆕 No existing state - starting fresh")
-    except Exception as e:
-        # Error loading state - start fresh
-        print(f"⚠️ Error loading state: {e}")
-        initial_state = {
-            "user_message": user_message,
-            "messages": [],
-            "intent": None,
-            "subject": None,
-            "topic": None,
-            "difficulty": None,
-            "needs_agent": True,
-            "active_quiz": None,
-            "response": "",
-            "next_action": None
-        }
+    initial_state = await _prepare_turn(graph, config, user_message, student_id)
 
     # Run graph
-    print(f"\n{'='*60}")
-    print(f"🚀 Processing: {user_message[:50]}")
-    print(f"{'='*60}\n")
+    logger.info(f"🚀 Processing: {user_message[:50]}")
+    start = time.perf_counter()
 
     result = await graph.ainvoke(initial_state, config)
 
-    print(f"\n{'='*60}")
-    print(f"✅ Complete")
-    print(f"{'='*60}\n")
+    elapsed = time.perf_counter() - start
+    TURN_DURATION.observe(elapsed)
+    logger.info(f"✅ Complete in {elapsed * 1000:.0f}ms")
+
+    await _record_turn(result, thread_id)
 
     # Return response
-    return {
-        "response": result["response"],
-        "thread_id": thread_id,
-        "next_action": result.get("next_action"),
-        "metadata": {
-            "intent": result.get("intent"),
-            "subject": result.get("subject"),
-            "topic": result.get("topic"),
-            "has_active_quiz": result.get("active_quiz") is not None
+    return _format_result(graph, result, thread_id)
+
+
+async def stream_studybuddy_workflow(
+    user_message: str,
+    thread_id: Optional[str] = None,
+    student_id: Optional[str] = None
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of run_studybuddy_workflow
+
+    Yields events as they happen:
+    - {"event": "node", "node": ...}           when a node starts
+    - {"event": "token", "node": ..., "delta": ...}  partial agent output
+    - {"event": "done", **result}              same payload as /chat
+    """
+    if not thread_id:
+        thread_id = f"thread_{uuid.uuid4().hex[:8]}"
+        logger.info(f"🆕 New conversation (stream): {thread_id}")
+
+    graph = get_graph()
+    config = {
+        "configurable": {
+            "thread_id": thread_id,
+            # Tells nodes to use agent.run_stream and emit token events
+            "stream_tokens": True
         }
     }
 
+    # Streams are not coalesced (each client needs its own events) but still
+    # wait for any other turn on the thread to finish first
+    async with thread_gate.hold(thread_id):
+        initial_state = await _prepare_turn(graph, config, user_message, student_id)
+
+        async for event in graph.astream(initial_state, config, stream_mode="custom"):
+            yield event
+
+        final_state = await graph.aget_state(config)
+    await _record_turn(final_state.values, thread_id)
+    yield {"event": "done", **_format_result(graph, final_state.values, thread_id)}
+
+
 # Sync version
 def run_studybuddy_workflow_sync(
     user_message: str,
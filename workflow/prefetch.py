@@ -0,0 +1,165 @@
+"""
+StudyBuddy - Next-Problem Prefetch
+Generates the student's next practice problem in the background
+
+After a quiz is completed ("Ready for another problem?") the next practice
+turn is very likely. The workflow schedules
+a background generation for the same (subject, topic, difficulty) and the next
+quiz_generator turn takes it - already finished, or still running but started
+a whole turn earlier.
+
+After a teacher turn a practice request is only a guess, so that prefetch is
+made for threads that have already practiced (or everywhere with
+PREFETCH_AFTER_TEACHER=true) - otherwise every explanation would cost a second
+LLM call. Prefetch is on only with the problem bank (PROBLEM_BANK_ENABLED),
+where an unused problem is still stored for later students.
+
+One prefetch per thread. Entries for another topic are discarded, unused ones
+expire after PREFETCH_TTL_SECONDS, and at most PREFETCH_MAX_CONCURRENCY
+generations run at once (extra requests are skipped, not queued).
+
+Configuration (environment):
+    PREFETCH_ENABLED            true/false (default: true; needs the problem bank)
+    PREFETCH_AFTER_TEACHER      prefetch after every explanation, not only on threads
+                                that have practiced (default: false)
+    PREFETCH_TTL_SECONDS        unused prefetches are dropped after this (default: 1800)
+    PREFETCH_MAX_ENTRIES        max threads holding a prefetch (default: 1000)
+    PREFETCH_MAX_CONCURRENCY    max background generations at once (default: 8)
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+import asyncio
+import os
+import time
+
+from database.problem_bank import PROBLEM_BANK_ENABLED, problem_key
+from workflow.telemetry import get_logger
+
+logger = get_logger("prefetch")
+
+PREFETCH_ENABLED = PROBLEM_BANK_ENABLED and os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+PREFETCH_AFTER_TEACHER = os.getenv("PREFETCH_AFTER_TEACHER", "false").lower() in ("1", "true", "yes")
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "1800"))
+PREFETCH_MAX_ENTRIES = int(os.getenv("PREFETCH_MAX_ENTRIES", "1000"))
+PREFETCH_MAX_CONCURRENCY = int(os.getenv("PREFETCH_MAX_CONCURRENCY", "8"))
+
+
+@dataclass
+class Prefetch:
+    key: tuple[str, str, str]
+    task: asyncio.Task
+    created_at: float = field(default_factory=time.time)
+
+
+class ProblemPrefetcher:
+    """Background problem generations, one per thread"""
+
+    def __init__(
+        self,
+        max_entries: int = PREFETCH_MAX_ENTRIES,
+        ttl_seconds: float = PREFETCH_TTL_SECONDS,
+        max_concurrency: int = PREFETCH_MAX_CONCURRENCY,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_concurrency = max_concurrency
+        self._entries: OrderedDict[str, Prefetch] = OrderedDict()
+        self._running = 0
+        self.scheduled = 0
+        self.skipped = 0
+        self.served = 0
+        self.discarded = 0
+        self.failed = 0
+
+    def _drop(self, thread_id: str):
+        entry = self._entries.pop(thread_id, None)
+        if entry is not None:
+            entry.task.cancel()
+            self.discarded += 1
+
+    def _finished(self, _task: asyncio.Task):
+        self._running -= 1
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        while self._entries:
+            thread_id, entry = next(iter(self._entries.items()))
+            if entry.created_at >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            self._drop(thread_id)
+
+    def schedule(
+        self,
+        thread_id: Optional[str],
+        subject: Optional[str],
+        topic: Optional[str],
+        difficulty: Optional[str],
+        generate: Callable[[], Awaitable[Optional[dict]]],
+    ) -> bool:
+        """Start generate() in the background unless this problem is already prefetched"""
+        if not PREFETCH_ENABLED or thread_id is None or not topic:
+            return False
+        key = problem_key(subject, topic, difficulty)
+        existing = self._entries.get(thread_id)
+        if existing is not None and existing.key == key:
+            return False
+        if self._running >= self.max_concurrency:
+            self.skipped += 1
+            return False
+
+        self._drop(thread_id)
+
+        async def run():
+            try:
+                return await generate()
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"⚠️ PREFETCH: generation failed - {e}")
+                return None
+
+        task = asyncio.ensure_future(run())
+        self._running += 1
+        task.add_done_callback(self._finished)
+        self._entries[thread_id] = Prefetch(key, task)
+        self._entries.move_to_end(thread_id)
+        self.scheduled += 1
+        self._expire()
+        logger.debug(f"⏩ PREFETCH: {key[1]} ({key[2]}) for {thread_id}")
+        return True
+
+    async def take(
+        self,
+        thread_id: Optional[str],
+        subject: Optional[str],
+        topic: Optional[str],
+        difficulty: Optional[str],
+    ) -> Optional[dict]:
+        """The prefetched problem for this key (waits if still generating), or None"""
+        entry = self._entries.get(thread_id) if thread_id is not None else None
+        if entry is None:
+            return None
+        if entry.key != problem_key(subject, topic, difficulty) or time.time() - entry.created_at > self.ttl_seconds:
+            self._drop(thread_id)
+            return None
+
+        del self._entries[thread_id]
+        quiz = await asyncio.shield(entry.task)
+        if quiz is not None:
+            self.served += 1
+        return quiz
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "running": self._running,
+            "scheduled": self.scheduled,
+            "served": self.served,
+            "discarded": self.discarded,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+
+prefetcher = ProblemPrefetcher()
@@ -0,0 +1,259 @@
+"""
+StudyBuddy - Semantic Cache for Teacher Explanations
+Reuses a stored TeacherOutput when a student asks (almost) the same question
+
+Two layers:
+1. Exact key on normalized (subject, topic, difficulty, question)
+2. Embedding similarity within the same (subject, topic, difficulty) bucket,
+   using a local vector index (hashed word + character n-grams by default;
+   plug a real embedding model in with set_embedder())
+
+Numbers, operators, variables, function names (sin, cos, ...) and negations
+are kept in the normalized question, and a similarity hit also needs exactly
+the same sequence of them - "x^2 + 5x + 6" never matches "x^2 - 5x + 6",
+"sin x" never matches "cos x", "important" never matches "not important".
+
+Configuration (environment):
+    TEACHER_CACHE_ENABLED        true/false (default: true)
+    TEACHER_CACHE_MAX_ENTRIES    LRU size limit (default: 2048)
+    TEACHER_CACHE_TTL_SECONDS    entry lifetime (default: 86400)
+    TEACHER_CACHE_SIMILARITY     cosine threshold for a semantic hit (default: 0.92)
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+import hashlib
+import math
+import os
+import re
+import time
+
+from agents.schemas import TeacherOutput
+
+TEACHER_CACHE_ENABLED = os.getenv("TEACHER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TEACHER_CACHE_MAX_ENTRIES = int(os.getenv("TEACHER_CACHE_MAX_ENTRIES", "2048"))
+TEACHER_CACHE_TTL_SECONDS = float(os.getenv("TEACHER_CACHE_TTL_SECONDS", "86400"))
+TEACHER_CACHE_SIMILARITY = float(os.getenv("TEACHER_CACHE_SIMILARITY", "0.92"))
+
+# Words that change the phrasing but not the question
+FILLER_WORDS = {
+    "please", "can", "could", "you", "me", "to", "i", "want", "would", "like", "explain",
+    "teach", "tell", "about", "the", "a", "an", "what", "is", "are", "how", "does", "do",
+    "help", "understand", "some", "again",
+}
+
+NEGATIONS = {"not", "no", "never", "without", "cannot"}
+MATH_WORDS = {
+    "sin", "cos", "tan", "cot", "sec", "csc", "log", "ln", "exp", "sqrt", "root",
+    "squared", "cubed", "square", "cube", "plus", "minus", "times", "divided", "over",
+}
+TOKEN_RE = re.compile(r"\d+(?:\.\d+)?|[a-z]+(?:'[a-z]+)?|[-+*/^=<>()]")
+
+EMBEDDING_DIM = 1024
+
+
+def _tokens(question: str) -> list[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(question.lower()):
+        if token.endswith("n't") or token in NEGATIONS:
+            token = "not"
+        tokens.append(token.replace("'", ""))
+    return tokens
+
+
+def _is_exact_token(token: str) -> bool:
+    """Tokens a cached answer must agree on exactly: numbers, operators, variables, functions, negations"""
+    return (
+        token[0].isdigit() or not token[0].isalpha() or len(token) == 1
+        or token in MATH_WORDS or token == "not"
+    )
+
+
+def normalize_question(question: str) -> str:
+    tokens = _tokens(question)
+    content = [t for t in tokens if t not in FILLER_WORDS or _is_exact_token(t)]
+    return " ".join(content or tokens)
+
+
+def question_signature(normalized: str) -> tuple[str, ...]:
+    """The exact-match tokens of a normalized question, in order"""
+    # Grouping is left to the embedding: "sin(x)" and "sin x" ask the same thing
+    return tuple(t for t in normalized.split() if _is_exact_token(t) and t not in "()")
+
+
+def hashed_embedding(text: str) -> dict[int, float]:
+    """Sparse, L2-normalized bag of word unigrams and character trigrams"""
+    features: dict[int, float] = {}
+    tokens = text.split()
+    grams = tokens + [f"#{t[i:i + 3]}" for t in tokens for i in range(max(1, len(t) - 2))]
+    for gram in grams:
+        index = int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=4).digest(), "little") % EMBEDDING_DIM
+        features[index] = features.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {k: v / norm for k, v in features.items()}
+
+
+def cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class CacheEntry:
+    output: dict
+    bucket: tuple[str, str, str]
+    signature: tuple[str, ...]
+    vector: dict[int, float]
+    created_at: float
+
+
+class SemanticCache:
+    """Exact + similarity cache of teacher outputs with TTL and LRU eviction"""
+
+    def __init__(
+        self,
+        max_entries: int = TEACHER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = TEACHER_CACHE_TTL_SECONDS,
+        similarity: float = TEACHER_CACHE_SIMILARITY,
+        embedder: Callable[[str], dict[int, float]] = hashed_embedding,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.embedder = embedder
+        self.entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        # bucket -> keys of entries in that bucket (the vector index)
+        self.buckets: dict[tuple[str, str, str], set[tuple]] = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def _bucket(subject: Optional[str], topic: Optional[str], difficulty: Optional[str]) -> tuple[str, str, str]:
+        return (
+            (subject or "").strip().lower(),
+            " ".join(re.sub(r"[^\w\s]", " ", (topic or "").lower()).split()),
+            (difficulty or "").strip().lower(),
+        )
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            keys = self.buckets.get(entry.bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.buckets[entry.bucket]
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.created_at > self.ttl_seconds
+
+    def lookup(
+        self,
+        subject: Optional[str],
+        topic: Optional[str],
+        difficulty: Optional[str],
+        question: str,
+    ) -> Optional[TeacherOutput]:
+        bucket = self._bucket(subject, topic, difficulty)
+        normalized = normalize_question(question)
+        key = bucket + (normalized,)
+
+        # Layer 1: exact
+        entry = self.entries.get(key)
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return TeacherOutput.model_validate(entry.output)
+
+        # Layer 2: nearest neighbour within the bucket, same numbers / symbols only
+        vector = self.embedder(normalized)
+        signature = question_signature(normalized)
+        best_key, best_score = None, 0.0
+        for candidate in list(self.buckets.get(bucket, ())):
+            candidate_entry = self.entries[candidate]
+            if self._expired(candidate_entry):
+                self._remove(candidate)
+                continue
+            if candidate_entry.signature != signature:
+                continue
+            score = cosine(vector, candidate_entry.vector)
+            if score > best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is not None and best_score >= self.similarity:
+            self.entries.move_to_end(best_key)
+            self.stats["semantic_hits"] += 1
+            return TeacherOutput.model_validate(self.entries[best_key].output)
+
+        self.stats["misses"] += 1
+        return None
+
+    def store(
+        self,
+        subject: Optional[str],
+        topic: Optional[str],
+        difficulty: Optional[str],
+        question: str,
+        output: TeacherOutput,
+    ):
+        bucket = self._bucket(subject, topic, difficulty)
+        normalized = normalize_question(question)
+        key = bucket + (normalized,)
+
+        self._remove(key)
+        self.entries[key] = CacheEntry(
+            output=output.model_dump(),
+            bucket=bucket,
+            signature=question_signature(normalized),
+            vector=self.embedder(normalized),
+            created_at=time.time(),
+        )
+        self.buckets.setdefault(bucket, set()).add(key)
+        self.stats["stores"] += 1
+
+        while len(self.entries) > self.max_entries:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def metrics(self) -> dict:
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return {**self.stats, "entries": len(self.entries), "hit_rate": hits / lookups if lookups else 0.0}
+
+
+# ============================================================
+# SHARED INSTANCE
+# ============================================================
+
+teacher_cache = SemanticCache()
+
+
+def set_embedder(embedder: Callable[[str], dict[int, float]]):
+    """
+    Swap the embedding function (entries embedded with the old one are dropped).
+
+    The embedder maps text to a sparse, L2-normalized {dimension: weight} dict;
+    wrap dense model outputs with dict(enumerate(vector)).
+    """
+    global teacher_cache
+    teacher_cache = SemanticCache(embedder=embedder)
+
+
+def cached_teacher_output(subject, topic, difficulty, question) -> Optional[TeacherOutput]:
+    if not TEACHER_CACHE_ENABLED:
+        return None
+    return teacher_cache.lookup(subject, topic, difficulty, question)
+
+
+def cache_teacher_output(subject, topic, difficulty, question, output: TeacherOutput):
+    if TEACHER_CACHE_ENABLED:
+        teacher_cache.store(subject, topic, difficulty, question, output)
+
+
+def teacher_cache_metrics() -> dict:
+    return teacher_cache.metrics()
@@ -0,0 +1,133 @@
+"""
+StudyBuddy - Speculative Downstream Execution
+Starts the predicted teacher/quiz call while the router LLM is still running
+
+When the fast path is only "likely" about a turn (intent and topic are clear,
+the subject is not) the router still has to run, so a learning turn pays two
+serial LLM round trips. With speculation on, the downstream agent for the
+predicted intent starts at the same time as the router:
+
+- router agrees (same downstream node, topic and difficulty): the node awaits
+  the already-running call instead of starting its own
+- router disagrees: the speculative call is cancelled
+
+The subject is not compared - the fast path could not infer it, and the topic
+is what the explanation or problem is about.
+
+Configuration (environment):
+    SPECULATION_ENABLED   true/false (default: false)
+    SPECULATIVE_NODES     comma-separated nodes that may be speculated
+                          (default: teacher; quiz_generator is also supported)
+"""
+
+from dataclasses import dataclass, field
+from typing import Awaitable, Optional
+import asyncio
+import os
+import time
+
+from database.problem_bank import normalize_topic
+from workflow.telemetry import get_logger
+
+logger = get_logger("speculation")
+
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() in ("1", "true", "yes")
+SPECULATIVE_NODES = {n.strip() for n in os.getenv("SPECULATIVE_NODES", "teacher").split(",") if n.strip()}
+
+# Router intent -> node that handles it (mirrors route_after_router)
+INTENT_NODES = {"learn": "teacher", "clarify": "teacher", "practice": "quiz_generator"}
+
+
+def _difficulty(difficulty: Optional[str]) -> str:
+    return difficulty or "intermediate"
+
+
+@dataclass
+class Speculation:
+    node: str
+    topic: str
+    difficulty: str
+    task: asyncio.Task
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+    committed: bool = False
+
+
+class SpeculationRegistry:
+    """In-flight speculative calls, one per thread"""
+
+    def __init__(self):
+        self._pending: dict[str, Speculation] = {}
+        self.started = 0
+        self.committed = 0
+        self.cancelled = 0
+        self.saved_seconds = 0.0
+
+    def start(self, thread_id: str, node: str, topic: str, difficulty: Optional[str], call: Awaitable):
+        """Run `call` in the background as the predicted `node` for this turn"""
+        self.discard(thread_id)
+        speculation = Speculation(node, normalize_topic(topic), _difficulty(difficulty), asyncio.ensure_future(call))
+
+        def finished(_task):
+            speculation.finished_at = time.perf_counter()
+            # Retrieve the exception so an unused failed speculation is not reported
+            if not _task.cancelled():
+                _task.exception()
+
+        speculation.task.add_done_callback(finished)
+        self._pending[thread_id] = speculation
+        self.started += 1
+
+    def resolve(self, thread_id: str, intent: Optional[str], topic: Optional[str], difficulty: Optional[str]) -> bool:
+        """Commit the thread's speculation if the router agrees, otherwise cancel it"""
+        speculation = self._pending.get(thread_id)
+        if speculation is None:
+            return False
+
+        agrees = (
+            INTENT_NODES.get(intent) == speculation.node
+            and normalize_topic(topic) == speculation.topic
+            and _difficulty(difficulty) == speculation.difficulty
+        )
+        if not agrees:
+            self.discard(thread_id)
+            logger.info(f"🎲 SPECULATION: {speculation.node} cancelled (router chose {intent}/{topic})")
+            return False
+
+        now = time.perf_counter()
+        # Work done while the router was running is latency the turn no longer pays
+        self.saved_seconds += min(now, speculation.finished_at or now) - speculation.started_at
+        speculation.committed = True
+        self.committed += 1
+        logger.info(f"🎯 SPECULATION: {speculation.node} committed")
+        return True
+
+    def take(self, thread_id: str, node: str) -> Optional[asyncio.Task]:
+        """Hand a committed speculation to its node (None if there is none)"""
+        speculation = self._pending.get(thread_id)
+        if speculation is None or speculation.node != node or not speculation.committed:
+            return None
+        del self._pending[thread_id]
+        return speculation.task
+
+    def discard(self, thread_id: str):
+        speculation = self._pending.pop(thread_id, None)
+        if speculation is not None:
+            if not speculation.task.done():
+                speculation.task.cancel()
+            if not speculation.committed:
+                self.cancelled += 1
+
+    def stats(self) -> dict:
+        resolved = self.committed + self.cancelled
+        return {
+            "pending": len(self._pending),
+            "started": self.started,
+            "committed": self.committed,
+            "cancelled": self.cancelled,
+            "hit_rate": self.committed / resolved if resolved else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+
+speculations = SpeculationRegistry()
@@ -0,0 +1,257 @@
+"""
+StudyBuddy - Telemetry
+Leveled non-blocking logging, in-process metrics and optional OpenTelemetry spans
+
+Logging: every module logs through get_logger(); records are handed to a
+QueueHandler and written by a background QueueListener, so the event loop
+never blocks on stdout/stderr.
+
+Metrics: counters and histograms kept in memory and rendered in the Prometheus
+text format by render_metrics() (served at GET /metrics). Other components
+expose their own stats() dicts through register_collector(); numeric values
+are exported as gauges.
+
+Tracing: with OTEL_ENABLED=true and opentelemetry installed, every graph node
+runs inside a span (exporters are configured by the usual OTel SDK setup).
+
+Configuration (environment):
+    LOG_LEVEL       DEBUG | INFO | WARNING | ... (default: INFO)
+    OTEL_ENABLED    true/false (default: false)
+"""
+
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Callable, Optional
+import atexit
+import bisect
+import functools
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() in ("1", "true", "yes")
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+
+# ============================================================
+# LOGGING
+# ============================================================
+
+_root_logger = logging.getLogger("studybuddy")
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Route the `studybuddy` loggers through a queue drained by a background thread"""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s | %(message)s"))
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+    _root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _root_logger.setLevel(level)
+    _root_logger.propagate = False
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return _root_logger.getChild(name)
+
+
+# ============================================================
+# METRICS
+# ============================================================
+
+# Seconds; covers local fast paths (sub-ms) up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        # label key -> [per-bucket counts..., +Inf count], sum
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(_label_key(labels), ()))
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {self._sums[key]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+NODE_DURATION = Histogram("studybuddy_node_duration_seconds", "Wall time per graph node")
+NODE_ERRORS = Counter("studybuddy_node_errors_total", "Graph node invocations that raised")
+TURN_DURATION = Histogram("studybuddy_turn_duration_seconds", "Wall time per workflow turn")
+LLM_DURATION = Histogram("studybuddy_llm_duration_seconds", "Latency of agent (LLM) calls")
+LLM_REQUESTS = Counter("studybuddy_llm_requests_total", "Model requests made by agents, including retries")
+LLM_RETRIES = Counter("studybuddy_llm_retries_total", "Extra model requests caused by output validation retries")
+LLM_TOKENS = Counter("studybuddy_llm_tokens_total", "Tokens reported by the model provider")
+LLM_COST = Counter("studybuddy_llm_cost_usd_total", "Estimated LLM spend from token usage and MODEL_PRICES")
+LLM_ESCALATIONS = Counter("studybuddy_llm_escalations_total", "Calls retried on a stronger model tier after a failure")
+
+METRICS = [
+    NODE_DURATION, NODE_ERRORS, TURN_DURATION,
+    LLM_DURATION, LLM_REQUESTS, LLM_RETRIES, LLM_TOKENS, LLM_COST, LLM_ESCALATIONS,
+]
+
+# name -> callable returning a flat stats dict (fast path, caches, checkpointer, ...)
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(name: str, collect: Callable[[], dict]):
+    """Export the numeric values of collect() as studybuddy_<name>_<key> gauges"""
+    _collectors[name] = collect
+
+
+def record_llm_call(agent: str, seconds: float, usage=None, model: str = "", cost: float = 0.0):
+    """Record latency, request/retry counts, tokens and cost for one agent run"""
+    LLM_DURATION.observe(seconds, agent=agent, model=model)
+    requests = getattr(usage, "requests", 1) or 1
+    LLM_REQUESTS.inc(requests, agent=agent, model=model)
+    if requests > 1:
+        LLM_RETRIES.inc(requests - 1, agent=agent, model=model)
+    if usage is not None:
+        LLM_TOKENS.inc(usage.input_tokens or 0, agent=agent, model=model, direction="input")
+        LLM_TOKENS.inc(usage.output_tokens or 0, agent=agent, model=model, direction="output")
+    if cost:
+        LLM_COST.inc(cost, agent=agent, model=model)
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    """(key, number) pairs from a stats dict; nested dicts become key_subkey"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (bool, int, float)):
+            yield f"{prefix}{key}", float(value)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    for name, collect in _collectors.items():
+        try:
+            stats = collect()
+        except Exception as e:
+            get_logger("telemetry").warning(f"⚠️ METRICS: collector {name} failed - {e}")
+            continue
+        for key, value in _flatten(stats):
+            gauge = re.sub(r"\W", "_", f"studybuddy_{name}_{key}")
+            lines.append(f"# TYPE {gauge} gauge")
+            lines.append(f"{gauge} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+# NODE INSTRUMENTATION
+# ============================================================
+
+_tracer = trace.get_tracer("studybuddy") if (OTEL_ENABLED and trace is not None) else None
+
+
+def span(name: str, **attributes):
+    """OpenTelemetry span when tracing is enabled, otherwise a no-op context"""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def instrument_node(name: str):
+    """Time a graph node, count its failures and wrap it in a span"""
+    def decorator(node):
+        @functools.wraps(node)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            with span(f"studybuddy.node.{name}", node=name):
+                try:
+                    return await node(*args, **kwargs)
+                except Exception:
+                    NODE_ERRORS.inc(node=name)
+                    raise
+                finally:
+                    NODE_DURATION.observe(time.perf_counter() - start, node=name)
+        return wrapper
+    return decorator